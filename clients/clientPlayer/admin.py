@@ -0,0 +1,45 @@
+# Seção de Importações
+import argparse
+import json
+import protocol
+from client_stub import StubClient
+
+"""
+Pedidos de administração ao servidor em funcionamento:
+- stats: mostra as métricas do processo do servidor (contadores e latências);
+- profile cpu|memory SEGUNDOS: começa uma sessão de 'profiling' (cProfile ou tracemalloc), que termina sozinha ao fim
+  do tempo indicado e grava os resultados na pasta indicada na resposta;
+- stop: termina já a sessão em curso e mostra os ficheiros gravados.
+No cluster, cada processo tem as suas métricas e o seu 'profiler': --room escolhe o processo dono dessa sala.
+O servidor só aceita estes pedidos de conexões da própria máquina (ver ClientHandler.is_admin).
+Utilização: python admin.py stats | profile cpu|memory SEGUNDOS | stop [--room N]
+"""
+
+MODES = {"cpu": protocol.PROFILE_CPU, "memory": protocol.PROFILE_MEMORY}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server admin commands")
+    parser.add_argument("command", choices=("stats", "profile", "stop"))
+    parser.add_argument("mode", nargs="?", choices=tuple(MODES), default="cpu", help="profiler mode")
+    parser.add_argument("seconds", nargs="?", type=int, default=30, help="profiling session length")
+    parser.add_argument("--room", type=int, help="address the server process that owns this room")
+    args = parser.parse_args()
+
+    stub = StubClient()
+    try:
+        if args.room is not None:
+            stub.join_room(args.room)
+        if args.command == "stats":
+            result = stub.get_stats()
+        elif args.command == "profile":
+            result = stub.profile(MODES[args.mode], args.seconds)
+        else:
+            result = stub.profile(protocol.PROFILE_STOP)
+        print(json.dumps(result, indent=4))
+    finally:
+        stub.s.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Seção de Importações
+import os
+import pygame
+
+PICTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pictures")
+
+# Imagens já carregadas, partilhadas por todos os 'sprites' do processo: {(nome, tamanho): 'Surface'}
+IMAGES = {}
+
+
+def load_image(name: str, size: tuple = None) -> pygame.Surface:
+    """
+    Obtém uma imagem da pasta 'pictures', lida do disco e escalada uma só vez por tamanho. Depois de aberta a janela,
+    as imagens escaladas são convertidas para o formato do ecrã (convert_alpha se tiverem transparência por pixel),
+    para que cada 'blit' não tenha de converter os pixels. A mesma 'Surface' é devolvida a todos: não deve ser
+    alterada.
+    :param name: O nome do ficheiro
+    :param size: O tamanho (largura, altura), ou None para o tamanho original
+    :return: A imagem
+    """
+    key = (name, size)
+    image = IMAGES.get(key)
+    if image is None:
+        if size is None:
+            image = pygame.image.load(os.path.join(PICTURES_DIR, name))
+        else:
+            image = pygame.transform.scale(load_image(name), size)
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha() if image.get_flags() & pygame.SRCALPHA else image.convert()
+        IMAGES[key] = image
+    return image
+
+
+def load_scaled(name: str, width: int) -> pygame.Surface:
+    """
+    Obtém uma imagem escalada para a largura indicada, mantendo a proporção (ver load_image).
+    :param name: O nome do ficheiro
+    :param width: A largura pretendida
+    :return: A imagem
+    """
+    original_width, original_height = load_image(name).get_size()
+    size_rate = width / original_width
+    return load_image(name, (int(original_width * size_rate), int(original_height * size_rate)))
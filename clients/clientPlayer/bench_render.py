@@ -0,0 +1,126 @@
+# Seção de Importações
+import argparse
+import os
+import random
+import time
+import pygame
+import maze
+from game_client import GameUI
+from state_mirror import StateMirror
+
+"""
+Benchmark da renderização da GameUI em labirintos de vários tamanhos (por omissão até 2001 x 2001), sem servidor: o
+labirinto é gerado localmente e um jogador percorre-o ao acaso a partir do centro, movendo-se a cada 'frame' (a
+câmara move-se e a janela é redesenhada) ou parado (só os retângulos alterados). O tempo por 'frame' deve depender
+do tamanho da janela e não do labirinto. A janela é criada sem ecrã (SDL_VIDEODRIVER=dummy), a não ser com --show.
+Utilização: python bench_render.py [--sizes 101 501 2001] [--frames N] [--show]
+"""
+
+DEFAULT_SIZES = [101, 501, 2001]
+# Deslocamento de cada movimento
+MOVES = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+
+class LocalStub:
+    def __init__(self, size: int, seed: int):
+        """
+        Substitui o StubClient no benchmark: o nível é gerado localmente e o estado do único jogador é alterado
+        diretamente na cópia local do estado.
+        :param size: O lado do labirinto
+        :param seed: A semente do labirinto
+        """
+        cells, finish = maze.generate_level(size, size, seed)
+        self.level = (size, size, cells, finish)
+        self.mirror = StateMirror()
+        # O jogador começa na primeira quadrícula livre a partir do centro, para que a câmara não fique presa num canto
+        start = cells.find(0, (size // 2) * size + size // 2)
+        self.mirror.players = {0: ["bench", (start % size, start // size)]}
+
+    def get_level(self):
+        return self.level
+
+    def subscribe(self) -> StateMirror:
+        return self.mirror
+
+    def request_fog(self) -> list:
+        y = self.mirror.players[0][1][1]
+        return [(row, None) for row in (y - 1, y, y + 1)]
+
+
+def walk(stub: LocalStub, rnd: random.Random):
+    """
+    Move o jogador para uma quadrícula livre vizinha, escolhida ao acaso.
+    :return: None
+    """
+    width, height, cells, _ = stub.level
+    x, y = stub.mirror.players[0][1]
+    free = [(x + dx, y + dy) for dx, dy in MOVES if not cells[(y + dy) * width + x + dx]]
+    if free:
+        stub.mirror.players[0][1] = free[int(rnd.random() * len(free))]
+
+
+def run_frames(ui, stub: LocalStub, frames: int, moving: bool, rnd: random.Random) -> list:
+    """
+    Executa 'frames' como o ciclo da GameUI.run e mede o tempo de cada um.
+    :return: Lista com a duração de cada 'frame' em segundos
+    """
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        if moving:
+            walk(stub, rnd)
+        ui.set_players()
+        cell = ui.players_dict[0].cell
+        if cell != (ui.last_player_x, ui.last_player_y):
+            ui.visited_y_coords.update(y for y, cells in stub.request_fog())
+            ui.last_player_x, ui.last_player_y = cell
+            ui.update_fog()
+        rects = ui.draw()
+        if rects:
+            pygame.display.update(rects)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def summary(times: list) -> str:
+    ordered = sorted(times)
+    mean = sum(ordered) / len(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+    return f"{mean * 1000:>8.3f} {p99 * 1000:>8.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GameUI rendering benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="maze sizes (side length)")
+    parser.add_argument("--frames", type=int, default=500, help="frames measured in each scenario")
+    parser.add_argument("--seed", type=int, default=1, help="maze and walk seed")
+    parser.add_argument("--show", action="store_true", help="open a real window")
+    args = parser.parse_args()
+    if not args.show:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+
+    print(f"{'size':>6} {'level s':>8} {'setup s':>8} {'moving ms':>9} {'p99':>8} {'idle ms':>8} {'p99':>8}")
+    for size in args.sizes:
+        start = time.perf_counter()
+        stub = LocalStub(size, args.seed)
+        level_time = time.perf_counter() - start
+        start = time.perf_counter()
+        ui = GameUI(stub, 0, "bench")
+        ui.set_walls(ui.grid_size)
+        ui.mirror = stub.subscribe()
+        ui.set_players()
+        ui.update_fog()
+        ui.screen.blit(ui.background, (0, 0))
+        pygame.display.flip()
+        ui.players.clear(ui.screen, ui.background)
+        setup_time = time.perf_counter() - start
+        rnd = random.Random(args.seed)
+        moving = run_frames(ui, stub, args.frames, True, rnd)
+        idle = run_frames(ui, stub, args.frames, False, rnd)
+        print(f"{size:>6} {level_time:>8.2f} {setup_time:>8.3f} {summary(moving)} {summary(idle)}", flush=True)
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
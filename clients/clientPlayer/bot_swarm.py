@@ -0,0 +1,248 @@
+# Seção de Importações
+import argparse
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import const
+import protocol
+from client_stub import StubClient
+
+"""
+Gerador de carga sem interface gráfica: lança centenas ou milhares de jogadores simulados (bots), repartidos por
+vários processos com uma 'thread' por bot, cada um com o seu StubClient. Cada bot entra no jogo com join_game e
+percorre o labirinto ao ritmo indicado, misturando movimentos com pedidos de estado. No fim são apresentados o débito
+e as latências p50/p95/p99 de cada tipo de pedido, bem como os erros devolvidos pelo servidor.
+A latência do 'execute' inclui a espera pelo tick da simulação (até 1/TICK_HZ segundos), como num cliente real.
+Com --local, o servidor (main_server.py) é lançado e parado pelo próprio gerador; com a mesma semente, os bots fazem
+sempre a mesma sequência de pedidos.
+Utilização: python bot_swarm.py [--bots N] [--processes P] [--rate R] [--duration S] [--seed S] [--local MODO]
+"""
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "server")
+
+# Pedidos de cada bot e o seu peso na mistura
+COMMANDS = {
+    "execute": (const.execute, 6),
+    "get_players": (const.get_Players, 2),
+    "get_fog": (const.get_fog, 1),
+    "get_maze": (const.get_maze, 1),
+    "get_status": (const.get_status, 1),
+}
+# Deslocamento de cada movimento
+MOVES = {const.M_UP: (0, -1), const.M_RIGHT: (1, 0), const.M_DOWN: (0, 1), const.M_LEFT: (-1, 0)}
+OPPOSITE = {const.M_UP: const.M_DOWN, const.M_DOWN: const.M_UP, const.M_LEFT: const.M_RIGHT,
+            const.M_RIGHT: const.M_LEFT}
+
+
+class Bot:
+    def __init__(self, index: int, seed: int, rate: float):
+        """
+        Jogador simulado, com a sua própria conexão ao servidor.
+        :param index: O número do bot
+        :param seed: A semente da sequência de pedidos do bot
+        :param rate: O número de pedidos por segundo
+        """
+        self.index = index
+        self.random = random.Random(seed)
+        self.interval = 1 / rate
+        self.stub = None
+        self.position = (1, 1)
+        self.last_move = None
+        # Latências (segundos) e erros por tipo de pedido
+        self.latency = {}
+        self.errors = {}
+        self.names = list(COMMANDS)
+        self.weights = [weight for msg_type, weight in COMMANDS.values()]
+
+    def timed(self, command: str, fn, *args):
+        """
+        Executa um pedido e regista a sua latência, ou o erro devolvido pelo servidor.
+        :param command: O nome do pedido
+        :param fn: A função que faz o pedido
+        :param args: Os argumentos da função
+        :return: O resultado da função, ou None se o servidor respondeu com um erro
+        """
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except protocol.ProtocolError:
+            self.errors[command] = self.errors.get(command, 0) + 1
+            return None
+        self.latency.setdefault(command, []).append(time.perf_counter() - start)
+        return result
+
+    def connect(self):
+        self.stub = StubClient()
+        if self.timed("join_game", self.stub.join_game, f"bot{self.index}") is not None:
+            self.width, self.height, self.cells, self.finish = self.stub.level
+
+    def next_move(self) -> int:
+        """
+        Escolhe ao acaso um movimento para uma quadrícula livre, sem voltar para trás a não ser num beco sem saída.
+        :return: O movimento
+        """
+        x, y = self.position
+        free = [move for move, (dx, dy) in MOVES.items()
+                if 0 <= x + dx < self.width and 0 <= y + dy < self.height
+                and not self.cells[(y + dy) * self.width + x + dx]]
+        forward = [move for move in free if move != OPPOSITE.get(self.last_move)]
+        options = forward or free or list(MOVES)
+        self.last_move = options[int(self.random.random() * len(options))]
+        return self.last_move
+
+    def step(self):
+        command = self.random.choices(self.names, self.weights)[0]
+        msg_type = COMMANDS[command][0]
+        if command == "execute":
+            payload = protocol.MOVE.pack(self.next_move(), protocol.OBJ_PLAYER)
+            data = self.timed(command, self.stub.request, msg_type, payload)
+            if data is not None:
+                self.position = protocol.POSITION.unpack(data)
+        else:
+            self.timed(command, self.stub.request, msg_type)
+
+    def run(self, stop_at: float):
+        """
+        Faz pedidos ao ritmo do bot até ao instante indicado.
+        :param stop_at: O instante (time.monotonic) em que o bot para
+        :return: None
+        """
+        try:
+            self.connect()
+            if self.stub.level is None:
+                return
+            # Desfasamento inicial, para que os bots não façam os pedidos todos ao mesmo tempo
+            next_time = time.monotonic() + self.random.random() * self.interval
+            while next_time < stop_at:
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.step()
+                next_time += self.interval
+        except (OSError, ConnectionError):
+            self.errors["connection"] = self.errors.get("connection", 0) + 1
+        finally:
+            if self.stub is not None:
+                self.stub.s.close()
+
+
+def run_bots(first: int, count: int, seed: int, rate: float, duration: float) -> tuple:
+    """
+    Corre um grupo de bots num processo, um por 'thread'.
+    :param first: O número do primeiro bot
+    :param count: O número de bots
+    :param seed: A semente base (cada bot usa semente + número)
+    :param rate: Os pedidos por segundo de cada bot
+    :param duration: A duração do teste em segundos
+    :return: Um tuplo (latências por pedido, erros por pedido)
+    """
+    stop_at = time.monotonic() + duration
+    bots = [Bot(index, seed + index, rate) for index in range(first, first + count)]
+    threads = [threading.Thread(target=bot.run, args=(stop_at,), daemon=True) for bot in bots]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latency, errors = {}, {}
+    for bot in bots:
+        for command, samples in bot.latency.items():
+            latency.setdefault(command, []).extend(samples)
+        for command, count_errors in bot.errors.items():
+            errors[command] = errors.get(command, 0) + count_errors
+    return latency, errors
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """
+    Calcula um percentil pelo método do valor mais próximo.
+    :param samples: As amostras ordenadas
+    :param fraction: O percentil entre 0 e 1
+    :return: O valor do percentil
+    """
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def start_local_server(mode: str) -> subprocess.Popen:
+    """
+    Lança o servidor local e espera até que aceite conexões.
+    :param mode: O modo do servidor (threads ou asyncio)
+    :return: O processo do servidor
+    """
+    server = subprocess.Popen([sys.executable, "main_server.py", mode], cwd=SERVER_DIR, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((const.ADDRESS, const.PORT), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("The local server did not start")
+
+
+def stop_local_server(server: subprocess.Popen):
+    # O mesmo que um Ctrl-C, para que o servidor encerre a fábrica de labirintos
+    os.killpg(server.pid, signal.SIGINT)
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+
+
+def report(latency: dict, errors: dict, duration: float):
+    print(f"{'command':<12} {'count':>9} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for command in sorted(set(latency) | set(errors)):
+        samples = sorted(latency.get(command, ()))
+        if samples:
+            p50, p95, p99 = (percentile(samples, fraction) * 1000 for fraction in (0.5, 0.95, 0.99))
+            print(f"{command:<12} {len(samples):>9} {len(samples) / duration:>10.1f} {p50:>9.2f} {p95:>9.2f} "
+                  f"{p99:>9.2f} {errors.get(command, 0):>7}")
+        else:
+            print(f"{command:<12} {0:>9} {0:>10.1f} {'-':>9} {'-':>9} {'-':>9} {errors.get(command, 0):>7}")
+    total = sum(len(samples) for samples in latency.values())
+    print(f"total: {total} requests, {total / duration:.1f} requests/s, {sum(errors.values())} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless bot swarm load generator")
+    parser.add_argument("--bots", type=int, default=100, help="number of simulated players")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="client processes")
+    parser.add_argument("--rate", type=float, default=5.0, help="requests per second of each bot")
+    parser.add_argument("--duration", type=float, default=10.0, help="test duration in seconds")
+    parser.add_argument("--seed", type=int, default=1, help="base seed of the bots")
+    parser.add_argument("--local", choices=("threads", "asyncio"),
+                        help="launch a local server in this mode for the test")
+    args = parser.parse_args()
+
+    server = start_local_server(args.local) if args.local else None
+    try:
+        # Cada processo recebe um bloco de bots seguidos
+        processes = max(1, min(args.processes, args.bots))
+        size, extra = divmod(args.bots, processes)
+        groups = [(i * size + min(i, extra), size + (i < extra)) for i in range(processes)]
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            results = pool.starmap(run_bots, [(first, count, args.seed, args.rate, args.duration)
+                                              for first, count in groups])
+    finally:
+        if server is not None:
+            stop_local_server(server)
+
+    latency, errors = {}, {}
+    for process_latency, process_errors in results:
+        for command, samples in process_latency.items():
+            latency.setdefault(command, []).extend(samples)
+        for command, count in process_errors.items():
+            errors[command] = errors.get(command, 0) + count
+    print(f"{args.bots} bots in {processes} processes, {args.rate} requests/s each, {args.duration} s")
+    report(latency, errors, args.duration)
+
+
+if __name__ == "__main__":
+    main()
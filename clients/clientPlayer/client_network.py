@@ -0,0 +1,124 @@
+# Seção de Importações
+import queue
+import select
+import socket
+import threading
+import const
+import protocol
+from client_stub import StubClient
+from prediction import MovePredictor
+
+
+class NetworkThread:
+    def __init__(self, stub: StubClient, player_id: int):
+        """
+        Camada de rede do cliente numa 'thread' própria. Depois de 'start', só esta 'thread' usa o 'socket' do stub:
+        envia os movimentos postos em fila por 'send_move', aplica os 'frames' difundidos pelo servidor à cópia local
+        do estado (StateMirror, protegida por um 'lock') e, quando o jogador se move, pede as linhas do labirinto
+        reveladas. O ciclo de desenho só lê estado local, pelo que o tempo de cada 'frame' não depende da latência
+        da rede. Os movimentos do próprio jogador são previstos localmente (ver MovePredictor) e enviados como
+        pedidos 'execute': o id de cada pedido identifica o movimento e a resposta confirma-o com a posição dada pelo
+        servidor.
+        :param stub: O stub do cliente, já no jogo (ver StubClient.join_game)
+        :param player_id: O número do jogador do cliente
+        """
+        self.stub = stub
+        self.player_id = player_id
+        self.mirror = stub.subscribe()
+        self.predictor = MovePredictor(stub.get_level(), self.mirror.get_players()[player_id][1])
+        # Movimentos enviados e ainda sem resposta: {id do pedido: número de sequência do movimento}
+        self.in_flight = {}
+        # Movimentos por enviar e par de 'sockets' para acordar a 'thread' quando há movimentos na fila
+        self.moves = queue.SimpleQueue()
+        self.wakeup_r, self.wakeup_w = socket.socketpair()
+        self.wakeup_r.setblocking(False)
+        self.lock = threading.Lock()
+        # Linhas reveladas desde a última chamada a 'take_revealed'
+        self.revealed = set()
+        self.last_position = None
+        # Exceção que terminou a 'thread' (por exemplo a conexão fechada pelo servidor)
+        self.error = None
+        self.stopping = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def shutdown(self):
+        self.stopping = True
+        self.wakeup_w.send(b"\0")
+        if self.thread is not None:
+            self.thread.join()
+        self.wakeup_r.close()
+        self.wakeup_w.close()
+
+    def send_move(self, move: int):
+        """
+        Aplica um movimento à posição prevista e põe-no na fila de envio, sem bloquear. Com INPUT_QUEUE_SIZE
+        movimentos por confirmar, o movimento é ignorado: a fila do jogador no servidor estaria cheia.
+        :param move: Um número inteiro representando o movimento
+        :return: None
+        """
+        if self.predictor.count_pending() >= const.INPUT_QUEUE_SIZE:
+            return
+        self.moves.put((self.predictor.predict(move), move))
+        self.wakeup_w.send(b"\0")
+
+    def take_revealed(self) -> set:
+        """
+        Retira as linhas do labirinto reveladas ao jogador desde a última chamada.
+        :return: O conjunto das linhas
+        """
+        with self.lock:
+            rows, self.revealed = self.revealed, set()
+        return rows
+
+    def run(self):
+        try:
+            while not self.stopping:
+                self.check_position()
+                self.check_acks()
+                readable = select.select([self.stub.s, self.wakeup_r], [], [])[0]
+                if self.wakeup_r in readable:
+                    try:
+                        while self.wakeup_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                while True:
+                    try:
+                        seq, move = self.moves.get_nowait()
+                    except queue.Empty:
+                        break
+                    self.in_flight[self.stub.send_execute(move)] = seq
+                if self.stub.s in readable:
+                    self.stub.poll_updates()
+        except (OSError, protocol.ProtocolError) as e:
+            if not self.stopping:
+                self.error = e
+
+    def check_acks(self):
+        """
+        Reconcilia a previsão com as respostas aos movimentos que já chegaram.
+        :return: None
+        """
+        for request_id, seq in list(self.in_flight.items()):
+            data = self.stub.take_reply(request_id)
+            if data is not None:
+                del self.in_flight[request_id]
+                self.predictor.acknowledge(seq, protocol.POSITION.unpack(data))
+
+    def check_position(self):
+        """
+        Pede ao servidor as linhas reveladas se o jogador se moveu desde o último pedido.
+        :return: None
+        """
+        player = self.mirror.get_players().get(self.player_id)
+        position = player[1] if player is not None else None
+        if position is None or position == self.last_position:
+            return
+        self.last_position = position
+        rows = self.stub.request_fog()
+        with self.lock:
+            self.revealed.update(y for y, cells in rows)
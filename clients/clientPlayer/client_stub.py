@@ -1,7 +1,12 @@
 # Seção de Importações
+import json
+import select
 import socket
 import const
-import pickle
+import protocol
+import codec
+import maze
+from state_mirror import StateMirror
 
 
 # Stub do lado do cliente: como comunicar com o servidor...
@@ -9,6 +14,177 @@ class StubClient:
     def __init__(self):
         self.s: socket = socket.socket()
         self.s.connect((const.ADDRESS, const.PORT))
+        self.decoder = protocol.FrameDecoder()
+        self.next_request_id = 1
+        # Respostas já recebidas mas ainda não pedidas, indexadas pelo id do pedido
+        self.replies = {}
+        # Cópia local do estado, mantida pelos 'frames' difundidos depois de 'subscribe'
+        self.mirror = None
+        # Últimos dados recebidos de cada pedido condicional: {tipo da mensagem: (versão, valor)}
+        self.versions = {}
+        # Labirinto recebido na entrada no jogo (ver 'join_game'): (largura, altura, grelha, meta)
+        self.level = None
+
+    def send_request(self, msg_type: int, payload=b"") -> int:
+        """
+        Envia um pedido ao servidor sem esperar pela resposta.
+        :param msg_type: O tipo da mensagem
+        :param payload: Os bytes do pedido
+        :return: O id atribuído ao pedido
+        """
+        request_id = self.next_request_id
+        self.next_request_id += 1
+        self.s.sendall(protocol.encode_frame(msg_type, payload, request_id))
+        return request_id
+
+    def receive(self):
+        """
+        Lê um bloco de dados do 'socket' e encaminha os 'frames' completos: as respostas ficam guardadas pelo id do
+        pedido e os 'frames' difundidos são aplicados à cópia local do estado.
+        :return: None
+        """
+        data = self.s.recv(const.BUFFER_SIZE)
+        if not data:
+            raise ConnectionError("Connection closed by the server")
+        for frame in self.decoder.feed(data):
+            # O snapshot que responde à subscrição é aplicado logo, antes dos deltas que vêm a seguir
+            if frame.flags & protocol.FLAG_PUSH or frame.msg_type in (const.subscribe, const.join_game):
+                self.apply_push(frame)
+            if not frame.flags & protocol.FLAG_PUSH:
+                self.replies[frame.request_id] = frame
+
+    def apply_push(self, frame: protocol.Frame):
+        """
+        Aplica um 'frame' difundido pelo servidor (ou o snapshot da subscrição) à cópia local do estado.
+        :param frame: O 'frame' recebido
+        :return: None
+        """
+        if self.mirror is None:
+            return
+        if frame.msg_type == const.delta:
+            self.mirror.apply_delta(frame.payload)
+        elif frame.msg_type == const.subscribe:
+            self.mirror.apply_snapshot(frame.payload)
+        elif frame.msg_type == const.join_game:
+            self.mirror.apply_snapshot(codec.decode_join(frame.payload)[-1])
+
+    def wait_frame(self, request_id: int) -> protocol.Frame:
+        """
+        Lê do 'socket' até chegar a resposta ao pedido indicado. Respostas a outros pedidos ficam guardadas.
+        :param request_id: O id do pedido
+        :return: O 'frame' da resposta
+        """
+        while request_id not in self.replies:
+            self.receive()
+        frame = self.replies.pop(request_id)
+        if frame.msg_type == const.ERROR:
+            raise protocol.ProtocolError(bytes(frame.payload).decode(const.STRING_ENCODING))
+        return frame
+
+    def wait_reply(self, request_id: int):
+        """
+        Lê do 'socket' até chegar a resposta ao pedido indicado. Respostas a outros pedidos ficam guardadas.
+        :param request_id: O id do pedido
+        :return: O payload da resposta (memoryview)
+        """
+        return self.wait_frame(request_id).payload
+
+    def request(self, msg_type: int, payload=b""):
+        """
+        Envia um pedido e espera pela resposta.
+        :param msg_type: O tipo da mensagem
+        :param payload: Os bytes do pedido
+        :return: O payload da resposta
+        """
+        return self.wait_reply(self.send_request(msg_type, payload))
+
+    def pipeline(self, requests: list) -> list:
+        """
+        Envia vários pedidos de uma só vez e só depois espera pelas respostas, numa única ida e volta.
+        :param requests: Lista de tuplos (tipo da mensagem, payload)
+        :return: Lista com os payloads das respostas, pela ordem dos pedidos
+        """
+        frames = []
+        request_ids = []
+        for msg_type, payload in requests:
+            request_id = self.next_request_id
+            self.next_request_id += 1
+            frames.append(protocol.encode_frame(msg_type, payload, request_id))
+            request_ids.append(request_id)
+        self.s.sendall(b"".join(frames))
+        return [self.wait_reply(request_id) for request_id in request_ids]
+
+    def conditional_request(self, msg_type: int, decode, apply_delta=None):
+        """
+        Envia um pedido condicional com a versão dos dados que o cliente já tem. Se nada mudou, o servidor só responde
+        com a versão e o valor guardado é reutilizado; se vier um delta, é aplicado ao valor guardado.
+        :param msg_type: O tipo da mensagem
+        :param decode: Função que descodifica os dados completos
+        :param apply_delta: Função que recebe o valor guardado e o delta e devolve o novo valor
+        :return: O valor atual dos dados
+        """
+        cached = self.versions.get(msg_type)
+        held = cached[0] if cached is not None else protocol.NO_VERSION
+        frame = self.wait_frame(self.send_request(msg_type, protocol.VERSION.pack(held)))
+        version, = protocol.VERSION.unpack_from(frame.payload, 0)
+        body = frame.payload[protocol.VERSION.size:]
+        if frame.flags & protocol.FLAG_NOT_MODIFIED:
+            value = cached[1]
+        elif frame.flags & protocol.FLAG_DELTA:
+            value = apply_delta(cached[1], body)
+        else:
+            value = decode(body)
+        self.versions[msg_type] = (version, value)
+        return value
+
+    def subscribe(self) -> StateMirror:
+        """
+        Subscreve as atualizações do servidor. A resposta é um snapshot completo do estado; a partir daí o servidor
+        envia um delta por tick, aplicado à cópia local por 'poll_updates' (ou enquanto se espera por respostas).
+        Se o cliente já subscreveu (por exemplo ao entrar com 'join_game'), devolve a cópia local que já tem.
+        :return: A cópia local do estado
+        """
+        if self.mirror is not None:
+            return self.mirror
+        self.mirror = StateMirror()
+        self.request(const.subscribe)
+        return self.mirror
+
+    def poll_updates(self):
+        """
+        Processa, sem bloquear, todos os 'frames' que já chegaram do servidor.
+        :return: None
+        """
+        while select.select([self.s], [], [], 0)[0]:
+            self.receive()
+
+    def send_move(self, move: int):
+        """
+        Envia um movimento do jogador sem esperar pela resposta; a nova posição chega pelos deltas.
+        :param move: Um número inteiro representando o movimento
+        :return: None
+        """
+        self.send_request(const.move, protocol.MOVE.pack(move, protocol.OBJ_PLAYER))
+
+    def send_execute(self, move: int) -> int:
+        """
+        Envia um movimento do jogador sem esperar pela resposta. A resposta, com a posição do jogador depois de o tick
+        aplicar o movimento, fica guardada até ser pedida por 'take_reply'.
+        :param move: Um número inteiro representando o movimento
+        :return: O id do pedido
+        """
+        return self.send_request(const.execute, protocol.MOVE.pack(move, protocol.OBJ_PLAYER))
+
+    def take_reply(self, request_id: int):
+        """
+        Retira a resposta a um pedido se já tiver chegado, sem ler do 'socket'.
+        :param request_id: O id do pedido
+        :return: O payload da resposta (memoryview), ou None se ainda não chegou
+        """
+        frame = self.replies.pop(request_id, None)
+        if frame is not None and frame.msg_type == const.ERROR:
+            raise protocol.ProtocolError(bytes(frame.payload).decode(const.STRING_ENCODING))
+        return frame.payload if frame is not None else None
 
     def dimension_size(self):
         """
@@ -16,16 +192,10 @@ class StubClient:
         :return: Valores x_max e y_max recebidos do servidor
         """
         print("getting dimensions")
-        msg = const.X_MAX
-        self.s.send(msg.encode(const.STRING_ENCODING))
-        value = self.s.recv(const.N_BYTES)
-        x_max = int.from_bytes(value, byteorder="big", signed=True)
-        print(x_max)
-        msg = const.Y_MAX
-        self.s.send(msg.encode(const.STRING_ENCODING))
-        value = self.s.recv(const.N_BYTES)
-        y_max = int.from_bytes(value, byteorder="big", signed=True)
-        print(y_max)
+        x_value, y_value = self.pipeline([(const.X_MAX, b""), (const.Y_MAX, b"")])
+        x_max = protocol.INT.unpack(x_value)[0]
+        y_max = protocol.INT.unpack(y_value)[0]
+        print(x_max, y_max)
         return x_max, y_max
 
     def get_players(self):
@@ -33,33 +203,33 @@ class StubClient:
         Envia uma mensagem ao servidor para obter os jogadores e retorne a lista de jogadores recebidos.
         :return: Lista de jogadores recebida do servidor
         """
-        msg = const.get_Players
-        self.s.send(msg.encode(const.STRING_ENCODING))
-        length_bytes = self.s.recv(4)
-        length = int.from_bytes(length_bytes, byteorder='big')
-        # Recebe os bytes do servidor
-        data_bytes = bytearray()
-        print("Received Data Length:", len(data_bytes))  # Imprime o comprimento dos dados recebidos para 'debug'
-        print("Received Data:", data_bytes)  # Imprime os dados recebidos para 'debug'
-        while len(data_bytes) < length:
-            chunk = self.s.recv(min(4096, length - len(data_bytes)))
-            if not chunk:
-                break
-            data_bytes.extend(chunk)
-        # Desserializa os dados recebidos e retorna-os
-        players = pickle.loads(data_bytes)
+        # Só são enviados os jogadores alterados desde o último pedido
+        players = self.conditional_request(const.get_Players, codec.decode_players, self.apply_players_delta)
         print(players)
         return players
 
+    @staticmethod
+    def apply_players_delta(players: dict, data) -> dict:
+        """
+        Aplica as alterações enviadas pelo servidor à lista de jogadores guardada.
+        :param players: A lista de jogadores guardada
+        :param data: O delta codificado por 'encode_players_delta'
+        :return: A nova lista de jogadores
+        """
+        changed, removed = codec.decode_players_delta(data)
+        players = dict(players)
+        for nr in removed:
+            players.pop(nr, None)
+        players.update(changed)
+        return players
+
     def get_nr_players(self):
         """
         Envia uma mensagem para o servidor para obter o número de jogadores e retornar o valor recebido.
         :return: Número de jogadores recebidos do servidor
         """
-        msg = const.get_nr_Players
-        self.s.send(msg.encode(const.STRING_ENCODING))
-        value = self.s.recv(const.N_BYTES)
-        nr_players = int.from_bytes(value, byteorder="big", signed=True)
+        value = self.request(const.get_nr_Players)
+        nr_players = protocol.INT.unpack(value)[0]
         return nr_players
 
     def get_obstacles(self):
@@ -67,22 +237,8 @@ class StubClient:
         Envia uma mensagem ao servidor para obter os obstáculos e retornar a lista de obstáculos recebidos.
         :return: Lista de obstáculos recebida do servidor
         """
-        msg = const.get_Obstacles
-        self.s.send(msg.encode(const.STRING_ENCODING))
-
-        # Recebe o comprimento do fluxo de bytes do servidor
-        length_bytes = self.s.recv(4)
-        length = int.from_bytes(length_bytes, byteorder='big')
-
-        # Recebe os bytes do servidor
-        data_bytes = b''
-        while len(data_bytes) < length:
-            chunk = self.s.recv(length - len(data_bytes))
-            if not chunk:
-                break
-            data_bytes += chunk
-        # Desserializa os dados recebidos e retorna-os
-        obstacles = pickle.loads(data_bytes)
+        # Os obstáculos não mudam durante o jogo: depois do primeiro pedido o servidor só confirma a versão
+        obstacles = self.conditional_request(const.get_Obstacles, codec.decode_walls)
         print(obstacles)
         return obstacles
 
@@ -91,25 +247,45 @@ class StubClient:
         Envia uma mensagem ao servidor para obter o número de obstáculos e retornar o valor recebido.
         :return: Número de obstáculos recebidos do servidor
         """
-        msg = const.get_nr_Obstacles
-        self.s.send(msg.encode(const.STRING_ENCODING))
-        value = self.s.recv(const.N_BYTES)
-        nr_obstacles = int.from_bytes(value, byteorder="big", signed=True)
+        value = self.request(const.get_nr_Obstacles)
+        nr_obstacles = protocol.INT.unpack(value)[0]
         return nr_obstacles
 
+    def get_level(self):
+        """
+        Obtém o labirinto refazendo-o localmente a partir da semente enviada pelo servidor. Se a versão do gerador não
+        for suportada ou o 'checksum' não coincidir, descarrega a grelha e a meta do servidor. O labirinto fica
+        guardado, pelo que só o primeiro pedido (se o cliente não entrou com 'join_game') vai ao servidor.
+        :return: Um tuplo (largura, altura, 'bytearray' com um byte por quadrícula linha a linha, meta (x, y) ou None)
+        """
+        if self.level is None:
+            self.level = self.rebuild_level(*protocol.LEVEL.unpack(self.request(const.get_level)))
+        return self.level
+
+    def rebuild_level(self, seed: int, width: int, height: int, version: int, checksum: int) -> tuple:
+        """
+        Refaz o labirinto a partir da semente, ou descarrega-o se não for possível.
+        :return: Um tuplo (largura, altura, 'bytearray' com um byte por quadrícula linha a linha, meta (x, y) ou None)
+        """
+        if version == maze.GENERATOR_VERSION:
+            cells, finish = maze.generate_level(width, height, seed, version)
+            if maze.checksum(cells) == checksum:
+                return width, height, cells, finish
+        print(f"Could not rebuild the maze locally (seed {seed}, version {version}), downloading it")
+        data_bytes, finish_bytes = self.pipeline([(const.get_Obstacles, b""), (const.get_finish, b"")])
+        width, height, cells = codec.decode_grid(data_bytes)
+        finish = protocol.POSITION.unpack(finish_bytes)
+        return width, height, cells, finish if finish != (-1, -1) else None
+
     def get_finish(self):
-        msg = const.get_finish
-        self.s.send(msg.encode(const.STRING_ENCODING))
-        data = self.s.recv(const.N_BYTES)
-        finish = pickle.loads(data)  # Deserializing the received data
-        return finish
+        data = self.request(const.get_finish)
+        finish = protocol.POSITION.unpack(data)
+        # O servidor envia (-1, -1) quando não há meta
+        return finish if finish != (-1, -1) else None
 
     def get_game_status(self):
-        msg = const.get_status
-        self.s.send(msg.encode(const.STRING_ENCODING))
-        data = self.s.recv(const.N_BYTES)
-        finish = pickle.loads(data)  # Deserializing the received data
-        return finish
+        game_over, winner = self.conditional_request(const.get_status, protocol.STATUS.unpack)
+        return game_over, winner if winner >= 0 else None
 
     def execute(self, move: int, types: str, nr_player: int):
         """
@@ -119,33 +295,56 @@ class StubClient:
         :param nr_player: Um inteiro representando o número do jogador
         :return: Um tuplo que representa a nova posição do jogador ou dos obstáculos.
         """
-        msg = const.execute
-        msg += str(move)
-        if types == "player":
-            msg += "p"
-        self.s.send(msg.encode(const.STRING_ENCODING))
-
-        # Recebe os dados serializados
-        received_data = bytearray()
-        while True:
-            chunk = self.s.recv(4096)
-            if not chunk:
-                break
-            received_data.extend(chunk)
-            # print("Received Chunk:", chunk)  # Imprime o chunk recebido para 'debug'
-            if b"<END>" in received_data:
-                break
-
-        if len(received_data) > 0:
-            # Remove o valor sentinela dos dados recebidos
-            received_data = received_data.replace(b"<END>", b"")
-            # Desserializa os dados
-            decoded_data = pickle.loads(received_data)
-            # print(decoded_data)
-            if decoded_data is not None:
-                return decoded_data
-        # Retorna uma posição padrão se nenhum dado for recebido ou se decoded_data for None
-        return 0, 0
+        obj_type = protocol.OBJ_PLAYER if types == "player" else protocol.OBJ_NONE
+        data = self.request(const.execute, protocol.MOVE.pack(move, obj_type))
+        return protocol.POSITION.unpack(data)
+
+    def get_stats(self) -> dict:
+        """
+        Obtém as métricas do processo do servidor que serve a conexão (contadores e histogramas de latência).
+        :return: Dicionário com as métricas
+        """
+        return json.loads(bytes(self.request(const.get_stats)).decode(const.STRING_ENCODING))
+
+    def profile(self, action: int, seconds: int = 0) -> dict:
+        """
+        Pedido de administração: começa (PROFILE_CPU ou PROFILE_MEMORY) ou termina (PROFILE_STOP) uma sessão de
+        'profiling' no processo do servidor que serve a conexão.
+        :param action: A ação
+        :param seconds: A duração máxima da sessão
+        :return: Dicionário com a pasta da sessão ('directory') ou os ficheiros gravados ('files')
+        """
+        data = self.request(const.profile, protocol.PROFILE.pack(action, seconds))
+        return json.loads(bytes(data).decode(const.STRING_ENCODING))
+
+    def join_room(self, room_id: int = const.ROOM_AUTO) -> int:
+        """
+        Entra numa sala do servidor. Sem sala escolhida, o servidor atribui a primeira sala aberta.
+        :param room_id: O número da sala ou ROOM_AUTO
+        :return: O número da sala em que o cliente entrou
+        """
+        value = self.request(const.join_room, protocol.INT.pack(room_id))
+        return protocol.INT.unpack(value)[0]
+
+    def join_game(self, name: str, room_id: int = const.ROOM_AUTO) -> tuple:
+        """
+        Entra no jogo numa só ida e volta: o servidor junta o cliente a uma sala, cria o jogador, subscreve as
+        atualizações e responde com o estado inicial. O labirinto é refeito localmente a partir da semente (ou vem na
+        resposta, se o gerador do cliente não for o mesmo) e fica guardado para 'get_level'.
+        :param name: O nome do jogador
+        :param room_id: O número da sala ou ROOM_AUTO para a atribuição automática
+        :return: Um tuplo (número da sala, número do jogador)
+        """
+        self.mirror = StateMirror()
+        payload = codec.JOIN_REQUEST.pack(room_id, maze.GENERATOR_VERSION) + name.encode(const.STRING_ENCODING)
+        data = self.request(const.join_game, payload)
+        room_id, nr_player, level, finish, walls, snapshot = codec.decode_join(data)
+        if walls is not None:
+            width, height, cells = codec.decode_grid(walls)
+            self.level = (width, height, cells, finish)
+        else:
+            self.level = self.rebuild_level(*level)
+        return room_id, nr_player
 
     def add_player(self, name) -> int:
         """
@@ -153,24 +352,24 @@ class StubClient:
         :param name: Uma ‘string’ representando o nome do jogador.
         :return: Um inteiro representando o número do jogador.
         """
-        msg = const.new_Player
-        if len(name) < 3:
-            msg += name
-        print(msg)
-        print(msg[0:2])
-        self.s.send(msg.encode(const.STRING_ENCODING))
-        value = self.s.recv(const.N_BYTES)
-        nr_player = int.from_bytes(value, byteorder="big", signed=True)
+        value = self.request(const.new_Player, name.encode(const.STRING_ENCODING))
+        nr_player = protocol.INT.unpack(value)[0]
         return nr_player
 
+    def request_fog(self) -> list:
+        """
+        Pede ao servidor as linhas do labirinto reveladas ao jogador desde o último pedido.
+        :return: Lista de tuplos (y, 'bytearray' com um byte por quadrícula da linha)
+        """
+        width, rows = codec.decode_rows(self.request(const.get_fog))
+        return rows
+
     def request_maze(self):
         """
         Requests the current maze representation from the server and saves it as 'maze.json'.
         """
-        msg = "get_maze"
-        self.s.send(msg.encode(const.STRING_ENCODING))
-        data = self.s.recv(4096)  # Adjust buffer size as needed
-        maze_representation = data.decode(const.STRING_ENCODING)
+        data = self.request(const.get_maze)
+        maze_representation = bytes(data).decode(const.STRING_ENCODING)
 
         # Save to a file
         with open("maze.json", "w") as file:
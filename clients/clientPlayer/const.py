@@ -1,21 +1,37 @@
 ADDRESS = '127.0.0.1'
 PORT = 8000
 COMMAND_SIZE = 5
-END = "END  "
 MSG_SIZE = 40
 N_BYTES = 18
-BUFFER_SIZE = 1024
+BUFFER_SIZE = 65536
 STRING_ENCODING = 'utf-8'
-X_MAX = "max x"
-Y_MAX = "max y"
-get_Players = "gt_Pl"
-get_nr_Players = "g_n_P"
-get_Obstacles = "gt_Ob"
-get_nr_Obstacles = "g_n_O"
-execute = "e"
-new_Player = "np"
-get_finish = "gt_fn"
-get_status = "gt_st"
+
+# Tipos de mensagem do protocolo binário (ver protocol.py)
+X_MAX = 1
+Y_MAX = 2
+get_Players = 3
+get_nr_Players = 4
+get_Obstacles = 5
+get_nr_Obstacles = 6
+execute = 7
+new_Player = 8
+get_finish = 9
+get_status = 10
+get_maze = 11
+END = 12
+subscribe = 13
+delta = 14
+move = 15
+get_level = 16
+join_room = 17
+get_fog = 18
+join_game = 19
+get_stats = 20
+profile = 21
+ERROR = 255
+
+# Número de sala que pede a atribuição automática
+ROOM_AUTO = -1
 
 # Definição de constantes para os movimentos
 M_UP = 0
@@ -23,3 +39,16 @@ M_RIGHT = 1
 M_DOWN = 2
 M_LEFT = 3
 TIME_STEP = 7.5
+
+# Tipos de evento enviados nos deltas aos clientes subscritos
+EV_MOVE = 1
+EV_JOIN = 2
+EV_LEAVE = 3
+EV_GAME_OVER = 4
+# Jogador que entra ou sai da área de interesse do cliente (ver InterestGrid)
+EV_ENTER = 5
+EV_EXIT = 6
+
+# Movimentos previstos e ainda por confirmar, no máximo: o tamanho da fila de movimentos de cada jogador no servidor
+# (um movimento a mais seria rejeitado)
+INPUT_QUEUE_SIZE = 4
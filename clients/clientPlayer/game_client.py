@@ -1,8 +1,9 @@
 # Seção de Importações
 import pygame
-from wall import Wall
+import assets
 from player import Player
 import client_stub
+from client_network import NetworkThread
 
 """
 A grelha agora é construída com base no número de quadrados em x e y.
@@ -12,20 +13,31 @@ Além disso, agora podemos controlar o movimento dos objetos.
 Agora separamos o controlo do ambiente
 """
 
+# Tamanho máximo da janela, em pixels: num labirinto maior, a janela mostra a parte à volta do jogador
+VIEW_SIZE = (800, 600)
+# Limite de 'frames' por segundo do ciclo de desenho, que deixa tempo de processador à 'thread' de rede
+FPS = 60
+
 
 class GameUI(object):
-    def __init__(self, stub: client_stub.StubClient, player_id, player_name, grid_size: int = 20):
-        dim: tuple = stub.dimension_size()
-        self.x_max = dim[0]
-        self.y_max = dim[1]
+    def __init__(self, stub: client_stub.StubClient, player_id, player_name, grid_size: int = 20,
+                 view_size: tuple = VIEW_SIZE):
+        # As dimensões vêm do labirinto já recebido na entrada no jogo (ver StubClient.join_game)
+        self.x_max, self.y_max = stub.get_level()[:2]
         self.stub = stub
-        self.width, self.height = self.x_max * grid_size, self.y_max * grid_size
+        # A janela mostra o labirinto inteiro se couber, ou a parte vista pela câmara (ver update_camera)
+        self.width = min(self.x_max * grid_size, view_size[0])
+        self.height = min(self.y_max * grid_size, view_size[1])
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("Labyrinth Runners 2 - Player: " + player_name)
         self.clock = pygame.time.Clock()
         self.white = (255, 255, 255)
         self.black = (0, 0, 0)
         self.grid_size = grid_size
+        # Número de quadrículas (inteiras ou não) que cabem na janela e canto superior esquerdo da parte visível
+        self.view_cols = -(-self.width // grid_size)
+        self.view_rows = -(-self.height // grid_size)
+        self.camera = None
         self.background = pygame.Surface(self.screen.get_size())
         self.background = self.background.convert()
         self.background.fill(self.white)
@@ -35,91 +47,152 @@ class GameUI(object):
         self.player_name = player_name
         self.players = pygame.sprite.LayeredDirty()
         self.players_dict = {}
+        # Previsão dos movimentos do próprio jogador (ver MovePredictor), ativa durante 'run'
+        self.predictor = None
         self.visited_y_coords = set()
+        # Linhas visíveis: as exteriores, as exploradas e as vizinhas da linha do jogador (ver update_fog)
+        self.visible_rows = set()
 
-        self.draw_grid(self.black)
         self.last_player_y = 0
         self.last_player_x = 0
 
-    def draw_grid(self, colour: tuple):
-        current_player_y = None
+    def update_camera(self) -> bool:
+        """
+        Centra a câmara no jogador, sem sair dos limites do labirinto.
+        :return: Verdadeiro se a câmara se moveu
+        """
+        x, y = self.players_dict[self.player_id].cell if self.player_id in self.players_dict else (0, 0)
+        camera = (max(0, min(x - self.view_cols // 2, self.x_max - self.view_cols)),
+                  max(0, min(y - self.view_rows // 2, self.y_max - self.view_rows)))
+        if camera == self.camera:
+            return False
+        self.camera = camera
+        return True
+
+    def render_row(self, y: int) -> pygame.Rect:
+        """
+        Desenha no fundo a parte visível de uma linha do labirinto: chão, paredes, meta e grelha, ou a escuridão nas
+        quadrículas de uma linha por explorar (as colunas exteriores estão sempre visíveis). As paredes são procuradas
+        na grelha do labirinto pela quadrícula, pelo que só as que estão na janela são desenhadas.
+        :param y: A linha
+        :return: O retângulo do ecrã ocupado pela linha
+        """
+        g = self.grid_size
+        cam_x, cam_y = self.camera
+        top = (y - cam_y) * g
+        row = pygame.Rect(0, top, self.width, g)
+        self.background.fill((200, 200, 200), row)
+        explored = y in self.visible_rows
+        base = y * self.x_max
+        for x in range(cam_x, min(self.x_max, cam_x + self.view_cols)):
+            left = (x - cam_x) * g
+            if not explored and 0 < x < self.x_max - 1:
+                self.background.fill(self.black, (left, top, g, g))
+                continue
+            if self.cells[base + x]:
+                self.background.blit(self.wall_image, (left, top))
+            elif (x, y) == self.finish_cell:
+                self.background.blit(self.finish_image, (left, top))
+            pygame.draw.line(self.background, self.black, (left, top), (left + g, top))
+            pygame.draw.line(self.background, self.black, (left, top), (left, top + g))
+        return row
+
+    def render_view(self):
+        """
+        Redesenha o fundo inteiro depois de a câmara se mover. O custo depende do tamanho da janela e não do
+        labirinto.
+        :return: None
+        """
+        cam_y = self.camera[1]
+        for y in range(cam_y, min(self.y_max, cam_y + self.view_rows)):
+            self.render_row(y)
+        self.players.repaint_rect(self.screen.get_rect())
+
+    def update_fog(self):
+        """
+        Atualiza as linhas visíveis e a câmara depois de o jogador se mover. Se a câmara se mexeu, a janela é
+        redesenhada; senão, só as linhas visíveis cuja visibilidade mudou.
+        :return: None
+        """
+        visible = {0, self.y_max - 1} | self.visited_y_coords
         if self.player_id in self.players_dict:
-            current_player_y = self.players_dict[self.player_id].rect.y // self.grid_size
-
-        for x in range(0, self.x_max):
-            for y in range(0, self.y_max):
-                # Always draw the exterior walls
-                if x == 0 or y == 0 or x == self.x_max - 1 or y == self.y_max - 1:
-                    pygame.draw.line(self.screen, colour, (x * self.grid_size, y * self.grid_size),
-                                     ((x + 1) * self.grid_size, y * self.grid_size))
-                    pygame.draw.line(self.screen, colour, (x * self.grid_size, y * self.grid_size),
-                                     (x * self.grid_size, (y + 1) * self.grid_size))
-                elif current_player_y is not None and (y in self.visited_y_coords or
-                                                       y == current_player_y or
-                                                       y == current_player_y - 1 or
-                                                       y == current_player_y + 1):
-                    # Draw grid lines for visited, current, and adjacent Y-coordinates
-                    pygame.draw.line(self.screen, colour, (x * self.grid_size, y * self.grid_size),
-                                     ((x + 1) * self.grid_size, y * self.grid_size))
-                    pygame.draw.line(self.screen, colour, (x * self.grid_size, y * self.grid_size),
-                                     (x * self.grid_size, (y + 1) * self.grid_size))
-                else:
-                    # Draw darkness for unvisited cells
-                    dark_surface = pygame.Surface((self.grid_size, self.grid_size))
-                    dark_surface.set_alpha(255)  # Adjust alpha for darkness intensity
-                    dark_surface.fill((0, 0, 0))  # Black color
-                    self.screen.blit(dark_surface, (x * self.grid_size, y * self.grid_size))
+            current_player_y = self.players_dict[self.player_id].cell[1]
+            visible.update((current_player_y - 1, current_player_y, current_player_y + 1))
+        changed = visible.symmetric_difference(self.visible_rows)
+        self.visible_rows = visible
+        if self.update_camera():
+            self.render_view()
+            return
+        cam_y = self.camera[1]
+        for y in changed:
+            if cam_y <= y < min(self.y_max, cam_y + self.view_rows):
+                self.players.repaint_rect(self.render_row(y))
 
-    def set_players(self):
+    def place_players(self):
         """
-        Coloca os jogadores no ecrã
+        Coloca os 'sprites' dos jogadores no ecrã conforme a câmara. Os jogadores fora da janela ou em linhas por
+        explorar ficam escondidos.
         :return: None
         """
-        self.pl = self.stub.get_players()
-        nr_players = self.stub.get_nr_players()
+        g = self.grid_size
+        cam_x, cam_y = self.camera
+        for player in self.players_dict.values():
+            x, y = player.cell
+            topleft = ((x - cam_x) * g, (y - cam_y) * g)
+            if player.rect.topleft != topleft:
+                player.rect.topleft = topleft
+                player.dirty = 1
+            # Mudar a visibilidade marca o 'sprite' para ser redesenhado (ou apagado) no próximo 'draw'
+            shown = int(y in self.visible_rows and cam_x <= x < cam_x + self.view_cols
+                        and cam_y <= y < cam_y + self.view_rows)
+            if player.visible != shown:
+                player.visible = shown
 
-        existing_players = list(self.pl.keys())  # Get the existing player numbers
+    def draw(self) -> list:
+        """
+        Desenha um 'frame': só os retângulos alterados (linhas destapadas, jogadores que se moveram ou a janela
+        inteira depois de a câmara se mover) são redesenhados.
+        :return: Lista com os retângulos do ecrã a enviar para a janela
+        """
+        self.place_players()
+        return self.players.draw(self.screen)
 
-        for nr in range(nr_players):
-            if nr in existing_players:
-                p_x, p_y = self.pl[nr][1][0], self.pl[nr][1][1]
-                if nr not in self.players_dict:  # This player is new
-                    player = Player(nr, self.pl[nr][0], p_x, p_y, self.grid_size)
-                    self.players_dict[nr] = player  # Store the player object in self.players_dict
-                else:
-                    player = self.players_dict[nr]  # This player already exists
-                    # Here, you can update player's attributes if needed
+    def set_players(self):
+        """
+        Coloca os jogadores no ecrã, a partir da cópia local do estado mantida pelos deltas do servidor
+        :return: None
+        """
+        self.pl = self.mirror.get_players()
+        # O próprio jogador é desenhado na posição prevista, sem esperar pela confirmação do servidor
+        if self.predictor is not None and self.player_id in self.pl:
+            self.pl[self.player_id] = (self.pl[self.player_id][0], self.predictor.get_position())
+
+        for nr, (name, (p_x, p_y)) in self.pl.items():
+            if nr not in self.players_dict:  # This player is new
+                player = Player(nr, name, p_x, p_y, self.grid_size)
+                self.players_dict[nr] = player  # Store the player object in self.players_dict
                 self.players.add(player)
             else:
-                # Player disconnected, remove from self.pl and self.players_dict
-                self.pl.pop(nr, None)
-                if nr in self.players_dict:
-                    self.players_dict.pop(nr)
+                player = self.players_dict[nr]  # This player already exists
+                if player.cell != (p_x, p_y):
+                    player.moveto(p_x, p_y)
 
-        print(f"Players: {self.pl}")
+        # Players that disconnected are no longer in the mirror
+        for nr in list(self.players_dict):
+            if nr not in self.pl:
+                self.players_dict.pop(nr).kill()
 
     def set_walls(self, wall_size: int):
         """
-        Desenha as paredes no ecrã
+        Prepara o desenho das paredes a partir do labirinto refeito localmente (ver StubClient.get_level). As paredes
+        não são 'sprites': a grelha do labirinto, com um byte por quadrícula, serve de índice das paredes por
+        quadrícula (ver render_row).
         :param wall_size: Tamanho das paredes
         :return: None
         """
-        self.wl = self.stub.get_obstacles()
-        # Cria as paredes (sprites) ao redor do mundo
-        self.walls = pygame.sprite.Group()
-        nr_obstacles = self.stub.get_nr_obstacles()
-        for nr in range(nr_obstacles):
-            if self.wl[nr]:
-                w_x, w_y = self.wl[nr][1][0], self.wl[nr][1][1]
-                wall = Wall(w_x, w_y, self.grid_size, self.walls)
-                self.walls.add(wall)
-
-    def draw_finish(self, image_path):
-        """Desenha a imagem final(portal)"""
-        x, y = self.finish_cell
-        finish_image = pygame.image.load(image_path)
-        finish_image = pygame.transform.scale(finish_image, (self.grid_size, self.grid_size))
-        self.screen.blit(finish_image, (x * self.grid_size, y * self.grid_size))
+        width, height, self.cells, self.finish_cell = self.stub.get_level()
+        self.wall_image = assets.load_scaled('wall.jpg', wall_size)
+        self.finish_image = assets.load_image('portal.png', (self.grid_size, self.grid_size))
 
     def run(self):
         """
@@ -132,24 +205,24 @@ class GameUI(object):
         width, height = window_size
 
         self.set_walls(self.grid_size)
-        self.walls.draw(self.screen)
+        # O servidor passa a enviar o estado: snapshot agora e deltas por tick, aplicados pela 'thread' de rede. A
+        # partir daqui o ciclo de desenho só lê a cópia local do estado e não espera pela rede.
+        self.network = NetworkThread(self.stub, self.player_id)
+        self.mirror = self.network.mirror
+        self.predictor = self.network.predictor
         self.set_players()
+        self.update_fog()
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.flip()
+        self.players.clear(self.screen, self.background)
         end = False
-        nr_players = self.stub.get_nr_players()
-
-        # O mundo é atualizado constantemente
-        world = dict()
-
-        self.finish_cell = self.stub.get_finish()
+        result_shown = False
+        self.network.start()
 
         while not end:
 
-            game_over, winner = self.stub.get_game_status()
-
-            # Update visited Y-coordinates
-            for player in self.players_dict.values():
-                player_y = player.rect.y // self.grid_size
-                self.visited_y_coords.update({player_y, player_y - 1, player_y + 1})
+            game_over, winner = self.mirror.get_game_status()
+            self.set_players()
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -162,37 +235,24 @@ class GameUI(object):
                     end = True
 
             # Get the current coordinates of the player
-            current_x = self.players_dict[self.player_id].rect.x // self.grid_size
-            current_y = self.players_dict[self.player_id].rect.y // self.grid_size
+            current_x, current_y = self.players_dict[self.player_id].cell
 
-            # Request maze data from the server if the player moves within the known areas
-            if (current_x, current_y) != (self.last_player_x, self.last_player_y):
-                self.stub.request_maze()
+            # The network thread asks the server for the rows revealed to this player when it moves
+            revealed = self.network.take_revealed()
+            if revealed or (current_x, current_y) != (self.last_player_x, self.last_player_y):
+                self.visited_y_coords.update(revealed)
                 self.last_player_x = current_x
                 self.last_player_y = current_y
-
-            new_nr_players = self.stub.get_nr_players()
-            if new_nr_players > nr_players:
-                for nr in range(nr_players, new_nr_players):
-                    if nr in self.pl and self.pl[nr] != []:
-                        p_x, p_y = self.pl[nr][1][0], self.pl[nr][1][1]
-                        player = Player(nr, self.pl[nr][0], p_x, p_y, self.grid_size, self.players)
-                        self.players.add(player)
-                nr_players = new_nr_players
+                self.update_fog()
 
             if not game_over:
-                self.walls.draw(self.screen)
-                if self.finish_cell is not None:
-                    self.draw_finish(r"pictures/portal.png")
-                self.players.update(self.stub)
-                self.players.draw(self.screen)
-                self.draw_grid(self.black)
-                pygame.display.flip()
-                self.players.clear(self.screen, self.background)
-                self.screen.fill((200, 200, 200))
+                self.players_dict[self.player_id].update(self.network)
+                rects = self.draw()
+                if rects:
+                    pygame.display.update(rects)
 
-            else:
-                if self.player_id == self.stub.get_game_status()[1]:
+            elif not result_shown:
+                if self.player_id == winner:
                     message = f"{self.player_name}, congratulations you won!"
                 else:
                     message = "You lost!"
@@ -202,4 +262,10 @@ class GameUI(object):
                 text_rect = text.get_rect(center=(width // 2, height // 2))
                 self.screen.blit(text, text_rect)
                 pygame.display.flip()
+                result_shown = True
+
+            if self.network.error is not None:
+                end = True
+            self.clock.tick(FPS)
+        self.network.shutdown()
         return True
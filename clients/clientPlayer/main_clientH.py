@@ -1,5 +1,7 @@
 # Seção de Importações
+import sys
 import pygame
+import const
 from client_stub import StubClient
 from game_client import GameUI
 
@@ -12,7 +14,10 @@ def main():
     pygame.display.set_mode((800, 600), pygame.RESIZABLE)
     # Cria uma instância nova da class StubClient
     stub = StubClient()
-    player_id = stub.add_player(player_name)
+    # A sala pode ser indicada na linha de comandos: python main_clientH.py [sala]
+    # Entra na sala, cria o jogador e recebe o estado inicial num só pedido
+    room_id, player_id = stub.join_game(player_name, int(sys.argv[1]) if len(sys.argv) > 1 else const.ROOM_AUTO)
+    print(f"Joined room {room_id}")
     # Cria uma instância da classe GameUI, passando o stub como parâmetro
     ui = GameUI(stub, player_id, player_name)
     # Inicia a User Interface
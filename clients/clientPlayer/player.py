@@ -1,8 +1,9 @@
 # Seção de Importações
 import pygame
-import client_stub
+import client_network
 import const as co
-import os
+import assets
+import time
 
 
 class Player(pygame.sprite.DirtySprite):
@@ -19,15 +20,15 @@ class Player(pygame.sprite.DirtySprite):
         super().__init__(*groups)
         self.number = number
         self.name = name
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        image_dir = os.path.join(current_dir, 'pictures', 'player.gif')
-        self.image = pygame.image.load(image_dir)
-        initial_size = self.image.get_size()
         self.sq_size = sq_size
-        size_rate = sq_size / initial_size[0]
-        self.new_size = (int(self.image.get_size()[0] * size_rate), int(self.image.get_size()[1] * size_rate))
-        self.image = pygame.transform.scale(self.image, self.new_size)
+        # Imagem partilhada por todos os jogadores (ver assets.py)
+        self.image = assets.load_scaled('player.gif', sq_size)
+        self.new_size = self.image.get_size()
         self.rect = pygame.rect.Rect((pos_x * sq_size, pos_y * sq_size), self.image.get_size())
+        # Posição na grelha (o 'rect' é a posição no ecrã, que depende da câmara da GameUI)
+        self.cell = (pos_x, pos_y)
+        # Instante do último movimento enviado, para não enviar mais movimentos do que o servidor aceita
+        self.last_move = 0.0
 
     def get_size(self):
         """
@@ -46,36 +47,33 @@ class Player(pygame.sprite.DirtySprite):
         :param new_y:
         :return:
         """
+        self.cell = (new_x, new_y)
         self.rect.x = new_x * self.sq_size
         self.rect.y = new_y * self.sq_size
         # Keep visible
         self.dirty = 1
 
-    def update(self, stub: client_stub.StubClient):
+    def update(self, stub: client_network.NetworkThread):
         """
-        Atualiza a posição do jogador.
-        :param stub: O stub do cliente para se comunicar com o servidor
+        Envia ao servidor os movimentos correspondentes às teclas premidas. Não espera pela resposta: cada movimento
+        é previsto localmente e a GameUI desenha logo o jogador na posição prevista (ver MovePredictor).
+        :param stub: A camada de rede do cliente, que põe os movimentos na fila de envio
         :return: None
         """
-        # last = self.rect.copy()
-        # print("Updating player ", self.name, " with the number ", self.number)
+        now = time.monotonic()
+        if now - self.last_move < 1 / co.TIME_STEP:
+            return
+        # No máximo um movimento por tick, o que o servidor aplica: com duas teclas premidas, só conta a primeira
         key = pygame.key.get_pressed()
         if key[pygame.K_LEFT]:
-            pos = stub.execute(co.M_LEFT, "player", self.number)
-            if self.rect.x != pos[0]:
-                self.rect.x = pos[0] * self.sq_size
-        if key[pygame.K_RIGHT]:
-            pos = stub.execute(co.M_RIGHT, "player", self.number)
-            if self.rect.x != pos[0]:
-                self.rect.x = pos[0] * self.sq_size
-        if key[pygame.K_UP]:
-            pos = stub.execute(co.M_UP, "player", self.number)
-            if self.rect.y != pos[1]:
-                self.rect.y = pos[1] * self.sq_size
-        if key[pygame.K_DOWN]:
-            pos = stub.execute(co.M_DOWN, "player", self.number)
-            if self.rect.y != pos[1]:
-                self.rect.y = pos[1] * self.sq_size
-
-        # Keep visible
-        self.dirty = 1
+            stub.send_move(co.M_LEFT)
+            self.last_move = now
+        elif key[pygame.K_RIGHT]:
+            stub.send_move(co.M_RIGHT)
+            self.last_move = now
+        elif key[pygame.K_UP]:
+            stub.send_move(co.M_UP)
+            self.last_move = now
+        elif key[pygame.K_DOWN]:
+            stub.send_move(co.M_DOWN)
+            self.last_move = now
@@ -0,0 +1,86 @@
+# Seção de Importações
+import threading
+import const
+
+# Deslocamento de cada movimento
+MOVES = {const.M_UP: (0, -1), const.M_RIGHT: (1, 0), const.M_DOWN: (0, 1), const.M_LEFT: (-1, 0)}
+
+
+class MovePredictor:
+    def __init__(self, level: tuple, position: tuple):
+        """
+        Previsão dos movimentos do próprio jogador. Cada movimento recebe um número de sequência e é aplicado logo à
+        posição prevista, com as paredes do labirinto local e a mesma regra do servidor (um movimento contra uma
+        parede deixa o jogador onde está). Quando o servidor confirma um movimento com a posição resultante, essa
+        posição passa a ser a base e os movimentos ainda por confirmar são aplicados de novo sobre ela: o servidor
+        continua a decidir a posição, mas o jogador vê o seu movimento sem esperar pela resposta.
+        Usado pelo ciclo de desenho ('predict', 'get_position') e pela 'thread' de rede ('acknowledge').
+        :param level: O labirinto (largura, altura, grelha, meta), ver StubClient.get_level
+        :param position: A posição inicial do jogador, confirmada pelo servidor
+        """
+        self.width, self.height, self.cells, _ = level
+        self.lock = threading.Lock()
+        # Última posição confirmada pelo servidor, depois dos movimentos confirmados por ordem
+        self.confirmed = position
+        self.next_seq = 1
+        # Movimentos por confirmar, por ordem: lista de tuplos (sequência, movimento)
+        self.pending = []
+        # Posição prevista: a última confirmada com os movimentos por confirmar aplicados
+        self.position = position
+
+    def next_position(self, position: tuple, move: int) -> tuple:
+        """
+        Calcula a posição resultante de um movimento, como GameMech.next_position no servidor.
+        :param position: A posição atual
+        :param move: Movimento a ser executado
+        :return: A nova posição
+        """
+        dx, dy = MOVES.get(move, (0, 0))
+        x, y = position[0] + dx, position[1] + dy
+        # As posições fora do tabuleiro contam como parede
+        if not (0 <= x < self.width and 0 <= y < self.height) or self.cells[y * self.width + x]:
+            return position
+        return x, y
+
+    def predict(self, move: int) -> int:
+        """
+        Aplica um movimento à posição prevista e guarda-o até ser confirmado.
+        :param move: Movimento a ser executado
+        :return: O número de sequência atribuído ao movimento
+        """
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.pending.append((seq, move))
+            self.position = self.next_position(self.position, move)
+        return seq
+
+    def acknowledge(self, seq: int, position: tuple):
+        """
+        Reconcilia a previsão com a posição dada pelo servidor depois de aplicar (ou rejeitar) o movimento 'seq'.
+        O servidor aplica os movimentos de um jogador por ordem, mas responde logo a um movimento rejeitado por a fila
+        do jogador estar cheia (GameMech.queue_move), com a posição anterior aos movimentos em espera. Essa resposta
+        chega antes das dos movimentos anteriores: o movimento é retirado e a posição confirmada mantém-se.
+        :param seq: O número de sequência do movimento confirmado
+        :param position: A posição do jogador no servidor depois desse movimento
+        :return: None
+        """
+        with self.lock:
+            index = next((i for i, (s, _) in enumerate(self.pending) if s == seq), None)
+            if index is None:
+                return
+            del self.pending[index]
+            if index == 0:
+                self.confirmed = position
+            position = self.confirmed
+            for _, move in self.pending:
+                position = self.next_position(position, move)
+            self.position = position
+
+    def count_pending(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+    def get_position(self) -> tuple:
+        with self.lock:
+            return self.position
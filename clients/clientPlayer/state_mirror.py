@@ -0,0 +1,66 @@
+# Seção de Importações
+import threading
+import codec
+import const
+
+
+class StateMirror:
+    def __init__(self):
+        """
+        Cópia local do estado do jogo, mantida a partir do snapshot e dos deltas enviados pelo servidor, para que a
+        interface não tenha de pedir o estado em cada 'frame'. Pode ser atualizada por uma 'thread' de rede (ver
+        NetworkThread) enquanto é lida pelo ciclo de desenho.
+        """
+        self.lock = threading.Lock()
+        # Jogadores: {número: [nome, (x, y)]}
+        self.players = {}
+        self.game_over = False
+        self.winner = None
+        self.tick = 0
+
+    def apply_snapshot(self, data):
+        """
+        Substitui o estado local pelo snapshot recebido.
+        :param data: O payload do snapshot
+        :return: None
+        """
+        tick, players, game_over, winner = codec.decode_snapshot(data)
+        with self.lock:
+            self.players = {nr: [p[0], p[1]] for nr, p in players.items()}
+            self.game_over = game_over
+            self.winner = winner
+            self.tick = tick
+
+    def apply_delta(self, data):
+        """
+        Aplica os eventos de um delta ao estado local.
+        :param data: O payload do delta
+        :return: None
+        """
+        tick, events = codec.decode_events(data)
+        with self.lock:
+            for kind, nr, x, y, name in events:
+                if kind == const.EV_MOVE:
+                    if nr in self.players:
+                        self.players[nr][1] = (x, y)
+                elif kind in (const.EV_JOIN, const.EV_ENTER):
+                    self.players[nr] = [name, (x, y)]
+                elif kind in (const.EV_LEAVE, const.EV_EXIT):
+                    # Jogador que saiu do jogo ou da área de interesse do cliente
+                    self.players.pop(nr, None)
+                elif kind == const.EV_GAME_OVER:
+                    self.game_over = True
+                    self.winner = nr
+            self.tick = tick
+
+    def get_players(self) -> dict:
+        """
+        Copia os jogadores, para que possam ser percorridos enquanto o estado é atualizado.
+        :return: Dicionário {número: (nome, (x, y))}
+        """
+        with self.lock:
+            return {nr: (name, position) for nr, (name, position) in self.players.items()}
+
+    def get_game_status(self):
+        with self.lock:
+            return self.game_over, self.winner
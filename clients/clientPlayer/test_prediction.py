@@ -0,0 +1,59 @@
+# Seção de Importações
+import unittest
+import const
+from prediction import MovePredictor
+
+"""
+Testes da previsão dos movimentos do jogador (prediction.py). Utilização: python -m unittest test_prediction
+"""
+
+# Corredor de 5 x 3 com as quadrículas livres (1, 1), (2, 1) e (3, 1)
+WIDTH, HEIGHT = 5, 3
+CELLS = bytearray(b"\1\1\1\1\1"
+                  b"\1\0\0\0\1"
+                  b"\1\1\1\1\1")
+
+
+class MovePredictorTest(unittest.TestCase):
+    def setUp(self):
+        self.predictor = MovePredictor((WIDTH, HEIGHT, CELLS, (3, 1)), (1, 1))
+
+    def test_moves_are_applied_at_once(self):
+        self.predictor.predict(const.M_RIGHT)
+        self.assertEqual(self.predictor.get_position(), (2, 1))
+        # Contra a parede o jogador fica onde está, como no servidor
+        self.predictor.predict(const.M_UP)
+        self.assertEqual(self.predictor.get_position(), (2, 1))
+
+    def test_rejected_move_is_corrected(self):
+        first = self.predictor.predict(const.M_RIGHT)
+        self.predictor.predict(const.M_RIGHT)
+        # O servidor não aplicou o primeiro movimento: o segundo é aplicado de novo sobre a posição confirmada
+        self.predictor.acknowledge(first, (1, 1))
+        self.assertEqual(self.predictor.get_position(), (2, 1))
+        self.assertEqual(self.predictor.count_pending(), 1)
+
+    def test_dropped_move_acknowledged_out_of_order(self):
+        first = self.predictor.predict(const.M_RIGHT)
+        second = self.predictor.predict(const.M_RIGHT)
+        dropped = self.predictor.predict(const.M_LEFT)
+        self.assertEqual(self.predictor.get_position(), (2, 1))
+        # Fila cheia no servidor: o último movimento é respondido antes dos outros, com a posição anterior a eles
+        self.predictor.acknowledge(dropped, (1, 1))
+        self.assertEqual(self.predictor.get_position(), (3, 1))
+        # As respostas atrasadas dos movimentos em espera continuam a ser aplicadas
+        self.predictor.acknowledge(first, (2, 1))
+        self.assertEqual(self.predictor.get_position(), (3, 1))
+        self.predictor.acknowledge(second, (3, 1))
+        self.assertEqual(self.predictor.get_position(), (3, 1))
+        self.assertEqual(self.predictor.count_pending(), 0)
+
+    def test_unknown_acknowledgement_is_ignored(self):
+        seq = self.predictor.predict(const.M_RIGHT)
+        self.predictor.acknowledge(seq, (2, 1))
+        self.predictor.acknowledge(seq, (1, 1))
+        self.assertEqual(self.predictor.get_position(), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,37 @@
+import os
 import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(ROOT, "server")
+CLIENT_DIR = os.path.join(ROOT, "clients", "clientPlayer")
 
 
 def launch_server():
-    subprocess.Popen(["python3", "clientPlayer/main_client.py"])
+    return subprocess.Popen([sys.executable, "main_server.py"], cwd=SERVER_DIR)
+
+
+def launch_cluster(nr_workers=None):
+    args = [sys.executable, "main_cluster.py"]
+    if nr_workers is not None:
+        args.append(str(nr_workers))
+    return subprocess.Popen(args, cwd=SERVER_DIR)
 
 
 def launch_client():
-    subprocess.Popen(["python3", "server/main_server.py"])
+    return subprocess.Popen([sys.executable, "main_clientH.py"], cwd=CLIENT_DIR)
 
 
+# Utilização: python launcher.py [cluster [processos]]
 if __name__ == "__main__":
-    launch_server()
-    launch_client()
-    
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "cluster":
+        server = launch_cluster(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        server = launch_server()
+    # Dá tempo ao servidor para abrir a porta antes de o cliente se ligar
+    time.sleep(1)
+    client = launch_client()
+    client.wait()
+    server.terminate()
+    server.wait()
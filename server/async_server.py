@@ -0,0 +1,246 @@
+# Seção de Importações
+import asyncio
+import threading
+import const
+import protocol
+from client_handler import ClientHandler
+from metrics import metrics
+from rooms import RoomManager
+from tick_loop import TickLoop
+
+
+class StreamSocket:
+    def __init__(self, writer: asyncio.StreamWriter):
+        """
+        Adaptador que expõe a interface 'send'/'sendall' de um 'socket' sobre um 'asyncio.StreamWriter', para que o
+        ClientHandler possa ser reutilizado no modo asyncio sem alterações.
+        :param writer: O 'StreamWriter' da conexão do cliente
+        """
+        self.writer = writer
+
+    def send(self, data: bytes) -> int:
+        """
+        Coloca os dados no 'buffer' de escrita sem bloquear. O envio efetivo é feito pelo ciclo de eventos.
+        :param data: Os bytes a enviar
+        :return: O número de bytes aceites
+        """
+        self.writer.write(data)
+        return len(data)
+
+    def sendall(self, data: bytes) -> None:
+        self.writer.write(data)
+
+    def getpeername(self):
+        return self.writer.get_extra_info("peername")
+
+    def close(self):
+        self.writer.close()
+
+
+class StreamSubscriber:
+    def __init__(self, writer: asyncio.StreamWriter, loop: asyncio.AbstractEventLoop):
+        """
+        Subscritor usado no modo asyncio: os 'frames' são escritos pelo ciclo de eventos, sem bloquear o difusor.
+        :param writer: O 'StreamWriter' da conexão do cliente
+        :param loop: O ciclo de eventos que serve a conexão
+        """
+        self.writer = writer
+        self.loop = loop
+
+    def push(self, data: bytes) -> bool:
+        """
+        Agenda a escrita de um 'frame' no ciclo de eventos.
+        :param data: Os bytes do 'frame'
+        :return: Falso se o cliente tem demasiados dados por ler, Verdadeiro caso contrário
+        """
+        if self.writer.transport.get_write_buffer_size() > const.SUBSCRIBER_BUFFER_LIMIT:
+            return False
+        self.loop.call_soon_threadsafe(self.write, data)
+        return True
+
+    def write(self, data: bytes):
+        if not self.writer.is_closing():
+            metrics.inc("bytes.out", len(data))
+            self.writer.write(data)
+
+    def clear(self):
+        # O que já está no 'buffer' do transporte não pode ser retirado
+        pass
+
+    def close(self):
+        pass
+
+
+class AsyncClientHandler(ClientHandler):
+    def __init__(self, rooms: RoomManager, loop: asyncio.AbstractEventLoop, actor: TickLoop = None):
+        """
+        ClientHandler para o modo asyncio, cujos subscritores escrevem através do ciclo de eventos. O ciclo da
+        simulação corre no mesmo ciclo de eventos, pelo que as operações do jogo são executadas sem esperas.
+        :param rooms: O gestor das salas
+        :param loop: O ciclo de eventos que serve a conexão
+        :param actor: O ciclo da simulação
+        """
+        super().__init__(rooms=rooms, actor=actor)
+        self.loop = loop
+
+    def create_subscriber(self, s_c):
+        return StreamSubscriber(s_c.writer, self.loop)
+
+    def execute(self, s_c, request_id: int, payload):
+        """
+        Coloca o movimento na fila da simulação e responde quando o tick o aplicar, sem bloquear o ciclo de eventos.
+        :param s_c: O adaptador da conexão do cliente.
+        :param request_id: O id do pedido
+        :param payload: O movimento e o tipo de objeto a mover.
+        """
+        move, obj_type = protocol.MOVE.unpack(payload)
+        number = self.connected_clients[s_c]
+        if obj_type != protocol.OBJ_PLAYER or number is None:
+            self.send_reply(s_c, const.execute, request_id, protocol.POSITION.pack(0, 0))
+            return
+        future = self.call(self.gm.queue_move, number, move)
+
+        def reply(done):
+            pos = done.result() or (0, 0)
+            data = protocol.POSITION.pack(*pos)
+            self.loop.call_soon_threadsafe(self.send_reply, s_c, const.execute, request_id, data)
+
+        future.add_done_callback(reply)
+
+
+# Servidor alternativo ao SkeletonServer: um único ciclo de eventos serve todas as conexões, sem uma 'thread' por
+# cliente. As leituras e escritas não bloqueiam, pelo que conexões inativas ou lentas custam apenas uma corrotina.
+class AsyncServer:
+    def __init__(self, rooms: RoomManager, listen: bool = True):
+        """
+        Construtor da classe 'AsyncServer'
+        :param rooms: O gestor das salas (cada sala tem o seu jogo)
+        :param listen: Se Falso, o servidor não abre o 'socket' de escuta e só recebe conexões por 'adopt'
+        """
+        self.rooms = rooms
+        self.listen = listen
+        # Sinalizado quando o ciclo de eventos está pronto a receber conexões
+        self.ready = threading.Event()
+        self.stop = False
+        self.loop = None
+        self.stop_event = None
+        self.writers = set()
+        self.tasks = set()
+        self.tick_loop = TickLoop(rooms)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, initial=b""):
+        """
+        Trata uma conexão de um cliente até este desconectar ou enviar o comando de fim.
+        :param reader: O 'StreamReader' da conexão
+        :param writer: O 'StreamWriter' da conexão
+        :param initial: Bytes já lidos da conexão antes de esta chegar ao servidor (ver Supervisor)
+        :return: None
+        """
+        address = writer.get_extra_info("peername")
+        print(f"Connection established with {address}")
+        metrics.inc("connections.opened")
+        metrics.inc("connections.active")
+        client_handler = AsyncClientHandler(self.rooms, self.loop, self.tick_loop)
+        socket_client = StreamSocket(writer)
+        client_handler.connected_clients[socket_client] = None
+        decoder = protocol.FrameDecoder()
+        self.writers.add(writer)
+        self.tasks.add(asyncio.current_task())
+
+        try:
+            if initial:
+                await self.prepare_room(client_handler)
+                if not client_handler.process_data(socket_client, decoder, initial):
+                    return
+                await writer.drain()
+            while not self.stop:
+                received_data = await reader.read(const.BUFFER_SIZE)
+                if not received_data:
+                    break
+
+                await self.prepare_room(client_handler)
+                if not client_handler.process_data(socket_client, decoder, received_data):
+                    break
+                # Respeita o controlo de fluxo: só lê o próximo pedido depois de o cliente ter consumido a resposta
+                await writer.drain()
+
+        except Exception as e:
+            print(f"Erro ao lidar com o cliente: {e}", flush=True)
+
+        finally:
+            self.writers.discard(writer)
+            self.tasks.discard(asyncio.current_task())
+            client_handler.disconnect(socket_client)
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def prepare_room(self, client_handler: AsyncClientHandler):
+        """
+        Antes de a conexão entrar numa sala, cria fora do ciclo de eventos o jogo de uma sala nova, se for preciso
+        (ver RoomManager.prepare), para que a entrada não gere o labirinto no ciclo de eventos.
+        :param client_handler: O 'handler' da conexão
+        :return: None
+        """
+        if client_handler.room is None and self.rooms is not None:
+            await self.loop.run_in_executor(None, self.rooms.prepare)
+
+    async def adopt_connection(self, socket_client, initial: bytes):
+        reader, writer = await asyncio.open_connection(sock=socket_client)
+        await self.handle_connection(reader, writer, initial)
+
+    def adopt(self, socket_client, initial=b""):
+        """
+        Passa a servir uma conexão aceite noutro sítio (por exemplo, recebida do Supervisor). Pode ser chamado a
+        partir de outra 'thread'.
+        :param socket_client: O 'socket' da conexão do cliente
+        :param initial: Bytes já lidos da conexão
+        :return: None
+        """
+        self.ready.wait()
+        asyncio.run_coroutine_threadsafe(self.adopt_connection(socket_client, initial), self.loop)
+
+    async def serve(self):
+        """
+        Abre o 'socket' de escuta e serve os clientes até o servidor ser parado.
+        :return: None
+        """
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        server = None
+        if self.listen:
+            server = await asyncio.start_server(self.handle_connection, const.ADDRESS, const.PORT,
+                                                backlog=const.ASYNC_BACKLOG)
+            print(f"Async server listening on {const.ADDRESS}:{const.PORT}")
+        # A simulação corre no ciclo de eventos, que é assim o único escritor do estado do jogo
+        tick_task = asyncio.create_task(self.tick_loop.run_async())
+        self.ready.set()
+        await self.stop_event.wait()
+        if server is not None:
+            server.close()
+        # Fecha as conexões ainda abertas e espera que as respetivas corrotinas terminem
+        for writer in list(self.writers):
+            writer.close()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if server is not None:
+            await server.wait_closed()
+        self.tick_loop.shutdown()
+        await tick_task
+        self.rooms.shutdown()
+
+    def shutdown(self):
+        """
+        Pede ao servidor para parar. Pode ser chamado a partir de outra 'thread'.
+        :return: None
+        """
+        self.stop = True
+        if self.loop is not None and self.stop_event is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.stop_event.set)
+            except RuntimeError:
+                # O ciclo de eventos já terminou
+                pass
+
+    def run(self):
+        asyncio.run(self.serve())
@@ -0,0 +1,80 @@
+# Seção de Importações
+import random
+import sys
+import time
+from maze import MazeGenerator
+
+"""
+Mede o tempo de geração do labirinto para tamanhos crescentes, com o gerador linear (fronteira indexável num
+'bytearray' plano) e, até LEGACY_MAX_SIZE, com o algoritmo antigo (conjunto de fronteiras copiado a cada escolha).
+Utilização: python bench_maze.py [tamanho ...]
+"""
+
+LEGACY_MAX_SIZE = 201
+
+
+def legacy_generate(width: int, height: int):
+    """
+    Gera o labirinto como o MazeGenerator antigo: matriz 2D e 'random.choice(tuple(conjunto))' em cada passo.
+    :param width: A largura do labirinto
+    :param height: A altura do labirinto
+    :return: Uma matriz 2D representando o labirinto
+    """
+    grid = [[1] * height for _ in range(width)]
+
+    def around(x, y, wall):
+        n = set()
+        if 1 <= x < width - 1 and 1 <= y < height - 1:
+            for nx, ny, ok in ((x - 2, y, x > 1), (x + 2, y, x < width - 3),
+                               (x, y - 2, y > 1), (x, y + 2, y < height - 3)):
+                if ok and (grid[nx][ny] == 1) == wall:
+                    n.add((nx, ny))
+        return n
+
+    grid[1][1] = 0
+    s = around(1, 1, True)
+    while s:
+        x, y = random.choice(tuple(s))
+        s.remove((x, y))
+        ns = around(x, y, False)
+        if ns:
+            nx, ny = random.choice(tuple(ns))
+            grid[x][y] = 0
+            grid[(x + nx) // 2][(y + ny) // 2] = 0
+        s |= around(x, y, True)
+    return grid
+
+
+def check(cells: bytearray, size: int):
+    """
+    Confirma a estrutura do labirinto: anel exterior de paredes, todas as células ímpares abertas e um número de
+    passagens que corresponde a uma árvore (labirinto perfeito).
+    :param cells: O labirinto no formato plano
+    :param size: O lado do labirinto
+    :return: None
+    """
+    for i in range(size):
+        assert cells[i] and cells[(size - 1) * size + i] and cells[i * size] and cells[i * size + size - 1]
+    odd = (size - 1) // 2
+    assert all(not cells[x * size + y] for x in range(1, size - 1, 2) for y in range(1, size - 1, 2))
+    assert cells.count(0) == 2 * odd * odd - 1
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [7, 51, 101, 201, 501, 1001, 2001, 4001]
+    print(f"{'size':>10} {'generator':>10} {'time':>12} {'cells/s':>14}")
+    for size in sizes:
+        if size <= LEGACY_MAX_SIZE:
+            start = time.perf_counter()
+            legacy_generate(size, size)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>10} {'legacy':>10} {elapsed:>10.3f} s {size * size / elapsed:>14,.0f}")
+        start = time.perf_counter()
+        cells = MazeGenerator(size, size).generate_cells()
+        elapsed = time.perf_counter() - start
+        print(f"{size:>10} {'linear':>10} {elapsed:>10.3f} s {size * size / elapsed:>14,.0f}")
+        check(cells, size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# Seção de Importações
+import random
+import sys
+import time
+import tracemalloc
+from grid import WallGrid
+
+"""
+Compara a memória e o tempo do teste de parede entre o mundo antigo do GameMech (dicionário de listas por posição
+mais dicionário de obstáculos) e a grelha densa WallGrid.
+Utilização: python bench_memory.py [tamanho ...]
+O mundo antigo só é construído até LEGACY_MAX_SIZE, porque acima disso ocupa vários GB.
+"""
+
+LEGACY_MAX_SIZE = 1001
+LOOKUPS = 200000
+
+
+def maze_walls(size: int, seed: int = 0):
+    """
+    Gera paredes com a mesma estrutura das de um labirinto: anel exterior e paredes entre as células ímpares.
+    :param size: O lado do tabuleiro
+    :param seed: A semente do gerador aleatório
+    :return: Um gerador de tuplos (x, y)
+    """
+    rnd = random.Random(seed)
+    for y in range(size):
+        for x in range(size):
+            border = x in (0, size - 1) or y in (0, size - 1)
+            if border or (x % 2 == 0 or y % 2 == 0) and rnd.random() < 0.75:
+                yield x, y
+
+
+def build_legacy(size: int):
+    """
+    Constrói o mundo e os obstáculos como no GameMech antigo.
+    :param size: O lado do tabuleiro
+    :return: Um tuplo (mundo, obstáculos)
+    """
+    world = dict()
+    obstacles = dict()
+    for i in range(size):
+        for j in range(size):
+            world[(i, j)] = []
+    for x, y in maze_walls(size):
+        nr = len(obstacles)
+        obstacles[nr] = ['wall', (x, y)]
+        world[(x, y)].append(['obstacle', 'wall', nr, (x, y)])
+    return world, obstacles
+
+
+def build_grid(size: int):
+    """
+    Constrói a grelha densa com as mesmas paredes.
+    :param size: O lado do tabuleiro
+    :return: A grelha
+    """
+    grid = WallGrid(size, size)
+    for x, y in maze_walls(size):
+        grid.set_wall(x, y)
+    return grid
+
+
+def measure(build, size: int):
+    """
+    Mede a memória ocupada pela estrutura construída.
+    :param build: A função que constrói a estrutura
+    :param size: O lado do tabuleiro
+    :return: Um tuplo (estrutura, bytes ocupados, bytes no pico da construção)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    structure = build(size)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return structure, current - before, peak - before
+
+
+def legacy_is_obstacle(world, x, y):
+    for e in world[(x, y)]:
+        if e[0] == 'obstacle' and e[1] == 'wall':
+            return True
+    return False
+
+
+def time_lookups(is_wall, size: int) -> float:
+    """
+    Mede o tempo médio de um teste de parede em posições aleatórias.
+    :param is_wall: A função de teste, com argumentos (x, y)
+    :param size: O lado do tabuleiro
+    :return: O tempo médio, em nanossegundos
+    """
+    rnd = random.Random(1)
+    cells = [(rnd.randrange(size), rnd.randrange(size)) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for x, y in cells:
+        is_wall(x, y)
+    return (time.perf_counter() - start) / LOOKUPS * 1e9
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [101, 501, 1001, 2001, 4001]
+    print(f"{'size':>10} {'layout':>8} {'memory':>12} {'peak':>12} {'is_wall':>12}")
+    for size in sizes:
+        if size <= LEGACY_MAX_SIZE:
+            (world, obstacles), current, peak = measure(build_legacy, size)
+            lookup = time_lookups(lambda x, y: legacy_is_obstacle(world, x, y), size)
+            print(f"{size:>10} {'legacy':>8} {current / 2 ** 20:>9.1f} MB {peak / 2 ** 20:>9.1f} MB "
+                  f"{lookup:>9.0f} ns")
+            del world, obstacles
+        grid, current, peak = measure(build_grid, size)
+        lookup = time_lookups(grid.is_wall, size)
+        print(f"{size:>10} {'grid':>8} {current / 2 ** 20:>9.1f} MB {peak / 2 ** 20:>9.1f} MB {lookup:>9.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
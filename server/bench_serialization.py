@@ -0,0 +1,92 @@
+# Seção de Importações
+import pickle
+import random
+import sys
+import time
+import codec
+
+"""
+Compara a serialização com 'pickle' com a codificação binária do módulo codec, para os obstáculos e para os
+jogadores, em bytes enviados e em tempo de codificação/descodificação.
+Utilização: python bench_serialization.py [tamanho ...]
+"""
+
+
+def make_obstacles(size: int, seed: int = 0) -> dict:
+    """
+    Gera obstáculos com a mesma estrutura dos de um labirinto: anel exterior e cerca de metade das quadrículas
+    interiores ocupadas por paredes.
+    :param size: O lado do tabuleiro
+    :param seed: A semente do gerador aleatório
+    :return: Dicionário {número: ['wall', (x, y)]}
+    """
+    rnd = random.Random(seed)
+    obstacles = {}
+    for y in range(size):
+        for x in range(size):
+            border = x in (0, size - 1) or y in (0, size - 1)
+            if border or (x % 2 == 0 or y % 2 == 0) and rnd.random() < 0.75:
+                obstacles[len(obstacles)] = ['wall', (x, y)]
+    return obstacles
+
+
+def make_players(count: int, size: int, seed: int = 0) -> dict:
+    """
+    Gera jogadores com a mesma estrutura dos do GameMech.
+    :param count: O número de jogadores
+    :param size: O lado do tabuleiro
+    :param seed: A semente do gerador aleatório
+    :return: Dicionário {número: [nome, (x, y), tick, raio]}
+    """
+    rnd = random.Random(seed)
+    now = int(time.time() * 7.5)
+    return {nr: [f"p{nr}", (rnd.randrange(size), rnd.randrange(size)), now, 100] for nr in range(count)}
+
+
+def best_time(function, *args, repeat: int = 5) -> float:
+    """
+    Mede o melhor tempo de várias execuções de uma função.
+    :param function: A função a medir
+    :param args: Os argumentos da função
+    :param repeat: O número de execuções
+    :return: O melhor tempo, em segundos
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label: str, pickle_data: bytes, pickle_enc: float, pickle_dec: float, codec_data: bytes,
+           codec_enc: float, codec_dec: float):
+    for name, data, enc, dec in ((label, pickle_data, pickle_enc, pickle_dec), ("", codec_data, codec_enc, codec_dec)):
+        fmt = "pickle" if name else "codec"
+        print(f"{name:<22} {fmt:>8} {len(data):>12} B {enc * 1000:>10.3f} ms {dec * 1000:>10.3f} ms")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [7, 101, 501, 1001]
+    print(f"{'case':<22} {'format':>8} {'bytes':>14} {'encode':>13} {'decode':>13}")
+    for size in sizes:
+        obstacles = make_obstacles(size)
+        pickle_data = pickle.dumps(obstacles)
+        codec_data = codec.encode_walls(obstacles, size, size)
+        assert codec.decode_walls(codec_data) == obstacles
+        report(f"obstacles {size}x{size}", pickle_data,
+               best_time(pickle.dumps, obstacles), best_time(pickle.loads, pickle_data), codec_data,
+               best_time(codec.encode_walls, obstacles, size, size), best_time(codec.decode_walls, codec_data))
+
+    for count in (1, 10, 100, 1000):
+        players = make_players(count, 101)
+        pickle_data = pickle.dumps(players)
+        codec_data = codec.encode_players(players)
+        assert codec.decode_players(codec_data) == players
+        report(f"players {count}", pickle_data,
+               best_time(pickle.dumps, players), best_time(pickle.loads, pickle_data), codec_data,
+               best_time(codec.encode_players, players), best_time(codec.decode_players, codec_data))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# Seção de Importações
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import const
+from game_mech import GameMech
+from maze import MazeGenerator
+
+"""
+Microbenchmarks dos caminhos críticos do GameMech e do MazeGenerator, para comparar números antes e depois de uma
+alteração. Cada caso é medido para vários tamanhos de tabuleiro (e, no 'execute' e no 'step', vários números de
+jogadores): o tempo por chamada é o melhor de várias repetições e a memória é o pico alocado (tracemalloc) numa chamada.
+Os resultados podem ser gravados em JSON (--json) e comparados com um resultado gravado antes (--compare).
+O que os métodos escrevem no ecrã é descartado durante as medições.
+Utilização: python bench_suite.py [--sizes 7 51 ...] [--players 1 10 ...] [--json ficheiro] [--compare ficheiro]
+"""
+
+DEFAULT_SIZES = [7, 51, 201, 1001, 2001]
+DEFAULT_PLAYERS = [1, 10, 100, 1000]
+# Tamanho máximo de tabuleiro de cada caso com o tamanho por omissão (os mais lentos ficam pelos tamanhos menores)
+MAX_SIZE = {"prepare_maze_data": 1001, "get_full_maze_representation": 2001}
+# Variação (em relação ao valor gravado) a partir da qual uma comparação é assinalada
+THRESHOLD = 0.10
+# Deslocamento de cada movimento
+MOVES = {const.M_UP: (0, -1), const.M_RIGHT: (1, 0), const.M_DOWN: (0, 1), const.M_LEFT: (-1, 0)}
+OPPOSITE = {const.M_UP: const.M_DOWN, const.M_DOWN: const.M_UP, const.M_LEFT: const.M_RIGHT,
+            const.M_RIGHT: const.M_LEFT}
+
+
+def new_game(size: int, nr_players: int = 0) -> GameMech:
+    """
+    Cria um jogo com jogadores em posições livres escolhidas ao acaso (sempre as mesmas), fora da meta.
+    :param size: O lado do tabuleiro
+    :param nr_players: O número de jogadores
+    :return: O jogo
+    """
+    gm = GameMech(size, size, seed=1, save_maze=False)
+    rnd = random.Random(1)
+    free = [(index % size, index // size) for index, cell in enumerate(gm.grid.cells)
+            if not cell and (index % size, index // size) != gm.finish]
+    for nr in range(nr_players):
+        x, y = free[int(rnd.random() * len(free))]
+        gm.add_player(f"p{nr}", x, y, 100)
+    return gm
+
+
+def shuttle_moves(gm: GameMech) -> list:
+    """
+    Escolhe para cada jogador um movimento para uma quadrícula livre vizinha (que não seja a meta) e o movimento
+    contrário: alternando os dois, cada movimento é aplicado e o jogador nunca chega à meta.
+    :param gm: O jogo
+    :return: Lista com um par de movimentos por jogador, pela ordem dos números dos jogadores
+    """
+    pairs = []
+    for nr in sorted(gm.players):
+        x, y = gm.players[nr][1]
+        move = next((move for move, (dx, dy) in MOVES.items()
+                     if not gm.is_obstacle("wall", x + dx, y + dy) and (x + dx, y + dy) != gm.finish), const.M_UP)
+        pairs.append((move, OPPOSITE[move]))
+    return pairs
+
+
+def cases(size: int, players: list):
+    """
+    Gera os casos a medir para um tamanho de tabuleiro.
+    :param size: O lado do tabuleiro
+    :param players: Os números de jogadores do 'execute' e do 'step'
+    :return: Um gerador de tuplos (nome, jogadores, função sem argumentos a medir)
+    """
+    yield "MazeGenerator.generate_maze", 0, lambda: MazeGenerator(size, size, 1).generate_maze()
+    yield "GameMech.__init__", 0, lambda: GameMech(size, size, seed=1, save_maze=False)
+
+    gm = new_game(size, 1)
+    rnd = random.Random(2)
+    points = [(int(rnd.random() * size), int(rnd.random() * size)) for _ in range(1024)]
+    index = [0]
+
+    def is_obstacle():
+        index[0] = (index[0] + 1) & 1023
+        x, y = points[index[0]]
+        gm.is_obstacle("wall", x, y)
+
+    yield "GameMech.is_obstacle", 0, is_obstacle
+    yield "GameMech.get_maze_representation", 0, lambda: gm.get_maze_representation(0)
+    yield "GameMech.get_full_maze_representation", 0, gm.get_full_maze_representation
+    yield "GameMech.prepare_maze_data", 0, gm.prepare_maze_data
+
+    for nr_players in players:
+        game = new_game(size, nr_players)
+        pairs = shuttle_moves(game)
+        turn = [0]
+
+        def execute(game=game, nr_players=nr_players, pairs=pairs, turn=turn):
+            nr = turn[0] % nr_players
+            # O 'execute' só move um jogador uma vez por tick do relógio: sem isto, quase todas as chamadas seriam
+            # movimentos rejeitados
+            game.players[nr][2] = 0
+            game.execute(pairs[nr][(turn[0] // nr_players) & 1], "player", nr)
+            turn[0] += 1
+
+        yield "GameMech.execute", nr_players, execute
+
+        # Caminho usado pelo servidor: um movimento na fila de cada jogador e um tick da simulação que os aplica
+        game = new_game(size, nr_players)
+        pairs = shuttle_moves(game)
+        turn = [0]
+
+        def step(game=game, pairs=pairs, turn=turn):
+            for nr, pair in enumerate(pairs):
+                game.queue_move(nr, pair[turn[0]])
+            game.step()
+            turn[0] ^= 1
+
+        yield "GameMech.step", nr_players, step
+
+
+def measure(fn, min_time: float, repeat: int) -> dict:
+    """
+    Mede o tempo por chamada e o pico de memória de uma função.
+    :param fn: A função sem argumentos
+    :param min_time: O tempo mínimo de cada repetição, em segundos
+    :param repeat: O número de repetições (fica o melhor tempo)
+    :return: Dicionário com os segundos por chamada, as chamadas por repetição e o pico de memória em bytes
+    """
+    def run(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - start
+
+    # Número de chamadas por repetição para que cada repetição dure pelo menos 'min_time'
+    number = 1
+    elapsed = run(number)
+    while elapsed < min_time and number < 10 ** 7:
+        number *= 10 if elapsed < min_time / 10 else 2
+        elapsed = run(number)
+    best = min([elapsed] + [run(number) for _ in range(repeat - 1)])
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": best / number, "calls": number, "peak_bytes": peak}
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare(results: list, baseline_file: str):
+    """
+    Compara os resultados com os de um ficheiro JSON gravado antes.
+    :param results: Os resultados atuais
+    :param baseline_file: O ficheiro com os resultados de referência
+    :return: None
+    """
+    with open(baseline_file) as file:
+        baseline = {(r["name"], r["size"], r["players"]): r for r in json.load(file)["results"]}
+    print(f"\nComparison with {baseline_file}:")
+    print(f"{'case':<42} {'size':>6} {'players':>7} {'time':>10} {'memory':>10}")
+    for result in results:
+        old = baseline.get((result["name"], result["size"], result["players"]))
+        if old is None:
+            continue
+        time_ratio = result["seconds"] / old["seconds"]
+        memory_ratio = result["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] else 1.0
+        flag = ""
+        if time_ratio > 1 + THRESHOLD:
+            flag = "  slower"
+        elif time_ratio < 1 - THRESHOLD:
+            flag = "  faster"
+        print(f"{result['name']:<42} {result['size']:>6} {result['players']:>7} {time_ratio:>9.2f}x "
+              f"{memory_ratio:>9.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GameMech and MazeGenerator microbenchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", help="board sizes (side length)")
+    parser.add_argument("--players", type=int, nargs="+", default=DEFAULT_PLAYERS,
+                        help="player counts for execute and step")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per repetition")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions (the best one is kept)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="compare with results saved by --json")
+    args = parser.parse_args()
+    sizes = args.sizes or DEFAULT_SIZES
+
+    results = []
+    print(f"{'case':<42} {'size':>6} {'players':>7} {'time/call':>12} {'calls':>9} {'peak memory':>12}")
+    for size in sizes:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            size_cases = list(cases(size, args.players))
+        for name, nr_players, fn in size_cases:
+            if args.sizes is None and size > MAX_SIZE.get(name.split(".")[-1], size):
+                continue
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                result = measure(fn, args.min_time, args.repeat)
+            result.update(name=name, size=size, players=nr_players)
+            results.append(result)
+            print(f"{name:<42} {size:>6} {nr_players:>7} {format_time(result['seconds']):>12} "
+                  f"{result['calls']:>9} {result['peak_bytes'] / 1024:>9.1f} KiB", flush=True)
+
+    if args.json:
+        meta = {"date": datetime.now().isoformat(timespec="seconds"), "python": sys.version.split()[0],
+                "platform": platform.platform(), "tick_hz": const.TICK_HZ}
+        with open(args.json, "w") as file:
+            json.dump({"meta": meta, "results": results}, file, indent=4)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,196 +1,631 @@
+import ipaddress
+import json
 import os
-import pickle
 import threading
+import codec
 import const
+import protocol
 from game_mech import GameMech
+from metrics import metrics
+from profiler import profiler, MODE_CPU, MODE_MEMORY, NO_ROOM
+from rooms import RoomManager
+from subscriptions import Broadcaster, QueueSubscriber
+from tick_loop import TickLoop
+
+# Nome de cada tipo de mensagem nas métricas
+MESSAGE_NAMES = {const.X_MAX: "x_max", const.Y_MAX: "y_max", const.get_Players: "get_players",
+                 const.get_nr_Players: "get_nr_players", const.get_Obstacles: "get_obstacles",
+                 const.get_nr_Obstacles: "get_nr_obstacles", const.execute: "execute", const.new_Player: "new_player",
+                 const.get_finish: "get_finish", const.get_status: "get_status", const.get_maze: "get_maze",
+                 const.END: "end", const.subscribe: "subscribe", const.move: "move", const.get_level: "get_level",
+                 const.join_room: "join_room", const.get_fog: "get_fog", const.join_game: "join_game",
+                 const.get_stats: "get_stats", const.profile: "profile"}
 
 
 class ClientHandler:
-    def __init__(self, gm_obj: GameMech):
+    def __init__(self, gm_obj: GameMech = None, broadcaster: Broadcaster = None, rooms: RoomManager = None,
+                 actor: TickLoop = None):
         self.gm = gm_obj
-        self.lock = threading.Lock()
+        self.broadcaster = broadcaster
+        # Com um gestor de salas, o jogo e o difusor são os da sala em que a conexão entra
+        self.rooms = rooms
+        self.room = None
+        # Único escritor do estado do jogo: o 'handler' só trata da comunicação e envia-lhe as operações do jogo
+        self.actor = actor
+        # Serializa as escritas no 'socket' entre as respostas e os 'frames' difundidos
+        self.send_lock = threading.Lock()
+        self.subscriber = None
         self.connected_clients = {}
         self.connected_players = {}
 
-    def process_x_max(self, s_c):
+    def call(self, fn, *args):
+        """
+        Executa uma operação do jogo no ciclo da simulação e espera pelo resultado.
+        :param fn: A função a executar
+        :param args: Os argumentos da função
+        :return: O resultado da função
+        """
+        if self.actor is None:
+            return fn(*args)
+        return self.actor.submit(fn, *args).result()
+
+    def send_frame(self, s_c, data: bytes):
+        """
+        Envia um 'frame' já codificado para o cliente.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param data: Os bytes do 'frame'
+        """
+        with self.send_lock:
+            s_c.sendall(data)
+        metrics.inc("bytes.out", len(data))
+
+    def send_reply(self, s_c, msg_type: int, request_id: int, payload=b"", flags: int = 0):
+        """
+        Envia a resposta a um pedido num 'frame' com o mesmo tipo e id do pedido.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param msg_type: O tipo da mensagem a que se responde
+        :param request_id: O id do pedido a que se responde
+        :param payload: Os bytes da resposta
+        :param flags: Flags a juntar a FLAG_REPLY (por exemplo FLAG_NOT_MODIFIED)
+        """
+        self.send_frame(s_c, protocol.encode_frame(msg_type, payload, request_id, protocol.FLAG_REPLY | flags))
+
+    def versioned_reply(self, payload, version: int, key, build, delta=None) -> tuple:
+        """
+        Prepara a resposta a um pedido condicional. Sem versão no pedido, responde com os dados completos como
+        antes. Com a versão que o cliente já tem, responde só com a versão atual se nada mudou ("not modified"), com o
+        delta desde essa versão se for possível, ou com a versão atual seguida dos dados completos. Os dados completos
+        são codificados uma só vez por versão. Executado no ciclo da simulação.
+        :param payload: O payload do pedido: vazio, ou a versão que o cliente tem
+        :param version: A versão atual dos dados
+        :param key: A chave dos dados na cache do jogo
+        :param build: Função sem argumentos que codifica os dados completos
+        :param delta: Função que recebe a versão do cliente e devolve o delta codificado, ou None se não for possível
+        :return: Um tuplo (payload da resposta, flags)
+        """
+        start = metrics.clock()
+        if not payload:
+            reply = self.gm.cached_blob(key, version, build), 0
+        else:
+            held, = protocol.VERSION.unpack(payload)
+            prefix = protocol.VERSION.pack(version)
+            reply = None
+            if held == version:
+                reply = prefix, protocol.FLAG_NOT_MODIFIED
+            elif delta is not None:
+                data = delta(held)
+                if data is not None:
+                    reply = prefix + data, protocol.FLAG_DELTA
+            if reply is None:
+                reply = prefix + self.gm.cached_blob(key, version, build), 0
+        metrics.since("serialize.reply", start)
+        return reply
+
+    def send_error(self, s_c, request_id: int, message: str):
+        """
+        Envia uma resposta de erro ao cliente.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido que originou o erro
+        :param message: A descrição do erro
+        """
+        metrics.inc("errors")
+        self.send_reply(s_c, const.ERROR, request_id, message.encode(const.STRING_ENCODING))
+
+    def process_x_max(self, s_c, request_id: int):
         """
         Envia o valor da coordenada x máxima do tabuleiro de jogo para o cliente.
         :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
         """
         # pedir ao gm o tamanho do jogo
         x_max = self.gm.x_max
-        print(x_max)
         # enviar a mensagem com esse valor
-        s_c.send(x_max.to_bytes(const.N_BYTES, byteorder="big", signed=True))
+        self.send_reply(s_c, const.X_MAX, request_id, protocol.INT.pack(x_max))
 
-    def process_y_max(self, s_c):
+    def process_y_max(self, s_c, request_id: int):
         """
         Envia o valor da coordenada y máxima do tabuleiro de jogo para o cliente.
         :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
         """
         # pedir ao gm o tamanho do jogo
         y_max = self.gm.y_max
-        print(y_max)
         # enviar a mensagem com esse valor
-        s_c.send(y_max.to_bytes(const.N_BYTES, byteorder="big", signed=True))
+        self.send_reply(s_c, const.Y_MAX, request_id, protocol.INT.pack(y_max))
 
-    def get_players(self, s_c):
+    def get_players(self, s_c, request_id: int, payload=b""):
         """
-        Envia a lista de jogadores para o cliente
+        Envia para o cliente a lista dos jogadores na área de interesse do seu jogador (todos, se não tiver jogador)
         :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        :param payload: Vazio, ou a versão dos jogadores que o cliente já tem
         """
-        players = self.gm.get_players()
-        data = pickle.dumps(players)
+        # Os jogadores são codificados no ciclo da simulação, para que a cópia enviada seja consistente
+        data, flags = self.call(self.players_reply, self.connected_clients.get(s_c), payload)
+        self.send_reply(s_c, const.get_Players, request_id, data, flags)
 
-        # Envia o comprimento do fluxo de bytes para o cliente
-        length_bytes = len(data).to_bytes(4, byteorder='big')
-        s_c.sendall(length_bytes)
+    def visible_players(self, player_number) -> bytes:
+        """
+        Codifica os jogadores vistos por um jogador. Executado no ciclo da simulação.
+        :param player_number: O número do jogador ou None
+        :return: Os bytes codificados
+        """
+        return codec.encode_players(self.gm.get_visible_players(player_number))
 
-        # Envia os bytes para o cliente
-        s_c.sendall(data)
+    def players_reply(self, player_number, payload) -> tuple:
+        """
+        Prepara a resposta a um pedido de jogadores (ver 'versioned_reply'). Executado no ciclo da simulação.
+        :param player_number: O número do jogador do cliente ou None
+        :param payload: O payload do pedido
+        :return: Um tuplo (payload da resposta, flags)
+        """
+        def delta(held: int):
+            changed = self.gm.players_changed_since(held)
+            # Se o próprio jogador se moveu, a área de interesse mudou e o delta não chega
+            if changed is None or player_number in changed:
+                return None
+            visible = self.gm.get_visible_players(player_number)
+            return codec.encode_players_delta({nr: visible[nr] for nr in changed if nr in visible},
+                                              [nr for nr in changed if nr not in visible])
+
+        return self.versioned_reply(payload, self.gm.players_version, ("players", player_number),
+                                    lambda: self.visible_players(player_number), delta)
 
-    def get_nr_players(self, s_c):
+    def get_nr_players(self, s_c, request_id: int):
         """
         Envia o número de jogadores para o cliente.
         :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
         """
         # pedir ao gm o nr de players
-        nr_players = self.gm.get_nr_players()
-        s_c.send(nr_players.to_bytes(const.N_BYTES, byteorder="big", signed=True))
+        nr_players = self.call(self.gm.get_nr_players)
+        self.send_reply(s_c, const.get_nr_Players, request_id, protocol.INT.pack(nr_players))
 
-    def get_obstacles(self, s_c):
+    def get_obstacles(self, s_c, request_id: int, payload=b""):
         """
         Envia a lista de obstáculos para o cliente.
         :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        :param payload: Vazio, ou a versão dos obstáculos que o cliente já tem
         """
-        # pedir ao gm o nr de players
-        obstacles = self.gm.get_obstacles()
-        # print(f"walls: {obstacles}")
-        data = pickle.dumps(obstacles)
-        # enviar o comprimento da data
-        length_bytes = len(data).to_bytes(4, byteorder='big')
-        s_c.sendall(length_bytes)
-        # enviar a data
-        s_c.sendall(data)
+        # pedir ao gm a grelha de paredes, enviada como um mapa de bits
+        data, flags = self.call(self.obstacles_reply, payload)
+        self.send_reply(s_c, const.get_Obstacles, request_id, data, flags)
+
+    def obstacles_reply(self, payload) -> tuple:
+        grid = self.gm.grid
+        return self.versioned_reply(payload, self.gm.obstacles_version, "obstacles",
+                                    lambda: codec.encode_grid(grid.width, grid.height, grid.cells))
 
-    def get_nr_obstacles(self, s_c):
+    def get_nr_obstacles(self, s_c, request_id: int):
         """
         Envia o número de obstáculos para o cliente.
         :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
         """
         # pedir ao gm o nr de players
         nr_obstacles = self.gm.get_nr_obstacles()
-        s_c.send(nr_obstacles.to_bytes(const.N_BYTES, byteorder="big", signed=True))
+        self.send_reply(s_c, const.get_nr_Obstacles, request_id, protocol.INT.pack(nr_obstacles))
 
-    def get_finish(self, s_c):
+    def get_finish(self, s_c, request_id: int):
         finish = self.gm.get_finish()
-        data = pickle.dumps(finish)  # Serializing the tuple
-        s_c.send(data)
+        # Sem meta, é enviado (-1, -1)
+        x, y = finish if finish is not None else (-1, -1)
+        self.send_reply(s_c, const.get_finish, request_id, protocol.POSITION.pack(x, y))
 
-    def get_game_status(self, s_c):
-        status = self.gm.get_game_status()
-        data = pickle.dumps(status)  # Serializing the tuple
-        s_c.send(data)
+    def get_level(self, s_c, request_id: int):
+        """
+        Envia a semente, as dimensões, a versão do gerador e o 'checksum' do labirinto, para que o cliente o refaça
+        localmente em vez de descarregar os obstáculos.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        """
+        self.send_reply(s_c, const.get_level, request_id, protocol.LEVEL.pack(*self.gm.get_level()))
+
+    def get_game_status(self, s_c, request_id: int, payload=b""):
+        data, flags = self.call(self.status_reply, payload)
+        self.send_reply(s_c, const.get_status, request_id, data, flags)
+
+    def status_reply(self, payload) -> tuple:
+        game_over, winner = self.gm.get_game_status()
+        return self.versioned_reply(payload, self.gm.status_version, "status",
+                                    lambda: protocol.STATUS.pack(game_over, winner if winner is not None else -1))
 
-    def new_player(self, s_c, msg):
+    def new_player(self, s_c, request_id: int, payload):
         """
         Adiciona um novo jogador ao jogo.
         :param s_c: Um objeto 'socket' que representa a conexão do cliente.
-        :param msg: Uma mensagem contendo informações sobre o novo jogador.
+        :param request_id: O id do pedido
+        :param payload: O nome do novo jogador codificado em 'utf-8'.
         """
-        name = msg[2:4]
-        nr_player = self.gm.add_player(name, 1, 1, 100)
-        s_c.send(nr_player.to_bytes(const.N_BYTES, byteorder="big", signed=True))
+        if self.connected_clients.get(s_c) is not None:
+            # Um segundo jogador deixaria o primeiro no jogo, sem conexão que o retire
+            self.send_error(s_c, request_id, "Already joined")
+            return
+        name = bytes(payload).decode(const.STRING_ENCODING)
+        nr_player = self.call(self.gm.add_player, name, 1, 1, 100)
+        self.send_reply(s_c, const.new_Player, request_id, protocol.INT.pack(nr_player))
 
         # Assign this new player to the connected clientPlayer
         self.connected_clients[s_c] = nr_player
         self.connected_players[nr_player] = s_c
 
-    def execute(self, s_c, msg):
+    def execute(self, s_c, request_id: int, payload):
         """
-        Executa um movimento para um jogador.
+        Executa um movimento para um jogador. O movimento é colocado na fila da simulação e a resposta é enviada
+        depois de o tick o aplicar.
         :param s_c: Um objeto 'socket' que representa a conexão do cliente.
-        :param msg: Uma mensagem contendo informações sobre o movimento a ser executado.
+        :param request_id: O id do pedido
+        :param payload: O movimento e o tipo de objeto a mover.
         """
-        move = int(msg[1])
-        types = ""
-        if msg[2] == "p":
-            types = "player"
+        move, obj_type = protocol.MOVE.unpack(payload)
         number = self.connected_clients[s_c]
-        pos = self.gm.execute(move, types, number)
-        print(f"The new position is : {pos}")
-        data = pickle.dumps(pos)
-        # Send the serialized data with a sentinel value
-        s_c.sendall(data + b"<END>")
+        pos = None
+        if obj_type == protocol.OBJ_PLAYER and number is not None:
+            pos = self.call(self.gm.queue_move, number, move).result()
+        if pos is None:
+            pos = (0, 0)
+        self.send_reply(s_c, const.execute, request_id, protocol.POSITION.pack(*pos))
+
+    def move(self, s_c, payload):
+        """
+        Coloca um movimento na fila da simulação sem enviar resposta. A nova posição chega ao cliente pelos
+        deltas da subscrição.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param payload: O movimento e o tipo de objeto a mover.
+        """
+        move, obj_type = protocol.MOVE.unpack(payload)
+        number = self.connected_clients[s_c]
+        if obj_type == protocol.OBJ_PLAYER and number is not None:
+            self.call(self.gm.queue_move, number, move)
+
+    def create_subscriber(self, s_c):
+        """
+        Cria o subscritor que envia os 'frames' difundidos para esta conexão.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :return: O subscritor
+        """
+        return QueueSubscriber(lambda data: self.send_frame(s_c, data))
 
-    def handle_client(self, socket_client):
+    def subscribe(self, s_c, request_id: int):
+        """
+        Subscreve as atualizações do estado do jogo. A resposta é um snapshot completo; seguem-se deltas por tick.
+        Com um jogador, o cliente só recebe os jogadores na área de interesse desse jogador.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        """
+        if self.broadcaster is None:
+            self.send_error(s_c, request_id, "Subscriptions are not available")
+            return
+        if self.subscriber is None:
+            self.subscriber = self.create_subscriber(s_c)
+        self.call(self.broadcaster.subscribe, self.subscriber, request_id, self.connected_clients.get(s_c))
 
+    def enter_room(self, room_id: int):
+        """
+        Entra numa sala, passando a usar o jogo e o difusor dessa sala.
+        :param room_id: O número da sala ou ROOM_AUTO para a atribuição automática
+        :return: A sala, ou None se não foi possível entrar
+        """
+        room = self.rooms.join(room_id)
+        if room is not None:
+            self.room = room
+            self.gm = room.gm
+            self.broadcaster = room.broadcaster
+        return room
+
+    def join_room(self, s_c, request_id: int, payload):
+        """
+        Entra na sala pedida pelo cliente e responde com o número da sala.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        :param payload: O número da sala ou ROOM_AUTO
+        """
+        room_id = protocol.INT.unpack(payload)[0]
+        if self.rooms is None:
+            self.send_error(s_c, request_id, "Rooms are not available")
+        elif self.room is not None:
+            if room_id in (const.ROOM_AUTO, self.room.room_id):
+                self.send_reply(s_c, const.join_room, request_id, protocol.INT.pack(self.room.room_id))
+            else:
+                self.send_error(s_c, request_id, f"Already in room {self.room.room_id}")
+        elif self.enter_room(room_id) is None:
+            self.send_error(s_c, request_id, f"Room {room_id} is not available")
+        else:
+            self.send_reply(s_c, const.join_room, request_id, protocol.INT.pack(self.room.room_id))
+
+    def join_game(self, s_c, request_id: int, payload):
+        """
+        Entrada no jogo num só pedido: entra na sala, cria o jogador, subscreve as atualizações e responde com todo o
+        estado inicial (sala, jogador, nível, meta, paredes se o cliente não as puder refazer, estado do jogo e
+        jogadores), para que o cliente comece a jogar depois de uma só ida e volta.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        :param payload: A sala, a versão do gerador de labirintos do cliente e o nome do jogador.
+        """
+        if self.connected_clients.get(s_c) is not None:
+            # Um segundo jogador deixaria o primeiro no jogo, sem conexão que o retire
+            self.send_error(s_c, request_id, "Already joined")
+            return
+        room_id, version = codec.JOIN_REQUEST.unpack_from(payload, 0)
+        name = bytes(payload[codec.JOIN_REQUEST.size:]).decode(const.STRING_ENCODING)
+        if self.rooms is not None:
+            if self.room is None and self.enter_room(room_id) is None:
+                self.send_error(s_c, request_id, f"Room {room_id} is not available")
+                return
+            if room_id not in (const.ROOM_AUTO, self.room.room_id):
+                self.send_error(s_c, request_id, f"Already in room {self.room.room_id}")
+                return
+        if self.broadcaster is not None and self.subscriber is None:
+            self.subscriber = self.create_subscriber(s_c)
+        nr_player, reply = self.call(self.enter_game, request_id, name, version)
+        self.connected_clients[s_c] = nr_player
+        self.connected_players[nr_player] = s_c
+        if reply is not None:
+            self.send_frame(s_c, reply)
+
+    def enter_game(self, request_id: int, name: str, version: int) -> tuple:
+        """
+        Cria o jogador e prepara a resposta ao pedido join_game. Executado no ciclo da simulação, para que o snapshot
+        enviado inclua o jogador e os deltas seguintes partam dele. Com um difusor, a resposta segue pela fila do
+        subscritor, antes dos deltas.
+        :param request_id: O id do pedido
+        :param name: O nome do jogador
+        :param version: A versão do gerador de labirintos do cliente
+        :return: Um tuplo (número do jogador, 'frame' da resposta ou None se já foi entregue ao subscritor)
+        """
+        gm = self.gm
+        nr_player = gm.add_player(name, 1, 1, 100)
+        level = gm.get_level()
+        walls = b""
+        if version != level[3]:
+            # O cliente não consegue refazer este labirinto: as paredes vão na resposta
+            grid = gm.grid
+            walls = gm.cached_blob("obstacles", gm.obstacles_version,
+                                   lambda: codec.encode_grid(grid.width, grid.height, grid.cells))
+        room_id = self.room.room_id if self.room is not None else const.ROOM_AUTO
+        prefix = codec.encode_join(room_id, nr_player, level, gm.get_finish(), walls)
+        if self.subscriber is not None:
+            self.broadcaster.subscribe(self.subscriber, request_id, nr_player, const.join_game, prefix)
+            return nr_player, None
+        game_over, winner = gm.get_game_status()
+        snapshot = codec.encode_snapshot(0, gm.get_visible_players(nr_player), game_over, winner)
+        return nr_player, protocol.encode_frame(const.join_game, prefix + snapshot, request_id, protocol.FLAG_REPLY)
+
+    def get_maze(self, s_c, request_id: int):
+        """
+        Envia a representação do labirinto vista pelo jogador do cliente.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        """
+        player_number = self.connected_clients[s_c]
+        maze_repr = self.call(self.player_maze, player_number)
+        self.send_reply(s_c, const.get_maze, request_id, maze_repr.encode(const.STRING_ENCODING))
+
+    def player_maze(self, player_number: int) -> str:
+        """
+        Gera a representação do labirinto vista por um jogador. Executado no ciclo da simulação.
+        :param player_number: O número do jogador
+        :return: A representação do labirinto
+        """
+        return self.gm.get_maze_representation(player_number)
+
+    def get_fog(self, s_c, request_id: int):
+        """
+        Envia as linhas do labirinto reveladas ao jogador do cliente desde o último pedido (só as novas).
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        """
+        player_number = self.connected_clients[s_c]
+        self.send_reply(s_c, const.get_fog, request_id, self.call(self.player_fog, player_number))
+
+    def player_fog(self, player_number: int) -> bytes:
+        """
+        Codifica as linhas reveladas a um jogador. Executado no ciclo da simulação.
+        :param player_number: O número do jogador
+        :return: Os bytes codificados
+        """
+        rows = self.gm.take_revealed_rows(player_number)
+        return codec.encode_rows(self.gm.x_max, self.gm.grid.cells, rows)
+
+    def is_admin(self, s_c) -> bool:
+        """
+        Verifica se a conexão pode fazer pedidos de administração: só as conexões da própria máquina, e só com
+        ADMIN_ENABLED.
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :return: Verdadeiro se o pedido deve ser aceite
+        """
+        if not const.ADMIN_ENABLED:
+            return False
+        try:
+            return ipaddress.ip_address(s_c.getpeername()[0]).is_loopback
+        except (OSError, ValueError, TypeError, IndexError):
+            return False
+
+    def get_stats(self, s_c, request_id: int):
+        """
+        Envia as métricas do servidor (ver metrics.py) em JSON. Pedido de administração (ver is_admin).
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        """
+        if not self.is_admin(s_c):
+            self.send_error(s_c, request_id, "Admin commands are not allowed from this connection")
+            return
+        stats = metrics.snapshot()
+        stats["enabled"] = metrics.enabled
+        self.send_reply(s_c, const.get_stats, request_id, json.dumps(stats).encode(const.STRING_ENCODING))
+
+    def profile(self, s_c, request_id: int, payload):
+        """
+        Pedido de administração (ver is_admin) que começa ou termina uma sessão de 'profiling' do processo (ver
+        Profiler). Responde em JSON com a pasta da sessão (ao começar) ou os ficheiros gravados (ao terminar).
+        :param s_c: Um objeto 'socket' que representa a conexão do cliente.
+        :param request_id: O id do pedido
+        :param payload: A ação (PROFILE_STOP, PROFILE_CPU ou PROFILE_MEMORY) e a duração em segundos
+        """
+        if not self.is_admin(s_c):
+            self.send_error(s_c, request_id, "Admin commands are not allowed from this connection")
+            return
+        action, seconds = protocol.PROFILE.unpack(payload)
+        modes = {protocol.PROFILE_CPU: MODE_CPU, protocol.PROFILE_MEMORY: MODE_MEMORY}
+        if action == protocol.PROFILE_STOP:
+            reply = {"files": profiler.stop()}
+        elif action in modes and seconds <= 0:
+            self.send_error(s_c, request_id, "Profile duration must be positive")
+            return
+        elif action in modes:
+            try:
+                reply = {"directory": profiler.start(modes[action], min(seconds, const.PROFILE_MAX_SECONDS))}
+            except RuntimeError as e:
+                self.send_error(s_c, request_id, str(e))
+                return
+        else:
+            self.send_error(s_c, request_id, f"Unknown profile action: {action}")
+            return
+        self.send_reply(s_c, const.profile, request_id, json.dumps(reply).encode(const.STRING_ENCODING))
+
+    def process_frame(self, socket_client, frame: protocol.Frame) -> bool:
+        """
+        Executa o comando correspondente a um 'frame' recebido.
+        :param socket_client: Um objeto 'socket' (ou adaptador com 'send'/'sendall') que representa a conexão.
+        :param frame: O 'frame' recebido do cliente.
+        :return: Falso se o cliente pediu para terminar a conexão, Verdadeiro caso contrário.
+        """
+        msg_type, request_id, payload = frame.msg_type, frame.request_id, frame.payload
+
+        # Clientes que não escolhem sala entram na primeira sala aberta
+        if self.gm is None and msg_type not in (const.join_room, const.join_game, const.get_stats, const.profile,
+                                             const.END):
+            if self.enter_room(const.ROOM_AUTO) is None:
+                self.send_error(socket_client, request_id, "No room available")
+                return True
+
+        if msg_type == const.X_MAX:
+            self.process_x_max(socket_client, request_id)
+        elif msg_type == const.Y_MAX:
+            self.process_y_max(socket_client, request_id)
+        elif msg_type == const.get_Players:
+            self.get_players(socket_client, request_id, payload)
+        elif msg_type == const.get_nr_Players:
+            self.get_nr_players(socket_client, request_id)
+        elif msg_type == const.get_Obstacles:
+            self.get_obstacles(socket_client, request_id, payload)
+        elif msg_type == const.get_nr_Obstacles:
+            self.get_nr_obstacles(socket_client, request_id)
+        elif msg_type == const.execute:
+            self.execute(socket_client, request_id, payload)
+        elif msg_type == const.new_Player:
+            self.new_player(socket_client, request_id, payload)
+        elif msg_type == const.get_finish:
+            self.get_finish(socket_client, request_id)
+        elif msg_type == const.get_level:
+            self.get_level(socket_client, request_id)
+        elif msg_type == const.get_status:
+            self.get_game_status(socket_client, request_id, payload)
+        elif msg_type == const.get_maze:
+            self.get_maze(socket_client, request_id)
+        elif msg_type == const.get_fog:
+            self.get_fog(socket_client, request_id)
+        elif msg_type == const.move:
+            self.move(socket_client, payload)
+        elif msg_type == const.subscribe:
+            self.subscribe(socket_client, request_id)
+        elif msg_type == const.join_room:
+            self.join_room(socket_client, request_id, payload)
+        elif msg_type == const.join_game:
+            self.join_game(socket_client, request_id, payload)
+        elif msg_type == const.get_stats:
+            self.get_stats(socket_client, request_id)
+        elif msg_type == const.profile:
+            self.profile(socket_client, request_id, payload)
+        elif msg_type == const.END:
+            return False
+        else:
+            self.send_error(socket_client, request_id, f"Unknown message type: {msg_type}")
+        return True
+
+    def process_data(self, socket_client, decoder: protocol.FrameDecoder, received_data) -> bool:
+        """
+        Entrega os dados recebidos ao descodificador e executa todos os 'frames' completos.
+        :param socket_client: Um objeto 'socket' (ou adaptador) que representa a conexão.
+        :param decoder: O descodificador de 'frames' desta conexão
+        :param received_data: Os bytes recebidos
+        :return: Falso se a conexão deve ser terminada, Verdadeiro caso contrário.
+        """
+        metrics.inc("bytes.in", len(received_data))
+        try:
+            frames = decoder.feed(received_data)
+        except protocol.ProtocolError as e:
+            self.send_error(socket_client, 0, str(e))
+            return False
+        for frame in frames:
+            # Contagem e tempo de tratamento de cada tipo de comando
+            name = MESSAGE_NAMES.get(frame.msg_type, "unknown")
+            metrics.inc(f"commands.{name}")
+            start = metrics.clock()
+            if profiler.active:
+                room = self.room.room_id if self.room is not None else NO_ROOM
+                keep = profiler.run(room, name, self.process_frame, socket_client, frame)
+            else:
+                keep = self.process_frame(socket_client, frame)
+            metrics.since(f"command.{name}", start)
+            if not keep:
+                return False
+        return True
+
+    def disconnect(self, socket_client):
+        """
+        Liberta os recursos associados a um cliente e remove o seu jogador do jogo.
+        :param socket_client: Um objeto 'socket' (ou adaptador) que representa a conexão do cliente.
+        :return: None
+        """
+        player_index = self.connected_clients.get(socket_client)
+        if self.subscriber is not None:
+            self.call(self.broadcaster.unsubscribe, self.subscriber)
+            self.subscriber = None
+        socket_client.close()
+        self.connected_clients.pop(socket_client, None)
+
+        if player_index is not None:
+            del self.connected_players[player_index]
+            self.call(self.gm.remove_player, player_index)
+        if self.room is not None:
+            self.rooms.leave(self.room)
+            self.room = None
+
+        metrics.inc("connections.closed")
+        metrics.inc("connections.active", -1)
+        print(f"Client disconnected: Player ID {player_index if player_index is not None else 'unknown'}",
+              flush=True)
+
+    def handle_client(self, socket_client, initial=b""):
+        """
+        Trata uma conexão de um cliente até este desconectar ou enviar o comando de fim.
+        :param socket_client: Um objeto 'socket' que representa a conexão do cliente.
+        :param initial: Bytes já lidos da conexão antes de esta chegar ao 'handler' (ver Supervisor)
+        """
         self.connected_clients[socket_client] = None
+        decoder = protocol.FrameDecoder()
+        metrics.inc("connections.opened")
+        metrics.inc("connections.active")
 
         try:
+            if initial and not self.process_data(socket_client, decoder, initial):
+                return
             while True:
                 received_data = socket_client.recv(const.BUFFER_SIZE)
                 if not received_data:
                     break
 
-                msg = received_data.decode(const.STRING_ENCODING)
-                print(f"Mensagem recebida: {msg}", flush=True)
-
-                if len(msg) > 0:
-                    if msg == const.X_MAX:
-                        with self.lock:
-                            self.process_x_max(socket_client)
-                    elif msg == const.Y_MAX:
-                        with self.lock:
-                            self.process_y_max(socket_client)
-                    elif msg == const.get_Players:
-                        with self.lock:
-                            self.get_players(socket_client)
-                    elif msg == const.get_nr_Players:
-                        with self.lock:
-                            self.get_nr_players(socket_client)
-                    elif msg == const.get_Obstacles:
-                        with self.lock:
-                            self.get_obstacles(socket_client)
-                    elif msg == const.get_nr_Obstacles:
-                        with self.lock:
-                            self.get_nr_obstacles(socket_client)
-                    elif msg[0] == const.execute:
-                        with self.lock:
-                            self.execute(socket_client, msg)
-                    elif msg[0:2] == const.new_Player:
-                        with self.lock:
-                            self.new_player(socket_client, msg)
-                    elif msg == const.get_finish:
-                        with self.lock:
-                            self.get_finish(socket_client)
-                    elif msg == const.get_status:
-                        with self.lock:
-                            self.get_game_status(socket_client)
-                    elif msg.startswith("get_maze"):
-                        with self.lock:
-                            player_number = self.connected_clients[socket_client]
-                            player_y = self.gm.players[player_number][1][1]  # Access the player's Y-coordinate
-                            maze_repr = self.gm.get_maze_representation(player_y)
-                            socket_client.send(maze_repr.encode(const.STRING_ENCODING))
-                    elif msg == const.END:
-                        break
+                if not self.process_data(socket_client, decoder, received_data):
+                    break
 
         except Exception as e:
             print(f"Erro ao lidar com o cliente: {e}", flush=True)
 
         finally:
             # Cleanup resources and disconnect clientPlayer
-            player_index = self.connected_clients[socket_client]
-            socket_client.close()
-            del self.connected_clients[socket_client]
-
-            if player_index is not None:
-                del self.connected_players[player_index]
-                self.gm.remove_player(player_index)
-
-            print(f"Client disconnected: Player ID {player_index if player_index is not None else 'unknown'}",
-                  flush=True)
+            self.disconnect(socket_client)
 
     def send_last_maze(self, s_c):
         try:
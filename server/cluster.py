@@ -0,0 +1,208 @@
+# Seção de Importações
+import itertools
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from multiprocessing.connection import wait
+import const
+import protocol
+from async_server import AsyncServer
+from maze_factory import MazeFactory
+from metrics import metrics
+from rooms import RoomManager
+from server_skeleton import SkeletonServer
+
+
+def receive_connections(channel: socket.socket, server):
+    """
+    Recebe do Supervisor as conexões encaminhadas para este processo ('socket' e bytes já lidos) e entrega-as ao
+    servidor. Quando o Supervisor fecha o canal, o servidor é parado.
+    :param channel: O canal (AF_UNIX, SOCK_SEQPACKET) ligado ao Supervisor
+    :param server: O SkeletonServer ou AsyncServer deste processo
+    :return: None
+    """
+    while True:
+        try:
+            initial, fds, _, _ = socket.recv_fds(channel, 2 * const.BUFFER_SIZE, 1)
+        except OSError:
+            break
+        if not fds:
+            break
+        socket_client = socket.socket(fileno=fds[0])
+        print(f"Connection established with {socket_client.getpeername()}", flush=True)
+        server.adopt(socket_client, initial)
+    server.shutdown()
+
+
+def run_worker(shard: int, shards: int, channel: socket.socket, mode: str):
+    """
+    Processo de jogo do cluster: serve as salas do seu 'shard', com as conexões recebidas do Supervisor.
+    :param shard: O número deste processo
+    :param shards: O número de processos do cluster
+    :param channel: O canal ligado ao Supervisor
+    :param mode: O modo do servidor (threads ou asyncio)
+    :return: None
+    """
+    factory = MazeFactory(workers=const.CLUSTER_MAZE_WORKERS)
+    factory.start()
+    rooms = RoomManager(factory, shard=shard, shards=shards)
+    if mode == const.MODE_ASYNCIO:
+        server = AsyncServer(rooms, listen=False)
+    else:
+        server = SkeletonServer(rooms, listen=False)
+    threading.Thread(target=receive_connections, args=(channel, server), daemon=True).start()
+    # Cada processo grava as suas métricas num ficheiro próprio (metrics.json passa a metrics-<shard>.json)
+    name, extension = os.path.splitext(const.METRICS_FILE)
+    metrics.start_dump(os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}-{shard}{extension}"))
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        metrics.stop_dump()
+        factory.shutdown()
+
+
+# Cluster de servidores numa só máquina: o Supervisor abre a porta do jogo e lança um processo de jogo por núcleo,
+# cada um dono das salas de um 'shard' (número da sala módulo número de processos). O Supervisor funciona como
+# 'router': lê o primeiro pedido de cada conexão e passa o 'socket' (descritor de ficheiro) ao processo dono da sala,
+# que passa a servir o cliente diretamente. Processos que terminam inesperadamente são reiniciados.
+class Supervisor:
+    def __init__(self, nr_workers: int = const.CLUSTER_WORKERS, mode: str = const.SERVER_MODE):
+        """
+        Construtor da classe 'Supervisor'
+        :param nr_workers: O número de processos de jogo (None para um por núcleo)
+        :param mode: O modo do servidor em cada processo (threads ou asyncio)
+        """
+        self.nr_workers = nr_workers or os.cpu_count()
+        self.mode = mode
+        # 'spawn': os processos podem ser reiniciados com o 'router' já a correr várias 'threads'
+        self.context = multiprocessing.get_context("spawn")
+        # Processo, canal e 'lock' de envio de cada 'shard'
+        self.workers = [None] * self.nr_workers
+        self.channels = [None] * self.nr_workers
+        self.send_locks = [threading.Lock() for _ in range(self.nr_workers)]
+        self.round_robin = itertools.count()
+        self.s = socket.socket()
+        self.s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.s.bind((const.ADDRESS, const.PORT))
+        self.s.listen()
+        self.stop = False
+
+    def start_worker(self, shard: int):
+        """
+        Lança o processo de jogo de um 'shard', com um canal novo para lhe passar as conexões.
+        :param shard: O número do 'shard'
+        :return: None
+        """
+        channel, worker_channel = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        process = self.context.Process(target=run_worker, args=(shard, self.nr_workers, worker_channel, self.mode),
+                                       name=f"worker-{shard}")
+        process.start()
+        worker_channel.close()
+        with self.send_locks[shard]:
+            self.workers[shard] = process
+            self.channels[shard] = channel
+        print(f"Worker {shard} started (pid {process.pid})", flush=True)
+
+    def monitor(self):
+        """
+        Reinicia os processos de jogo que terminaram sem o Supervisor ter sido parado.
+        :return: None
+        """
+        while not self.stop:
+            sentinels = {self.workers[shard].sentinel: shard for shard in range(self.nr_workers)}
+            for sentinel in wait(list(sentinels), timeout=1):
+                if self.stop:
+                    break
+                shard = sentinels[sentinel]
+                self.workers[shard].join()
+                print(f"Worker {shard} exited with code {self.workers[shard].exitcode}, restarting", flush=True)
+                self.channels[shard].close()
+                time.sleep(const.RESTART_DELAY)
+                self.start_worker(shard)
+
+    def read_first_frame(self, socket_client) -> bytes:
+        """
+        Lê da conexão o suficiente para saber a que sala se destina: o cabeçalho do primeiro 'frame' e, num pedido
+        de entrada numa sala ou no jogo, o número da sala.
+        :param socket_client: O 'socket' da conexão do cliente
+        :return: Os bytes lidos, ou None se o cliente fechou a conexão antes
+        """
+        socket_client.settimeout(const.ROUTER_TIMEOUT)
+        data = b""
+        needed = protocol.HEADER_SIZE
+        while len(data) < needed:
+            chunk = socket_client.recv(const.BUFFER_SIZE)
+            if not chunk:
+                return None
+            data += chunk
+            if needed == protocol.HEADER_SIZE and len(data) >= needed:
+                msg_type = protocol.HEADER.unpack_from(data)[1]
+                if msg_type in (const.join_room, const.join_game):
+                    needed += protocol.INT.size
+        # O descritor passa para outro processo em modo bloqueante
+        socket_client.settimeout(None)
+        return data
+
+    def route(self, socket_client):
+        """
+        Encaminha uma conexão para o processo dono da sala pedida. Sem sala escolhida, os processos são usados à vez.
+        :param socket_client: O 'socket' da conexão do cliente
+        :return: None
+        """
+        try:
+            data = self.read_first_frame(socket_client)
+            if data is None:
+                return
+            room_id = const.ROOM_AUTO
+            if protocol.HEADER.unpack_from(data)[1] in (const.join_room, const.join_game):
+                room_id = protocol.INT.unpack_from(data, protocol.HEADER_SIZE)[0]
+            shard = room_id % self.nr_workers if room_id >= 0 else next(self.round_robin) % self.nr_workers
+            with self.send_locks[shard]:
+                socket.send_fds(self.channels[shard], [data], [socket_client.fileno()])
+        except OSError as e:
+            print(f"Erro ao encaminhar o cliente: {e}", flush=True)
+        finally:
+            # O processo de jogo tem a sua própria cópia do descritor
+            socket_client.close()
+
+    def run(self):
+        for shard in range(self.nr_workers):
+            self.start_worker(shard)
+        threading.Thread(target=self.monitor, daemon=True).start()
+        print(f"Cluster listening on {const.ADDRESS}:{const.PORT} with {self.nr_workers} workers", flush=True)
+        try:
+            while not self.stop:
+                try:
+                    socket_client, address = self.s.accept()
+                except OSError:
+                    # O 'socket' de escuta foi fechado pelo 'shutdown'
+                    if self.stop:
+                        break
+                    raise
+                threading.Thread(target=self.route, args=(socket_client,), daemon=True).start()
+        finally:
+            self.stop = True
+            self.s.close()
+            # Fechar os canais faz com que cada processo pare o seu servidor
+            for channel in self.channels:
+                channel.close()
+            for process in self.workers:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+
+    def shutdown(self):
+        """
+        Pede ao Supervisor para parar, fechando o 'socket' de escuta para desbloquear o 'accept'.
+        :return: None
+        """
+        self.stop = True
+        try:
+            self.s.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.s.close()
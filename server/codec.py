@@ -0,0 +1,333 @@
+# Seção de Importações
+import struct
+import const
+
+# Codificação binária de tamanho fixo dos jogadores e dos obstáculos, partilhada entre o servidor e o cliente.
+# Substitui o 'pickle', que é lento, verboso e inseguro de desserializar a partir da rede.
+
+# Jogadores: número de jogadores (4 bytes) seguido de um registo por jogador
+#   número (4 bytes) | x (2 bytes) | y (2 bytes) | tick (8 bytes) | raio (2 bytes) | comprimento do nome (1 byte)
+# e do nome em 'utf-8'.
+PLAYERS_HEADER = struct.Struct("!I")
+PLAYER_RECORD = struct.Struct("!iHHqHB")
+
+# Delta de jogadores (resposta a um pedido condicional): número de jogadores retirados (4 bytes) e os seus números
+# (4 bytes cada), seguidos dos jogadores alterados no formato de 'encode_players'.
+REMOVED_RECORD = struct.Struct("!i")
+
+# Obstáculos: largura, altura e número de paredes, seguidos de um mapa de bits com um bit por quadrícula, linha a
+# linha (y exterior, x interior). O bit mais significativo de cada byte corresponde à quadrícula de menor x.
+WALLS_HEADER = struct.Struct("!HHI")
+
+# Snapshot do estado: tick, fim de jogo e vencedor (-1 se não houver), seguidos dos jogadores
+SNAPSHOT_HEADER = struct.Struct("!I?i")
+
+# Delta: tick e número de eventos, seguidos de um registo por evento
+#   tipo (1 byte) | jogador (4 bytes) | x (2 bytes) | y (2 bytes) | comprimento do nome (1 byte)
+# e do nome em 'utf-8' (só nos eventos de entrada no jogo ou na área de interesse).
+DELTA_HEADER = struct.Struct("!II")
+EVENT_RECORD = struct.Struct("!BiHHB")
+
+# Linhas do labirinto reveladas a um jogador (nevoeiro de guerra): largura e número de linhas, seguidos, por linha,
+# da coordenada y (2 bytes) e do mapa de bits das paredes dessa linha, com a ordem de bits de 'encode_walls'.
+ROWS_HEADER = struct.Struct("!HH")
+ROW_INDEX = struct.Struct("!H")
+
+# Entrada no jogo num só pedido (join_game). O pedido leva a sala (4 bytes, ROOM_AUTO para a atribuição automática)
+# e a versão do gerador de labirintos do cliente (2 bytes), seguidas do nome em 'utf-8'. A resposta leva a sala,
+# o jogador, o nível (semente, largura, altura, versão do gerador e 'checksum'), a meta (-1, -1 se não houver) e se
+# seguem as paredes (1 byte); depois, o mapa de bits das paredes (como em 'encode_grid', só se o cliente não puder
+# refazer o labirinto) e o snapshot do estado (como em 'encode_snapshot').
+JOIN_REQUEST = struct.Struct("!iH")
+JOIN_HEADER = struct.Struct("!iiIHHHIii?")
+
+STRING_ENCODING = 'utf-8'
+
+# Conversões entre uma grelha densa (um byte 0/1 por quadrícula) e os dígitos binários do mapa de bits
+_CELL_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+_DIGIT_CELLS = bytes.maketrans(b"01", b"\x00\x01")
+
+# Posições dos bits a 1 em cada valor de byte possível, para descodificar o mapa sem testar bit a bit
+_BIT_POSITIONS = tuple(tuple(i for i in range(8) if value & (0x80 >> i)) for value in range(256))
+
+
+def encode_name(name) -> bytes:
+    """
+    Codifica o nome de um jogador com no máximo 255 bytes (o comprimento vai num só byte). Um nome mais comprido é
+    cortado no fim de um carácter, para que os bytes continuem a ser UTF-8 válido.
+    :param name: O nome
+    :return: Os bytes codificados
+    """
+    name_bytes = str(name).encode(STRING_ENCODING)
+    if len(name_bytes) > 255:
+        name_bytes = name_bytes[:255].decode(STRING_ENCODING, errors="ignore").encode(STRING_ENCODING)
+    return name_bytes
+
+
+def encode_players(players: dict) -> bytes:
+    """
+    Codifica o dicionário de jogadores do GameMech.
+    :param players: Dicionário {número: [nome, (x, y), tick, raio]}
+    :return: Os bytes codificados
+    """
+    parts = [PLAYERS_HEADER.pack(len(players))]
+    for nr, (name, (x, y), tick, radius) in players.items():
+        name_bytes = encode_name(name)
+        parts.append(PLAYER_RECORD.pack(nr, x, y, tick, radius, len(name_bytes)))
+        parts.append(name_bytes)
+    return b"".join(parts)
+
+
+def decode_players(data) -> dict:
+    """
+    Descodifica os jogadores codificados por 'encode_players'.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Dicionário {número: [nome, (x, y), tick, raio]}
+    """
+    players = {}
+    count, = PLAYERS_HEADER.unpack_from(data, 0)
+    offset = PLAYERS_HEADER.size
+    for _ in range(count):
+        nr, x, y, tick, radius, name_len = PLAYER_RECORD.unpack_from(data, offset)
+        offset += PLAYER_RECORD.size
+        name = bytes(data[offset:offset + name_len]).decode(STRING_ENCODING)
+        offset += name_len
+        players[nr] = [name, (x, y), tick, radius]
+    return players
+
+
+def encode_players_delta(players: dict, removed) -> bytes:
+    """
+    Codifica as alterações aos jogadores desde uma versão.
+    :param players: Os jogadores novos ou alterados: {número: [nome, (x, y), tick, raio]}
+    :param removed: Os números dos jogadores retirados
+    :return: Os bytes codificados
+    """
+    parts = [PLAYERS_HEADER.pack(len(removed))]
+    parts.extend(REMOVED_RECORD.pack(nr) for nr in removed)
+    parts.append(encode_players(players))
+    return b"".join(parts)
+
+
+def decode_players_delta(data) -> tuple:
+    """
+    Descodifica as alterações codificadas por 'encode_players_delta'.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Um tuplo (jogadores alterados, lista dos números dos jogadores retirados)
+    """
+    count, = PLAYERS_HEADER.unpack_from(data, 0)
+    offset = PLAYERS_HEADER.size
+    removed = []
+    for _ in range(count):
+        removed.append(REMOVED_RECORD.unpack_from(data, offset)[0])
+        offset += REMOVED_RECORD.size
+    return decode_players(data[offset:]), removed
+
+
+def encode_walls(obstacles: dict, width: int, height: int) -> bytes:
+    """
+    Codifica os obstáculos como um mapa de bits de paredes.
+    :param obstacles: Dicionário {número: [tipo, (x, y)]}
+    :param width: A largura do tabuleiro
+    :param height: A altura do tabuleiro
+    :return: Os bytes codificados
+    """
+    bitmap = bytearray((width * height + 7) // 8)
+    for types, (x, y) in obstacles.values():
+        index = y * width + x
+        bitmap[index >> 3] |= 0x80 >> (index & 7)
+    return WALLS_HEADER.pack(width, height, len(obstacles)) + bitmap
+
+
+def encode_grid(width: int, height: int, cells) -> bytes:
+    """
+    Codifica uma grelha densa de paredes no mesmo mapa de bits de 'encode_walls', sem percorrer as paredes uma a uma.
+    :param width: A largura do tabuleiro
+    :param height: A altura do tabuleiro
+    :param cells: Um byte por quadrícula (1 para parede), linha a linha
+    :return: Os bytes codificados
+    """
+    nr_bits = width * height
+    nr_bytes = (nr_bits + 7) // 8
+    bitmap = b""
+    if nr_bits:
+        digits = bytes(cells).translate(_CELL_DIGITS) + b"0" * (nr_bytes * 8 - nr_bits)
+        bitmap = int(digits, 2).to_bytes(nr_bytes, "big")
+    return WALLS_HEADER.pack(width, height, cells.count(1)) + bitmap
+
+
+def decode_grid(data) -> tuple:
+    """
+    Descodifica um mapa de bits para uma grelha densa.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Um tuplo (largura, altura, 'bytearray' com um byte por quadrícula)
+    """
+    width, height, count = WALLS_HEADER.unpack_from(data, 0)
+    nr_bits = width * height
+    nr_bytes = (nr_bits + 7) // 8
+    value = int.from_bytes(data[WALLS_HEADER.size:WALLS_HEADER.size + nr_bytes], "big")
+    digits = format(value, f"0{nr_bytes * 8}b").encode()[:nr_bits]
+    return width, height, bytearray(digits.translate(_DIGIT_CELLS))
+
+
+def iter_walls(data):
+    """
+    Percorre as paredes de um mapa de bits codificado por 'encode_walls', linha a linha.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Um gerador de tuplos (x, y)
+    """
+    width, height, count = WALLS_HEADER.unpack_from(data, 0)
+    bitmap = data[WALLS_HEADER.size:]
+    for byte_index, value in enumerate(bitmap):
+        if value:
+            base = byte_index << 3
+            for bit in _BIT_POSITIONS[value]:
+                y, x = divmod(base + bit, width)
+                yield x, y
+
+
+def decode_walls(data) -> dict:
+    """
+    Descodifica o mapa de bits para o formato de obstáculos do GameMech.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Dicionário {número: ['wall', (x, y)]}
+    """
+    return {nr: ['wall', pos] for nr, pos in enumerate(iter_walls(data))}
+
+
+def walls_size(data) -> tuple:
+    """
+    Lê as dimensões e o número de paredes do cabeçalho de um mapa de bits.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Um tuplo (largura, altura, número de paredes)
+    """
+    return WALLS_HEADER.unpack_from(data, 0)
+
+
+def encode_snapshot(tick: int, players: dict, game_over: bool, winner) -> bytes:
+    """
+    Codifica o estado completo enviado a um cliente quando este subscreve as atualizações.
+    :param tick: O tick do difusor em que o snapshot foi tirado
+    :param players: Dicionário {número: [nome, (x, y), tick, raio]}
+    :param game_over: Se o jogo já terminou
+    :param winner: O número do vencedor ou None
+    :return: Os bytes codificados
+    """
+    return SNAPSHOT_HEADER.pack(tick, game_over, winner if winner is not None else -1) + encode_players(players)
+
+
+def decode_snapshot(data) -> tuple:
+    """
+    Descodifica um snapshot codificado por 'encode_snapshot'.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Um tuplo (tick, jogadores, fim de jogo, vencedor)
+    """
+    tick, game_over, winner = SNAPSHOT_HEADER.unpack_from(data, 0)
+    players = decode_players(data[SNAPSHOT_HEADER.size:])
+    return tick, players, game_over, winner if winner >= 0 else None
+
+
+def encode_events(tick: int, events) -> bytes:
+    """
+    Codifica os eventos de um tick (movimentos, entradas, saídas e fim de jogo).
+    :param tick: O tick do difusor
+    :param events: Sequência de tuplos (tipo, jogador, x, y, nome)
+    :return: Os bytes codificados
+    """
+    parts = [DELTA_HEADER.pack(tick, len(events))]
+    for kind, nr, x, y, name in events:
+        name_bytes = encode_name(name) if kind in (const.EV_JOIN, const.EV_ENTER) else b""
+        parts.append(EVENT_RECORD.pack(kind, nr, x, y, len(name_bytes)))
+        parts.append(name_bytes)
+    return b"".join(parts)
+
+
+def decode_events(data) -> tuple:
+    """
+    Descodifica os eventos codificados por 'encode_events'.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Um tuplo (tick, lista de tuplos (tipo, jogador, x, y, nome))
+    """
+    tick, count = DELTA_HEADER.unpack_from(data, 0)
+    offset = DELTA_HEADER.size
+    events = []
+    for _ in range(count):
+        kind, nr, x, y, name_len = EVENT_RECORD.unpack_from(data, offset)
+        offset += EVENT_RECORD.size
+        name = bytes(data[offset:offset + name_len]).decode(STRING_ENCODING)
+        offset += name_len
+        events.append((kind, nr, x, y, name))
+    return tick, events
+
+
+def encode_rows(width: int, cells, rows) -> bytes:
+    """
+    Codifica só algumas linhas de uma grelha densa de paredes.
+    :param width: A largura do tabuleiro
+    :param cells: Um byte por quadrícula (1 para parede), linha a linha
+    :param rows: As coordenadas y das linhas a enviar
+    :return: Os bytes codificados
+    """
+    nr_bytes = (width + 7) // 8
+    padding = b"0" * (nr_bytes * 8 - width)
+    parts = []
+    for y in rows:
+        parts.append(ROW_INDEX.pack(y))
+        if width:
+            digits = bytes(cells[y * width:(y + 1) * width]).translate(_CELL_DIGITS) + padding
+            parts.append(int(digits, 2).to_bytes(nr_bytes, "big"))
+    return ROWS_HEADER.pack(width, len(rows)) + b"".join(parts)
+
+
+def decode_rows(data) -> tuple:
+    """
+    Descodifica as linhas codificadas por 'encode_rows'.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Um tuplo (largura, lista de tuplos (y, 'bytearray' com um byte por quadrícula da linha))
+    """
+    width, count = ROWS_HEADER.unpack_from(data, 0)
+    nr_bytes = (width + 7) // 8
+    offset = ROWS_HEADER.size
+    rows = []
+    for _ in range(count):
+        y, = ROW_INDEX.unpack_from(data, offset)
+        offset += ROW_INDEX.size
+        value = int.from_bytes(data[offset:offset + nr_bytes], "big")
+        offset += nr_bytes
+        digits = format(value, f"0{nr_bytes * 8}b").encode()[:width]
+        rows.append((y, bytearray(digits.translate(_DIGIT_CELLS))))
+    return width, rows
+
+
+def encode_join(room_id: int, nr_player: int, level: tuple, finish, walls: bytes = b"") -> bytes:
+    """
+    Codifica o início da resposta à entrada no jogo; o snapshot do estado é acrescentado a seguir.
+    :param room_id: O número da sala
+    :param nr_player: O número do jogador criado
+    :param level: Tuplo (semente, largura, altura, versão do gerador, 'checksum')
+    :param finish: A meta (x, y) ou None
+    :param walls: O mapa de bits das paredes codificado por 'encode_grid', ou vazio
+    :return: Os bytes codificados
+    """
+    x, y = finish if finish is not None else (-1, -1)
+    return JOIN_HEADER.pack(room_id, nr_player, *level, x, y, bool(walls)) + walls
+
+
+def decode_join(data) -> tuple:
+    """
+    Descodifica a resposta à entrada no jogo, sem descodificar as paredes nem o snapshot.
+    :param data: Os bytes (ou memoryview) recebidos
+    :return: Um tuplo (sala, jogador, nível, meta ou None, paredes ou None, snapshot), com as paredes e o snapshot
+             como 'memoryview' para 'decode_grid' e 'decode_snapshot'
+    """
+    data = memoryview(data)
+    room_id, nr_player, seed, width, height, version, checksum, x, y, has_walls = JOIN_HEADER.unpack_from(data, 0)
+    offset = JOIN_HEADER.size
+    walls = None
+    if has_walls:
+        w, h, count = WALLS_HEADER.unpack_from(data, offset)
+        size = WALLS_HEADER.size + (w * h + 7) // 8
+        walls = data[offset:offset + size]
+        offset += size
+    finish = (x, y) if (x, y) != (-1, -1) else None
+    return room_id, nr_player, (seed, width, height, version, checksum), finish, walls, data[offset:]
@@ -1,21 +1,37 @@
 ADDRESS = '127.0.0.1'
 PORT = 8000
 COMMAND_SIZE = 5
-END = "END  "
 MSG_SIZE = 40
 N_BYTES = 2
-BUFFER_SIZE = 1024
+BUFFER_SIZE = 65536
 STRING_ENCODING = 'utf-8'
-X_MAX = "max x"
-Y_MAX = "max y"
-get_Players = "gt_Pl"
-get_nr_Players = "g_n_P"
-get_Obstacles = "gt_Ob"
-get_nr_Obstacles = "g_n_O"
-execute = "e"
-new_Player = "np"
-get_finish = "gt_fn"
-get_status = "gt_st"
+
+# Tipos de mensagem do protocolo binário (ver protocol.py)
+X_MAX = 1
+Y_MAX = 2
+get_Players = 3
+get_nr_Players = 4
+get_Obstacles = 5
+get_nr_Obstacles = 6
+execute = 7
+new_Player = 8
+get_finish = 9
+get_status = 10
+get_maze = 11
+END = 12
+subscribe = 13
+delta = 14
+move = 15
+get_level = 16
+join_room = 17
+get_fog = 18
+join_game = 19
+get_stats = 20
+profile = 21
+ERROR = 255
+
+# Número de sala que pede a atribuição automática
+ROOM_AUTO = -1
 
 # Definição de constantes para os movimentos
 M_UP = 0
@@ -23,3 +39,70 @@ M_RIGHT = 1
 M_DOWN = 2
 M_LEFT = 3
 TIME_STEP = 7.5
+
+# Tipos de evento enviados nos deltas aos clientes subscritos
+EV_MOVE = 1
+EV_JOIN = 2
+EV_LEAVE = 3
+EV_GAME_OVER = 4
+# Jogador que entra ou sai da área de interesse do cliente (ver InterestGrid)
+EV_ENTER = 5
+EV_EXIT = 6
+
+# Modos de execução do servidor
+MODE_THREADS = "threads"
+MODE_ASYNCIO = "asyncio"
+SERVER_MODE = MODE_THREADS
+ASYNC_BACKLOG = 1024
+
+# Simulação: ticks por segundo (no máximo um movimento por jogador em cada tick) e movimentos em espera por jogador
+TICK_HZ = TIME_STEP
+INPUT_QUEUE_SIZE = 4
+
+# Difusão de snapshots e deltas aos clientes subscritos
+MAX_PENDING_EVENTS = 65536
+SUBSCRIBER_QUEUE_SIZE = 256
+SUBSCRIBER_BUFFER_LIMIT = 1024 * 1024
+
+# Área de interesse: cada cliente só recebe os jogadores a menos de AOI_RADIUS quadrículas (em x e em y) do seu
+# jogador. As posições são indexadas numa grelha de 'buckets' com AOI_CELL_SIZE quadrículas de lado.
+AOI_RADIUS = 8
+AOI_CELL_SIZE = 8
+
+# Alterações aos jogadores guardadas para responder a pedidos condicionais com um delta
+CHANGE_LOG_SIZE = 1024
+
+# Métricas (ver metrics.py): registo ativo, ficheiro (na pasta do servidor) onde são gravadas periodicamente e
+# intervalo entre gravações em segundos (0 para não gravar)
+METRICS_ENABLED = True
+METRICS_FILE = "metrics.json"
+METRICS_DUMP_INTERVAL = 10
+
+# 'Profiling' do servidor em funcionamento (ver profiler.py): pedidos de administração (métricas e 'profiling') aceites,
+# só das conexões da própria máquina (ver ClientHandler.is_admin), pasta (na pasta do servidor) onde os resultados são
+# gravados, duração máxima de uma sessão em segundos e número de 'frames' guardados em cada alocação no modo de memória
+ADMIN_ENABLED = True
+PROFILE_DIR = "profiles"
+PROFILE_MAX_SECONDS = 600
+PROFILE_FRAMES = 16
+
+# Salas: dimensões do tabuleiro de cada sala, conexões por sala, número máximo de salas e segundos que uma sala
+# vazia (e ainda não terminada) se mantém aberta
+ROOM_WIDTH = 7
+ROOM_HEIGHT = 7
+ROOM_MAX_PLAYERS = 8
+MAX_ROOMS = 1024
+ROOM_IDLE_TIMEOUT = 60
+
+# Pré-geração de labirintos (ver MazeFactory): dimensões a ter prontas, labirintos prontos por dimensão e processos
+# do 'pool' (None para um por núcleo)
+MAZE_SIZES = [(ROOM_WIDTH, ROOM_HEIGHT)]
+MAZE_QUEUE_SIZE = 4
+MAZE_WORKERS = None
+
+# Cluster (ver Supervisor): processos de jogo (None para um por núcleo), processos do 'pool' de labirintos em cada
+# um, segundos para o cliente enviar o primeiro pedido ao 'router' e espera antes de reiniciar um processo
+CLUSTER_WORKERS = None
+CLUSTER_MAZE_WORKERS = 1
+ROUTER_TIMEOUT = 5
+RESTART_DELAY = 1
@@ -1,45 +1,84 @@
 # Seção de Importações
 import random
-from maze import MazeGenerator
+from collections import deque
+from concurrent.futures import Future
+import maze
+from interest import InterestGrid
+from grid import WallGrid, ObstacleView, WorldView, FogOfWar, iter_bits
+from metrics import metrics
 import time
 import const as co
 import json
 from datetime import datetime
 import os
 
+# Conversão de uma linha da grelha (um byte 0/1 por quadrícula) para texto
+_ROW_CHARS = bytes.maketrans(b"\x00\x01", b"01")
+
 
 class GameMech:
-    def __init__(self, x_max: int = 6, y_max: int = 6) -> None:
+    def __init__(self, x_max: int = 6, y_max: int = 6, seed: int = None, level=None, save_maze: bool = True) -> None:
         """
         Cria um dicionário onde cada posição manterá os elementos que estão em cada posição e um dicionário com
         informações do jogador (nome, n.º de pontos, etc.)
         :param x_max: Recebe um valor 'int' no eixo x que determinará o comprimento do tabuleiro nesse mesmo eixo.
         :param y_max: Recebe um valor 'int' no eixo y que determinará o comprimento do tabuleiro nesse mesmo eixo.
+        :param seed: A semente do labirinto (sem semente é escolhida uma ao acaso)
+        :param level: Um labirinto já gerado (ver MazeFactory), usado em vez de gerar um novo
+        :param save_maze: Se Falso, o labirinto não é gravado em 'MazeHistory' e 'last_maze.json'
         """
         self.x_max = x_max
         self.y_max = y_max
+        # Semente e versão do gerador: os clientes refazem o labirinto a partir delas em vez de o descarregar
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.maze_version = maze.GENERATOR_VERSION
+        self.maze_checksum = 0
+        self.level = level
+        self.save_maze = save_maze
         # Lista de Jogadores
         self.players = dict()
         # Lista de jogadores que mudaram de posição. Possui a seguinte estrutura:
         # [posição anterior, nova_posição] onde a primeira posição é a posição inicial quando a chave é criada
         self.phantom_players = dict()
-        # Lista de Obstáculos
-        self.obstacles = dict()
+        # Grelha densa de paredes (um byte por quadrícula)
+        self.grid = WallGrid(x_max, y_max)
+        # Lista de Obstáculos: vista só de leitura da grelha no formato {número: [tipo, (x, y)]}
+        self.obstacles = ObstacleView(self.grid)
         # Número de jogadores e obstáculos no jogo
         self.nr_players = 0
         self.nr_obstacles = 0
-        # Inicialização de cada posição no mundo com uma lista
-        self.world = dict()
-        for i in range(x_max):
-            for j in range(y_max):
-                self.world[(i, j)] = []
+        # Eventos (movimentos, entradas, saídas e fim de jogo) ainda não enviados aos clientes subscritos.
+        # Cada evento é um tuplo (tipo, jogador, x, y, nome).
+        self.events = deque(maxlen=co.MAX_PENDING_EVENTS)
+        # Fila de movimentos de cada jogador, consumida pela simulação a cada tick:
+        # {jogador: deque((movimento, future))}
+        self.inputs = dict()
+        # Número de ticks da simulação já executados
+        self.tick = 0
+        # Jogadores em cada posição ocupada: {(x, y): [['player', nome, número, (x, y)], ...]}
+        self.occupants = dict()
+        # Vista só de leitura do mundo no formato {(x, y): [elementos na posição]}, com as paredes da grelha e os
+        # jogadores de 'occupants'
+        self.world = WorldView(self.grid, self.occupants)
+        # Linhas do labirinto já exploradas por cada jogador
+        self.fog = FogOfWar(y_max)
+        # Índice espacial dos jogadores, para enviar a cada cliente só os jogadores perto do seu
+        self.interest = InterestGrid()
+        # Versões dos dados enviados aos clientes, que só aumentam: os clientes indicam a versão que já têm e recebem
+        # só o que mudou (ver ClientHandler.versioned_reply). Começam em 1 (ver protocol.NO_VERSION).
+        self.players_version = 1
+        self.obstacles_version = 1
+        self.status_version = 1
+        # Registo limitado das alterações aos jogadores: tuplos (versão, jogador)
+        self.changes = deque(maxlen=co.CHANGE_LOG_SIZE)
+        # Dados já codificados, por chave: {chave: (versão, bytes)}
+        self.blobs = dict()
         # Adição de obstáculos no mundo
         self.create_world()
         # Teste
         self.counting = 0
         self.game_over = False
         self.winner = None
-        self.seen_areas = set()
 
     def add_obstacle(self, types: str, x_pos: int, y_pos: int) -> bool:
         """
@@ -49,10 +88,12 @@ class GameMech:
         :param y_pos: um valor 'int' representando a coordenada y da localização do obstáculo
         :return: Retorna um valor booleano indicando se o obstáculo foi adicionado com sucesso
         """
-        nr_obstacle = self.nr_obstacles
-        self.obstacles[nr_obstacle] = [types, (x_pos, y_pos)]
-        self.world[(x_pos, y_pos)].append(['obstacle', types, nr_obstacle, (x_pos, y_pos)])
+        # A grelha só guarda paredes
+        if types != "wall" or self.grid.is_wall(x_pos, y_pos):
+            return False
+        self.grid.set_wall(x_pos, y_pos)
         self.nr_obstacles += 1
+        self.obstacles_version += 1
         return True
 
     def create_world(self):
@@ -60,42 +101,29 @@ class GameMech:
         Define o mundo inicial com a posição dos obstáculos
         :return: None
         """
-        maze = MazeGenerator(self.x_max, self.y_max)
-        grid = maze.generate_maze()
-
-        last_row = []
-        last_column = []
-
-        for x in range(self.x_max):
-            for y in range(self.y_max):
-                if grid[x][y] == 1:
-                    self.add_obstacle("wall", y, x)
-                if x == self.x_max - 2:  # Last row
-                    last_row.append((y, x))
-                if y == self.y_max - 2:  # Last column
-                    last_column.append((y, x))
-
-        # Choose a random cell from the last row or column that isn't a wall
-        potential_finish_cells = last_row + last_column
-        potential_finish_cells = [cell for cell in potential_finish_cells if not self.is_obstacle("wall", *cell)]
+        if self.level is not None:
+            # Labirinto gerado antes noutro processo: só é copiado para a grelha
+            self.seed, self.maze_version = self.level.seed, self.level.version
+            cells, self.finish = self.level.cells, self.level.finish
+        else:
+            cells, self.finish = maze.generate_level(self.x_max, self.y_max, self.seed, self.maze_version)
+        self.grid.load(cells)
+        self.nr_obstacles = self.grid.count
+        self.maze_checksum = maze.checksum(self.grid.cells)
+        self.obstacles_version += 1
 
-        self.finish = random.choice(potential_finish_cells) if potential_finish_cells else None
-        print(self.finish)
-
-        self.save_maze_to_file()
+        if self.save_maze:
+            self.save_maze_to_file()
 
     def is_obstacle(self, types, x, y):
         """
         Verifica se há um obstáculo de um determinado tipo numa determinada posição
-        :param types:
+        :param types: O tipo de obstáculo (só existem paredes)
         :param x: Valor de x a verificar
         :param y: Valor de y a verificar
         :return: Verdadeiro caso tenha um obstáculo do tipo dado na posição dada, Falso caso contrário
         """
-        for e in self.world[(x, y)]:
-            if e[0] == 'obstacle' and e[1] == types:
-                return True
-        return False
+        return types == "wall" and self.grid.is_wall(x, y)
 
     # Getters
     def get_players(self):
@@ -112,6 +140,28 @@ class GameMech:
         """
         return self.obstacles
 
+    def players_near(self, nr_player: int, radius: int = co.AOI_RADIUS) -> set:
+        """
+        Procura os jogadores na área de interesse de um jogador (incluindo o próprio).
+        :param nr_player: O número do jogador
+        :param radius: O raio da área de interesse
+        :return: O conjunto dos números dos jogadores, vazio se o jogador não estiver no jogo
+        """
+        if nr_player not in self.players:
+            return set()
+        x_pos, y_pos = self.players[nr_player][1]
+        return self.interest.near(x_pos, y_pos, radius)
+
+    def get_visible_players(self, nr_player=None) -> dict:
+        """
+        Retorna os jogadores que um jogador vê: os da sua área de interesse. Sem jogador, retorna todos.
+        :param nr_player: O número do jogador ou None
+        :return: Dicionário {número: [nome, (x, y), tick, raio]}
+        """
+        if nr_player is None:
+            return self.players
+        return {nr: self.players[nr] for nr in self.players_near(nr_player)}
+
     def get_nr_obstacles(self):
         """
         Retorna o número de obstáculos no mundo
@@ -135,8 +185,16 @@ class GameMech:
         if nr_player in self.players:
             name = self.players[nr_player][0]
             x_pos, y_pos = self.players[nr_player][1][0], self.players[nr_player][1][1]
-            self.world[(x_pos, y_pos)].remove(['player', name, nr_player, (x_pos, y_pos)])
+            self.remove_occupant(nr_player, name, x_pos, y_pos)
             self.players.pop(nr_player)
+            self.fog.forget(nr_player)
+            self.interest.remove(nr_player)
+            self.blobs.pop(("players", nr_player), None)
+            self.player_changed(nr_player)
+            # Movimentos pendentes do jogador removido ficam sem efeito
+            for move, future in self.inputs.pop(nr_player, ()):
+                future.set_result(None)
+            self.events.append((co.EV_LEAVE, nr_player, x_pos, y_pos, name))
         return nr_player
 
     def print_players(self):
@@ -162,13 +220,18 @@ class GameMech:
 
         # Coleta o tick real e mantenha-o no jogador. Cada jogador tem o seu próprio tick porque usamos o
         # incremento de tick em cada chamada é feita a mecânica do jogo.
-        # Isso é vai mudar nas implementações com ‘sockets’ onde o tempo é o valor absoluto que vem do servidor.
+        # O tick usa a mesma escala que o 'execute' (TIME_STEP ticks por segundo).
 
-        tick = int(time.time())
+        tick = int(time.time() * co.TIME_STEP)
 
         self.players[nr_player] = [name, (x_pos, y_pos), tick, radius]
-        self.world[(x_pos, y_pos)].append(['player', name, nr_player, (x_pos, y_pos)])
+        self.occupants.setdefault((x_pos, y_pos), []).append(['player', name, nr_player, (x_pos, y_pos)])
+        self.inputs[nr_player] = deque()
+        self.fog.reveal(nr_player, y_pos)
+        self.interest.add(nr_player, x_pos, y_pos)
+        self.player_changed(nr_player)
         self.nr_players += 1
+        self.events.append((co.EV_JOIN, nr_player, x_pos, y_pos, name))
         return nr_player
 
     def execute(self, move: int, types: str, nr_player: int) -> tuple:
@@ -180,90 +243,200 @@ class GameMech:
         :param nr_player: O número do jogador a ser movido
         :return: um tuplo com as novas coordenadas de posição x e y do jogador
         """
-        print(f"The movement is going to be: {move}")
-        print(f"The nr of the player is {nr_player}")
-        print(f" the players are: {self.players}")
-        print(self.get_players())
-
         if types == "player":
-            print(f"if nr player in players : {(nr_player in self.players)}")
-            print(f"nr_player type: {type(nr_player)}, value: {nr_player}")
-            print(f"players keys: {self.players.keys()}")
-
             if nr_player in self.players:
-                name = self.players[nr_player][0]
                 pos_x, pos_y = self.players[nr_player][1][0], self.players[nr_player][1][1]
                 tick = self.players[nr_player][2]
-                print(f"tick : {tick}")
-                radius = self.players[nr_player][3]
-
-                new_pos_x = pos_x
-                new_pos_y = pos_y
 
                 if self.players[nr_player][1] == self.finish:
-                    self.game_over = True
-                    self.winner = nr_player
-                    return new_pos_x, new_pos_y
-
-                    # Movimenta o Jogador à Esquerda
-                if move == co.M_LEFT:
-                    # Adquire a posição atual do jogador
-                    # Nova posição do jogador
-                    new_pos_x = pos_x - 1
-                    new_pos_y = pos_y
-                    # Se houver um obstáculo
-                    print(f"is obstacle: {self.is_obstacle('wall', new_pos_x, new_pos_y)}")
-                    if self.is_obstacle('wall', new_pos_x, new_pos_y):
-                        new_pos_x = pos_x
-
-                # Movimenta o Jogador à Direita
-                elif move == co.M_RIGHT:
-                    # Nova Posição
-                    new_pos_x = pos_x + 1
-                    new_pos_y = pos_y
-                    print(f"is obstacle: {self.is_obstacle('wall', new_pos_x, new_pos_y)}")
-                    if self.is_obstacle('wall', new_pos_x, new_pos_y):
-                        new_pos_x = pos_x
-
-                # Movimenta o Jogador para Cima
-                elif move == co.M_UP:
-                    # Nova Posição
-                    new_pos_y = pos_y - 1
-                    new_pos_x = pos_x
-                    print(f"is obstacle: {self.is_obstacle('wall', new_pos_x, new_pos_y)}")
-                    if self.is_obstacle('wall', new_pos_x, new_pos_y):
-                        new_pos_y = pos_y
-
-                # Movimenta o Jogador para Baixo
-                elif move == co.M_DOWN:
-                    # Nova Posição
-                    new_pos_y = pos_y + 1
-                    new_pos_x = pos_x
-                    print(f"is obstacle: {self.is_obstacle('wall', new_pos_x, new_pos_y)}")
-                    if self.is_obstacle('wall', new_pos_x, new_pos_y):
-                        new_pos_y = pos_y
+                    self.set_winner(nr_player)
+                    return pos_x, pos_y
+
+                new_pos_x, new_pos_y = self.next_position(pos_x, pos_y, move)
 
                 # Somente após o tick as alterações são realizadas (para coordenar entre os jogadores)
                 next_tick = int(time.time() * co.TIME_STEP)
-                print(f"next tick: {next_tick}")
                 if next_tick > tick:
-                    tick = next_tick
-                    # Update world
-                    self.players[nr_player] = [name, (new_pos_x, new_pos_y), tick, radius]
-                    # Previous objects in the initial position before phantom moves
-                    world_pos = self.world[(pos_x, pos_y)]
-                    # Removing object player in the previous position
-                    world_pos.remove(['player', name, nr_player, (pos_x, pos_y)])
-                    # Update the world with objects remaining in the position
-                    self.world[(pos_x, pos_y)] = world_pos
-                    self.world[(new_pos_x, new_pos_y)].append(['player', name, nr_player, (new_pos_x, new_pos_y)])
+                    self.place_player(nr_player, new_pos_x, new_pos_y, next_tick)
                 else:
                     # Reverte as alterações, pois não houve movimentação...
                     new_pos_x = pos_x
                     new_pos_y = pos_y
-                print(f"{new_pos_x}, {new_pos_y}")
+                metrics.inc("moves.applied" if (new_pos_x, new_pos_y) != (pos_x, pos_y) else "moves.rejected")
                 return new_pos_x, new_pos_y
 
+    def next_position(self, pos_x: int, pos_y: int, move: int) -> tuple:
+        """
+        Calcula a posição resultante de um movimento, que não se altera se o destino for uma parede.
+        :param pos_x: A coordenada x atual
+        :param pos_y: A coordenada y atual
+        :param move: Movimento a ser executado
+        :return: um tuplo com as novas coordenadas x e y
+        """
+        new_pos_x, new_pos_y = pos_x, pos_y
+        # Movimenta o Jogador à Esquerda
+        if move == co.M_LEFT:
+            new_pos_x = pos_x - 1
+        # Movimenta o Jogador à Direita
+        elif move == co.M_RIGHT:
+            new_pos_x = pos_x + 1
+        # Movimenta o Jogador para Cima
+        elif move == co.M_UP:
+            new_pos_y = pos_y - 1
+        # Movimenta o Jogador para Baixo
+        elif move == co.M_DOWN:
+            new_pos_y = pos_y + 1
+        # Se houver um obstáculo, o jogador fica onde está
+        if self.is_obstacle('wall', new_pos_x, new_pos_y):
+            return pos_x, pos_y
+        return new_pos_x, new_pos_y
+
+    def place_player(self, nr_player: int, new_pos_x: int, new_pos_y: int, tick: int):
+        """
+        Coloca um jogador numa nova posição, atualizando o mundo e registando o evento de movimento.
+        :param nr_player: O número do jogador
+        :param new_pos_x: A nova coordenada x
+        :param new_pos_y: A nova coordenada y
+        :param tick: O tick em que o movimento foi aplicado
+        :return: None
+        """
+        name, (pos_x, pos_y), _, radius = self.players[nr_player]
+        # Update world
+        self.players[nr_player] = [name, (new_pos_x, new_pos_y), tick, radius]
+        # Removing object player in the previous position
+        self.remove_occupant(nr_player, name, pos_x, pos_y)
+        self.occupants.setdefault((new_pos_x, new_pos_y), []).append(
+            ['player', name, nr_player, (new_pos_x, new_pos_y)])
+        if new_pos_y != pos_y:
+            self.fog.reveal(nr_player, new_pos_y)
+        if (new_pos_x, new_pos_y) != (pos_x, pos_y):
+            self.interest.move(nr_player, new_pos_x, new_pos_y)
+            self.player_changed(nr_player)
+            self.events.append((co.EV_MOVE, nr_player, new_pos_x, new_pos_y, name))
+
+    def remove_occupant(self, nr_player: int, name, x_pos: int, y_pos: int):
+        """
+        Retira um jogador da lista de ocupantes de uma posição.
+        :param nr_player: O número do jogador
+        :param name: O nome do jogador
+        :param x_pos: A coordenada x da posição
+        :param y_pos: A coordenada y da posição
+        :return: None
+        """
+        elements = self.occupants[(x_pos, y_pos)]
+        elements.remove(['player', name, nr_player, (x_pos, y_pos)])
+        if not elements:
+            del self.occupants[(x_pos, y_pos)]
+
+    def set_winner(self, nr_player: int):
+        """
+        Termina o jogo com o jogador indicado como vencedor, se ainda não tiver terminado.
+        :param nr_player: O número do jogador que chegou à meta
+        :return: None
+        """
+        if not self.game_over:
+            x_pos, y_pos = self.players[nr_player][1]
+            self.events.append((co.EV_GAME_OVER, nr_player, x_pos, y_pos, self.players[nr_player][0]))
+            self.game_over = True
+            self.winner = nr_player
+            self.status_version += 1
+
+    def player_changed(self, nr_player: int):
+        """
+        Regista uma alteração a um jogador (entrada, saída ou movimento), com uma nova versão dos jogadores.
+        :param nr_player: O número do jogador
+        :return: None
+        """
+        self.players_version += 1
+        self.changes.append((self.players_version, nr_player))
+
+    def players_changed_since(self, version: int):
+        """
+        Procura os jogadores alterados depois de uma versão, no registo de alterações.
+        :param version: A versão dos jogadores que o cliente tem
+        :return: O conjunto dos números dos jogadores alterados, ou None se o registo já não chega a essa versão
+        """
+        if version < 1 or version > self.players_version:
+            return None
+        if version < self.players_version and (not self.changes or self.changes[0][0] > version + 1):
+            return None
+        changed = set()
+        for change_version, nr_player in reversed(self.changes):
+            if change_version <= version:
+                break
+            changed.add(nr_player)
+        return changed
+
+    def cached_blob(self, key, version: int, build) -> bytes:
+        """
+        Devolve os dados codificados de uma versão, codificando-os só no primeiro pedido dessa versão.
+        :param key: A chave dos dados (por exemplo "obstacles")
+        :param version: A versão atual dos dados
+        :param build: Função sem argumentos que codifica os dados
+        :return: Os bytes codificados
+        """
+        entry = self.blobs.get(key)
+        if entry is None or entry[0] != version:
+            entry = (version, build())
+            self.blobs[key] = entry
+        return entry[1]
+
+    def queue_move(self, nr_player: int, move: int) -> Future:
+        """
+        Coloca um movimento na fila do jogador, para ser aplicado no próximo tick da simulação.
+        :param nr_player: O número do jogador
+        :param move: Movimento a ser executado
+        :return: Um 'Future' que recebe a posição do jogador depois de o movimento ser processado
+        """
+        future = Future()
+        inputs = self.inputs.get(nr_player)
+        if inputs is None or self.game_over:
+            future.set_result(self.players[nr_player][1] if nr_player in self.players else None)
+        elif len(inputs) >= co.INPUT_QUEUE_SIZE:
+            # Fila cheia: o movimento é rejeitado e o jogador fica onde está
+            metrics.inc("moves.dropped")
+            future.set_result(self.players[nr_player][1])
+        else:
+            inputs.append((move, future))
+        return future
+
+    def step(self):
+        """
+        Avança a simulação um tick: aplica no máximo um movimento por jogador, todos no mesmo lote, e verifica uma
+        única vez se algum jogador chegou à meta. A ordem dos jogadores roda a cada tick, para que nenhum jogador
+        seja sempre processado primeiro.
+        :return: None
+        """
+        self.tick += 1
+        order = [(nr, inputs) for nr, inputs in list(self.inputs.items()) if inputs]
+        if order:
+            start = self.tick % len(order)
+            order = order[start:] + order[:start]
+        tick = int(time.time() * co.TIME_STEP)
+        applied = []
+        for nr_player, inputs in order:
+            move, future = inputs.popleft()
+            if nr_player not in self.players:
+                future.set_result(None)
+                continue
+            if not self.game_over:
+                pos_x, pos_y = self.players[nr_player][1]
+                new_pos_x, new_pos_y = self.next_position(pos_x, pos_y, move)
+                self.place_player(nr_player, new_pos_x, new_pos_y, tick)
+                # Rejeitado: bloqueado por uma parede ou pelos limites do tabuleiro
+                metrics.inc("moves.applied" if (new_pos_x, new_pos_y) != (pos_x, pos_y) else "moves.rejected")
+            applied.append((nr_player, future))
+
+        # Deteção da meta, uma vez por tick, pela mesma ordem em que os movimentos foram aplicados
+        if not self.game_over:
+            for nr_player, _ in applied:
+                if self.players[nr_player][1] == self.finish:
+                    self.set_winner(nr_player)
+                    break
+
+        for nr_player, future in applied:
+            future.set_result(self.players[nr_player][1])
+
     def print_pos(self, x: int, y: int):
         """
         Imprime o conteúdo de uma posição específica no mundo
@@ -285,31 +458,44 @@ class GameMech:
     def get_finish(self):
         return self.finish
 
+    def get_level(self):
+        """
+        Devolve o necessário para refazer o labirinto: semente, dimensões, versão do gerador e 'checksum'.
+        :return: Um tuplo (semente, largura, altura, versão, 'checksum')
+        """
+        return self.seed, self.x_max, self.y_max, self.maze_version, self.maze_checksum
+
     def get_game_status(self):
         return self.game_over, self.winner
 
+    def drain_events(self) -> list:
+        """
+        Retira e devolve todos os eventos pendentes, pela ordem em que ocorreram.
+        :return: Lista de tuplos (tipo, jogador, x, y, nome)
+        """
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
     def get_full_maze_representation(self):
         """
         Generates a full string representation of the maze including the player's initial position.
         :return: List of strings, each representing a row of the maze.
         """
-        maze_representation = []
-        for y in range(self.y_max):
-            row = []
-            for x in range(self.x_max):
-                if x == 1 and y == 1:
-                    row.append("A")  # Player's initial position
-                elif self.is_obstacle("wall", x, y):
-                    row.append("1")
-                elif (x, y) == self.finish:
-                    row.append("P")
-                else:
-                    row.append("0")
-            maze_representation.append("".join(row))
+        maze_representation = [bytes(self.grid.row(y)).translate(_ROW_CHARS).decode() for y in range(self.y_max)]
+        if self.finish is not None:
+            x, y = self.finish
+            if not self.grid.is_wall(x, y):
+                maze_representation[y] = maze_representation[y][:x] + "P" + maze_representation[y][x + 1:]
+        if self.x_max > 1 and self.y_max > 1:
+            maze_representation[1] = maze_representation[1][:1] + "A" + maze_representation[1][2:]  # Player's start
         return maze_representation
 
     def save_maze_to_file(self):
-        maze_data = self.get_full_maze_representation()
+        self.write_maze_files(self.get_full_maze_representation())
+
+    def write_maze_files(self, maze_data):
         history_folder = os.path.join(os.path.dirname(__file__), "MazeHistory")
         os.makedirs(history_folder, exist_ok=True)
         filename = os.path.join(history_folder, f"maze_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
@@ -329,38 +515,32 @@ class GameMech:
         return {f"{x},{y}": "A" if (x, y) == (1, 1) else "P" if (x, y) == self.finish else (
             "1" if self.is_obstacle("wall", x, y) else "0") for x in range(self.x_max) for y in range(self.y_max)}
 
-    def get_maze_representation(self, player_y):
+    def take_revealed_rows(self, nr_player: int) -> list:
         """
-        Generates a string representation of the maze as seen by the player,
-        updating known areas when the player is around.
-        :param player_y: The Y coordinate of the player.
+        Retira as linhas do labirinto reveladas ao jogador desde o último pedido.
+        :param nr_player: O número do jogador
+        :return: Lista com as coordenadas y das linhas, por ordem crescente
+        """
+        return list(iter_bits(self.fog.take_unsent(nr_player)))
+
+    def get_maze_representation(self, nr_player: int) -> str:
+        """
+        Generates a string representation of the maze as seen by the player: the rows the player has explored and
+        '?' for the unknown ones.
+        :param nr_player: The number of the player.
         :return: String representation of the maze.
         """
+        position = self.players[nr_player][1] if nr_player in self.players else None
+        unknown = b"?" * self.x_max
         maze_representation = []
         for y in range(self.y_max):
-            row = []
-            for x in range(self.x_max):
-                is_visible = y in [player_y - 1, player_y, player_y + 1] or y in [0, self.y_max - 1]
-
-                # Visible rows and exterior walls
-                if is_visible:
-                    if self.is_obstacle("wall", x, y):
-                        row.append("1")
-                    elif (x, y) == self.finish:
-                        row.append("P")
-                    elif self.players and self.players[0][1] == (x, y):  # Assuming player[0] is the main player
-                        row.append("A")
-                    else:
-                        row.append("0")
-                    self.seen_areas.add((x, y))  # Remember this known area
-
-                # Previously seen but not currently visible areas
-                elif (x, y) in self.seen_areas:
-                    row.append("0" if not self.is_obstacle("wall", x, y) else "1")
-
-                # Unknown spaces
-                else:
-                    row.append("?")
-
-            maze_representation.append("".join(row))
-        return "\n".join(maze_representation)
+            if not self.fog.is_explored(nr_player, y):
+                maze_representation.append(unknown)
+                continue
+            row = bytearray(bytes(self.grid.row(y)).translate(_ROW_CHARS))
+            if self.finish is not None and self.finish[1] == y:
+                row[self.finish[0]] = ord("P")
+            if position is not None and position[1] == y:
+                row[position[0]] = ord("A")
+            maze_representation.append(bytes(row))
+        return b"\n".join(maze_representation).decode()
@@ -0,0 +1,213 @@
+# Seção de Importações
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+# Valores de cada quadrícula da grelha
+FREE = 0
+WALL = 1
+
+
+class WallGrid:
+    def __init__(self, width: int, height: int):
+        """
+        Grelha densa de paredes: um byte por quadrícula num 'bytearray', linha a linha (índice = y * largura + x).
+        Substitui o dicionário de listas por posição, com teste de parede em O(1) e leitura de linhas sem cópia.
+        :param width: A largura do tabuleiro
+        :param height: A altura do tabuleiro
+        """
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+        self.count = 0
+        # Índices das paredes por ordem, construídos só quando são precisos (numeração dos obstáculos)
+        self._wall_index = None
+
+    def is_wall(self, x: int, y: int) -> bool:
+        """
+        Verifica se há uma parede numa posição. As posições fora do tabuleiro contam como parede.
+        :param x: Valor de x a verificar
+        :param y: Valor de y a verificar
+        :return: Verdadeiro se a posição for uma parede, Falso caso contrário
+        """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x] == WALL
+        return True
+
+    def set_wall(self, x: int, y: int, wall: bool = True):
+        """
+        Coloca ou retira uma parede numa posição.
+        :param x: A coordenada x
+        :param y: A coordenada y
+        :param wall: Verdadeiro para colocar uma parede, Falso para a retirar
+        :return: None
+        """
+        index = y * self.width + x
+        value = WALL if wall else FREE
+        if self.cells[index] != value:
+            self.cells[index] = value
+            self.count += 1 if wall else -1
+            self._wall_index = None
+
+    def load(self, cells):
+        """
+        Substitui todas as quadrículas de uma vez, a partir de um buffer com a mesma ordem (linha a linha).
+        :param cells: Um buffer com um byte 0/1 por quadrícula
+        :return: None
+        """
+        if len(cells) != len(self.cells):
+            raise ValueError("o buffer não tem o tamanho da grelha")
+        self.cells[:] = cells
+        self.count = self.cells.count(WALL)
+        self._wall_index = None
+
+    def row(self, y: int) -> memoryview:
+        """
+        Devolve uma linha da grelha sem a copiar.
+        :param y: A coordenada y da linha
+        :return: Um 'memoryview' com um byte por quadrícula
+        """
+        start = y * self.width
+        return memoryview(self.cells)[start:start + self.width]
+
+    def wall_index(self) -> array:
+        """
+        Devolve os índices das quadrículas com parede, por ordem crescente.
+        :return: Um 'array' de inteiros sem sinal
+        """
+        if self._wall_index is None:
+            index = array('I')
+            cells = self.cells
+            position = cells.find(WALL)
+            while position != -1:
+                index.append(position)
+                position = cells.find(WALL, position + 1)
+            self._wall_index = index
+        return self._wall_index
+
+    def wall_number(self, x: int, y: int) -> int:
+        """
+        Devolve o número de obstáculo da parede numa posição (a ordem da parede, linha a linha).
+        :param x: A coordenada x
+        :param y: A coordenada y
+        :return: O número do obstáculo
+        """
+        return bisect_left(self.wall_index(), y * self.width + x)
+
+    def walls(self):
+        """
+        Percorre as paredes linha a linha.
+        :return: Um gerador de tuplos (x, y)
+        """
+        for index in self.wall_index():
+            y, x = divmod(index, self.width)
+            yield x, y
+
+
+class ObstacleView(Mapping):
+    def __init__(self, grid: WallGrid):
+        """
+        Vista só de leitura da grelha no formato antigo dos obstáculos: {número: ['wall', (x, y)]}.
+        :param grid: A grelha de paredes
+        """
+        self.grid = grid
+
+    def __getitem__(self, nr):
+        index = self.grid.wall_index()
+        if not isinstance(nr, int) or not 0 <= nr < len(index):
+            raise KeyError(nr)
+        y, x = divmod(index[nr], self.grid.width)
+        return ['wall', (x, y)]
+
+    def __len__(self):
+        return self.grid.count
+
+    def __iter__(self):
+        return iter(range(self.grid.count))
+
+
+class WorldView(Mapping):
+    def __init__(self, grid: WallGrid, occupants: dict):
+        """
+        Vista só de leitura no formato antigo do mundo: {(x, y): [elementos na posição]}. As paredes vêm da grelha
+        e os jogadores do dicionário esparso de ocupantes.
+        :param grid: A grelha de paredes
+        :param occupants: Dicionário {(x, y): [['player', nome, número, (x, y)], ...]}
+        """
+        self.grid = grid
+        self.occupants = occupants
+
+    def __getitem__(self, pos):
+        x, y = pos
+        if not (0 <= x < self.grid.width and 0 <= y < self.grid.height):
+            raise KeyError(pos)
+        elements = []
+        if self.grid.cells[y * self.grid.width + x] == WALL:
+            elements.append(['obstacle', 'wall', self.grid.wall_number(x, y), (x, y)])
+        elements.extend(self.occupants.get(pos, ()))
+        return elements
+
+    def __len__(self):
+        return self.grid.width * self.grid.height
+
+    def __iter__(self):
+        return ((i, j) for i in range(self.grid.width) for j in range(self.grid.height))
+
+
+def iter_bits(mask: int):
+    """
+    Percorre os bits a 1 de um inteiro, do menos significativo para o mais significativo.
+    :param mask: O inteiro
+    :return: Um gerador das posições dos bits
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class FogOfWar:
+    def __init__(self, height: int):
+        """
+        Nevoeiro de guerra de cada jogador: as linhas do tabuleiro já exploradas guardadas num 'bitset' (um inteiro,
+        com o bit y a 1 se a linha y já foi vista). Cada jogador vê a sua linha, as linhas adjacentes e as linhas
+        exteriores. Em cada movimento só se calculam as linhas que passam a ser conhecidas, que ficam também
+        marcadas para envio ao cliente.
+        :param height: A altura do tabuleiro
+        """
+        self.height = height
+        self.all_rows = (1 << height) - 1
+        self.border = (1 | 1 << max(height - 1, 0)) & self.all_rows
+        # Linhas exploradas e linhas reveladas ainda não enviadas ao cliente: {jogador: bitset}
+        self.explored = {}
+        self.unsent = {}
+
+    def reveal(self, nr_player: int, y: int) -> int:
+        """
+        Marca como exploradas as linhas visíveis de uma posição.
+        :param nr_player: O número do jogador
+        :param y: A coordenada y do jogador
+        :return: O 'bitset' das linhas que o jogador ainda não conhecia
+        """
+        visible = ((0b111 << y) >> 1 | self.border) & self.all_rows
+        explored = self.explored.get(nr_player, 0)
+        new = visible & ~explored
+        if new:
+            self.explored[nr_player] = explored | new
+            self.unsent[nr_player] = self.unsent.get(nr_player, 0) | new
+        return new
+
+    def is_explored(self, nr_player: int, y: int) -> bool:
+        return bool(self.explored.get(nr_player, 0) >> y & 1)
+
+    def take_unsent(self, nr_player: int) -> int:
+        """
+        Retira as linhas reveladas ao jogador desde o último envio.
+        :param nr_player: O número do jogador
+        :return: O 'bitset' das linhas
+        """
+        return self.unsent.pop(nr_player, 0)
+
+    def forget(self, nr_player: int):
+        self.explored.pop(nr_player, None)
+        self.unsent.pop(nr_player, None)
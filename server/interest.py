@@ -0,0 +1,80 @@
+# Seção de Importações
+import const
+
+
+class InterestGrid:
+    def __init__(self, cell_size: int = const.AOI_CELL_SIZE):
+        """
+        Índice espacial das posições dos jogadores para a gestão de interesse: o tabuleiro é dividido numa grelha
+        uniforme de 'buckets' quadrados e cada jogador fica no 'bucket' da sua posição. Procurar os jogadores perto de
+        uma posição só percorre os 'buckets' que intersetam o raio, em vez de todos os jogadores do jogo.
+        :param cell_size: O lado de cada 'bucket', em quadrículas
+        """
+        self.cell_size = cell_size
+        # Jogadores de cada 'bucket': {(bx, by): set(números)}
+        self.buckets = {}
+        # Posição de cada jogador: {número: (x, y)}
+        self.positions = {}
+
+    def bucket(self, x: int, y: int) -> tuple:
+        return x // self.cell_size, y // self.cell_size
+
+    def add(self, nr_player: int, x: int, y: int):
+        """
+        Indexa um jogador numa posição.
+        :param nr_player: O número do jogador
+        :param x: A coordenada x
+        :param y: A coordenada y
+        :return: None
+        """
+        self.positions[nr_player] = (x, y)
+        self.buckets.setdefault(self.bucket(x, y), set()).add(nr_player)
+
+    def remove(self, nr_player: int):
+        """
+        Retira um jogador do índice.
+        :param nr_player: O número do jogador
+        :return: None
+        """
+        position = self.positions.pop(nr_player, None)
+        if position is None:
+            return
+        key = self.bucket(*position)
+        players = self.buckets[key]
+        players.discard(nr_player)
+        if not players:
+            del self.buckets[key]
+
+    def move(self, nr_player: int, x: int, y: int):
+        """
+        Atualiza a posição de um jogador. Só mexe nos 'buckets' se o jogador mudar de 'bucket'.
+        :param nr_player: O número do jogador
+        :param x: A nova coordenada x
+        :param y: A nova coordenada y
+        :return: None
+        """
+        position = self.positions.get(nr_player)
+        if position is not None and self.bucket(*position) == self.bucket(x, y):
+            self.positions[nr_player] = (x, y)
+        else:
+            self.remove(nr_player)
+            self.add(nr_player, x, y)
+
+    def near(self, x: int, y: int, radius: int = const.AOI_RADIUS) -> set:
+        """
+        Procura os jogadores a uma distância de no máximo 'radius' quadrículas em x e em y de uma posição.
+        :param x: A coordenada x
+        :param y: A coordenada y
+        :param radius: O raio da área de interesse
+        :return: O conjunto dos números dos jogadores
+        """
+        found = set()
+        min_bx, min_by = self.bucket(x - radius, y - radius)
+        max_bx, max_by = self.bucket(x + radius, y + radius)
+        for bx in range(min_bx, max_bx + 1):
+            for by in range(min_by, max_by + 1):
+                for nr in self.buckets.get((bx, by), ()):
+                    p_x, p_y = self.positions[nr]
+                    if abs(p_x - x) <= radius and abs(p_y - y) <= radius:
+                        found.add(nr)
+        return found
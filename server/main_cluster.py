@@ -0,0 +1,20 @@
+# Seção de Importações
+import sys
+import const
+from cluster import Supervisor
+
+
+# Função que cria o Supervisor do cluster (um processo de jogo por núcleo, cada um com as suas salas) e o executa.
+def main():
+    # python main_cluster.py [processos] [threads|asyncio]
+    nr_workers = int(sys.argv[1]) if len(sys.argv) > 1 else const.CLUSTER_WORKERS
+    mode = sys.argv[2] if len(sys.argv) > 2 else const.SERVER_MODE
+    supervisor = Supervisor(nr_workers, mode)
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        print("Cluster stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,39 @@
 # Seção de Importações
-from game_mech import GameMech
+import os
+import sys
+import const
+from maze_factory import MazeFactory
+from metrics import metrics
+from rooms import RoomManager
 from server_skeleton import SkeletonServer
+from async_server import AsyncServer
 
 
-# Função que cria uma instância GameMech, cria uma instância SkeletonServer com a instância anterior como parâmetro e
-# executa o servidor.
+# Função que cria o gestor de salas (cada sala com o seu GameMech), cria o servidor no modo escolhido (threads ou
+# asyncio) com o gestor como parâmetro e executa o servidor.
 def main():
-    # Cria uma instância da classe GameMech com tamanho de tabuleiro 30x30 quadrículas
-    gm = GameMech(7, 7)
-    # Cria uma instância da classe SkeletonServer, passando a instância GameMech como parâmetro
-    skeleton = SkeletonServer(gm)
+    # Fábrica de labirintos: os labirintos das salas são gerados em segundo plano, noutros processos
+    factory = MazeFactory()
+    factory.start()
+    # Salas com tabuleiros de ROOM_WIDTH x ROOM_HEIGHT quadrículas, criadas à medida que os clientes entram
+    rooms = RoomManager(factory)
+    # O modo pode ser indicado na linha de comandos: python main_server.py [threads|asyncio]
+    mode = sys.argv[1] if len(sys.argv) > 1 else const.SERVER_MODE
+    if mode == const.MODE_ASYNCIO:
+        server = AsyncServer(rooms)
+    else:
+        # Cria uma instância da classe SkeletonServer, passando o gestor de salas como parâmetro
+        server = SkeletonServer(rooms)
+    # Métricas gravadas periodicamente num ficheiro (também disponíveis pelo pedido get_stats)
+    metrics.start_dump(os.path.join(os.path.dirname(os.path.abspath(__file__)), const.METRICS_FILE))
     # Inicia o servidor
-    skeleton.run()
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        print("Server stopped")
+    finally:
+        metrics.stop_dump()
+        factory.shutdown()
 
 
 if __name__ == "__main__":
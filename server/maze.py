@@ -1,51 +1,96 @@
 import random
+import zlib
+
+# Versão do algoritmo de geração. Um labirinto só é reproduzível a partir da semente com a mesma versão, pelo que
+# qualquer alteração que mude o resultado para uma dada semente tem de incrementar este número.
+GENERATOR_VERSION = 1
 
 
 class MazeGenerator:
-    def __init__(self, nr_max_x: int, nr_max_y: int):
+    def __init__(self, nr_max_x: int, nr_max_y: int, seed: int = None):
         """
         Construtor da classe "MazeGenerator"
         :param nr_max_x: A largura máxima do labirinto
         :param nr_max_y: A altura máxima do labirinto
+        :param seed: A semente do gerador aleatório (None para um labirinto não reproduzível)
         """
         self.width = nr_max_x
         self.height = nr_max_y
-        # Cria uma matriz 2D de paredes com as dimensões de largura x altura
-        self.grid = [[1 for i in range(self.height)] for i in range(self.width)]
+        # Gerador próprio, para que o mesmo labirinto possa ser refeito noutro processo a partir da semente.
+        # Só se usa 'random()', cuja sequência para uma semente é estável entre versões do Python.
+        self.random = random.Random(seed)
+        # Labirinto num 'bytearray' plano, um byte por célula (1 = parede): a célula (x, y) fica no índice
+        # x * altura + y, a mesma ordem da matriz 2D grid[x][y]
+        self.cells = bytearray(b"\x01") * (self.width * self.height)
+
+    def generate_cells(self) -> bytearray:
+        """
+        Gera o labirinto (algoritmo de Prim aleatório) diretamente no 'bytearray' plano, em tempo linear no número de
+        células: as fronteiras ficam numa lista, de onde se retira uma ao acaso em O(1) trocando-a com a última, e uma
+        marca por célula evita fronteiras repetidas.
+        :return: O 'bytearray' com o labirinto
+        """
+        width, height = self.width, self.height
+        cells = self.cells
+        if width < 3 or height < 3:
+            return cells
+        rand = self.random.random
+        # Passo entre células vizinhas em x (próxima linha da matriz) e em y
+        step_x, step_y = 2 * height, 2
+        queued = bytearray(width * height)
+        frontier = []
+        # Ponto de partida (1, 1)
+        x, y = 1, 1
+        cell = x * height + y
+        cells[cell] = 0
+        neighbours = []
+        while True:
+            # Fronteiras da célula atual (paredes a duas células de distância ainda não marcadas)
+            if 1 <= x < width - 1 and 1 <= y < height - 1:
+                if x > 1 and cells[cell - step_x] and not queued[cell - step_x]:
+                    queued[cell - step_x] = 1
+                    frontier.append(cell - step_x)
+                if x < width - 3 and cells[cell + step_x] and not queued[cell + step_x]:
+                    queued[cell + step_x] = 1
+                    frontier.append(cell + step_x)
+                if y > 1 and cells[cell - step_y] and not queued[cell - step_y]:
+                    queued[cell - step_y] = 1
+                    frontier.append(cell - step_y)
+                if y < height - 3 and cells[cell + step_y] and not queued[cell + step_y]:
+                    queued[cell + step_y] = 1
+                    frontier.append(cell + step_y)
+            if not frontier:
+                break
+            # Escolhe uma fronteira aleatória e retira-a trocando-a com a última
+            i = int(rand() * len(frontier))
+            cell = frontier[i]
+            last = frontier.pop()
+            if i < len(frontier):
+                frontier[i] = last
+            x, y = divmod(cell, height)
+            # Vizinhos da fronteira que já são passagem; liga a fronteira a um deles, ao acaso
+            neighbours.clear()
+            if x > 1 and not cells[cell - step_x]:
+                neighbours.append(cell - step_x)
+            if x < width - 3 and not cells[cell + step_x]:
+                neighbours.append(cell + step_x)
+            if y > 1 and not cells[cell - step_y]:
+                neighbours.append(cell - step_y)
+            if y < height - 3 and not cells[cell + step_y]:
+                neighbours.append(cell + step_y)
+            if neighbours:
+                other = neighbours[int(rand() * len(neighbours))]
+                cells[cell] = 0
+                cells[(cell + other) // 2] = 0
+        return cells
 
     def generate_maze(self):
         """
-        Gera o labirinto usando o algoritmo backtracker recursivo.
+        Gera o labirinto e devolve-o no formato de matriz.
         :return: Uma matriz 2D representando o labirinto
         """
-        # Define todas as fronteiras
-        s = set()
-        # Ponto de partida aleatório e definir-lo para não ser uma parede
-        # x, y = (random.randint(1, self.width - 2), random.randint(1, self.height - 2))
-        x = 1
-        y = 1
-        self.grid[x][y] = 0
-        # Fronteiras da célula atual
-        fs = self.frontier(x, y)
-        # Adicionar-los ao conjunto com todas as fronteiras
-        for f in fs:
-            s.add(f)
-        # Irá correr enquanto houver fronteiras no conjunto
-        while s:
-            # Escolhe uma fronteira aleatória e remove-a do conjunto de todas as fronteiras
-            x, y = random.choice(tuple(s))
-            s.remove((x, y))
-            # Vizinhança da fronteira aleatória
-            ns = self.neighbours(x, y)
-            # Se a fronteira escolhida aleatoriamente tiver vizinhos
-            if ns:
-                # Escolha de um vizinho aleatório e conexão
-                nx, ny = random.choice(tuple(ns))
-                self.connect(x, y, nx, ny)
-            fs = self.frontier(x, y)
-            for f in fs:
-                s.add(f)
-        return self.grid
+        cells = self.generate_cells()
+        return [list(cells[x * self.height:(x + 1) * self.height]) for x in range(self.width)]
 
     def frontier(self, x, y):
         """
@@ -54,17 +99,7 @@ class MazeGenerator:
         :param y: Coordenada y da célula
         :return: Um conjunto contendo todas as fronteiras da célula
         """
-        n = set()
-        if 1 <= x < self.width - 1 and 1 <= y < self.height - 1:
-            if x > 1 and self.is_wall(self.grid[x - 2][y]):
-                n.add((x - 2, y))
-            if x < self.width - 3 and self.is_wall(self.grid[x + 2][y]):
-                n.add((x + 2, y))
-            if y > 1 and self.is_wall(self.grid[x][y - 2]):
-                n.add((x, y - 2))
-            if y < self.height - 3 and self.is_wall(self.grid[x][y + 2]):
-                n.add((x, y + 2))
-        return n
+        return {cell for cell in self.candidates(x, y) if self.is_wall(self.cells[cell[0] * self.height + cell[1]])}
 
     def neighbours(self, x, y):
         """
@@ -73,16 +108,26 @@ class MazeGenerator:
         :param y: Coordenada x da célula
         :return: Um conjunto contendo todos os vizinhos da célula
         """
-        n = set()
+        return {cell for cell in self.candidates(x, y)
+                if not self.is_wall(self.cells[cell[0] * self.height + cell[1]])}
+
+    def candidates(self, x, y):
+        """
+        Encontra as células a duas posições de distância que podem ser fronteiras ou vizinhos da célula dada.
+        :param x: Coordenada x da célula
+        :param y: Coordenada y da célula
+        :return: Uma lista de tuplos (x, y)
+        """
+        n = []
         if 1 <= x < self.width - 1 and 1 <= y < self.height - 1:
-            if x > 1 and not self.is_wall(self.grid[x - 2][y]):
-                n.add((x - 2, y))
-            if x < self.width - 3 and not self.is_wall(self.grid[x + 2][y]):
-                n.add((x + 2, y))
-            if y > 1 and not self.is_wall(self.grid[x][y - 2]):
-                n.add((x, y - 2))
-            if y < self.height - 3 and not self.is_wall(self.grid[x][y + 2]):
-                n.add((x, y + 2))
+            if x > 1:
+                n.append((x - 2, y))
+            if x < self.width - 3:
+                n.append((x + 2, y))
+            if y > 1:
+                n.append((x, y - 2))
+            if y < self.height - 3:
+                n.append((x, y + 2))
         return n
 
     def is_wall(self, cell):
@@ -109,5 +154,36 @@ class MazeGenerator:
         """
         x = (x1 + x2) // 2
         y = (y1 + y2) // 2
-        self.grid[x1][y1] = 0
-        self.grid[x][y] = 0
+        self.cells[x1 * self.height + y1] = 0
+        self.cells[x * self.height + y] = 0
+
+
+def generate_level(width: int, height: int, seed: int, version: int = GENERATOR_VERSION) -> tuple:
+    """
+    Gera o labirinto e a meta de um tabuleiro de forma determinística: a mesma semente, dimensões e versão dão sempre
+    o mesmo resultado, no servidor e nos clientes.
+    :param width: A largura do tabuleiro
+    :param height: A altura do tabuleiro
+    :param seed: A semente do labirinto
+    :param version: A versão do algoritmo de geração
+    :return: Um tuplo ('bytearray' com um byte por quadrícula linha a linha, meta (x, y) ou None)
+    """
+    if version != GENERATOR_VERSION:
+        raise ValueError(f"versão do gerador não suportada: {version}")
+    # As linhas da matriz do gerador são o eixo y do tabuleiro, pelo que o buffer fica linha a linha
+    maze = MazeGenerator(height, width, seed)
+    cells = maze.generate_cells()
+    # A meta é uma quadrícula livre da última linha ou coluna, escolhida com o mesmo gerador
+    candidates = [(x, height - 2) for x in range(width)] + [(width - 2, y) for y in range(height)]
+    candidates = [(x, y) for x, y in candidates if 0 <= x < width and 0 <= y < height and not cells[y * width + x]]
+    finish = candidates[int(maze.random.random() * len(candidates))] if candidates else None
+    return cells, finish
+
+
+def checksum(cells) -> int:
+    """
+    Calcula o 'checksum' de um labirinto, usado para confirmar que um labirinto refeito a partir da semente é igual.
+    :param cells: O buffer com um byte por quadrícula
+    :return: O CRC-32 do buffer
+    """
+    return zlib.crc32(cells)
@@ -0,0 +1,144 @@
+# Seção de Importações
+import multiprocessing
+import random
+import signal
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import const
+import maze
+from game_mech import GameMech
+
+# Labirinto pronto a usar: semente, dimensões, versão do gerador, grelha (um byte por quadrícula) e meta
+Level = namedtuple("Level", ["seed", "width", "height", "version", "cells", "finish"])
+
+
+def build_level(width: int, height: int, seed: int) -> Level:
+    """
+    Gera um labirinto. Corre nos processos do 'pool', pelo que tem de estar ao nível do módulo.
+    :param width: A largura do tabuleiro
+    :param height: A altura do tabuleiro
+    :param seed: A semente do labirinto
+    :return: O labirinto gerado
+    """
+    cells, finish = maze.generate_level(width, height, seed)
+    return Level(seed, width, height, maze.GENERATOR_VERSION, bytes(cells), finish)
+
+
+def ignore_interrupts():
+    """
+    Inicialização dos processos do 'pool': o Ctrl-C é tratado pelo processo principal, que encerra o 'pool'.
+    :return: None
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class MazeFactory:
+    def __init__(self, sizes=None, queue_size: int = const.MAZE_QUEUE_SIZE, workers: int = const.MAZE_WORKERS):
+        """
+        Fábrica de labirintos: mantém, para cada dimensão configurada, uma fila limitada de labirintos já gerados por
+        um 'pool' de processos (um por núcleo), para que um jogo novo comece sem esperar pela geração. A fila é
+        reabastecida em segundo plano sempre que um labirinto é retirado.
+        :param sizes: Lista de dimensões (largura, altura) a ter prontas
+        :param queue_size: O número de labirintos prontos por dimensão
+        :param workers: O número de processos do 'pool' (None para um por núcleo)
+        """
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        # Labirintos prontos e pedidos em curso, por dimensão
+        self.ready = {}
+        self.pending = {}
+        for size in (sizes if sizes is not None else const.MAZE_SIZES):
+            self.ready[tuple(size)] = deque()
+            self.pending[tuple(size)] = 0
+        self.stop = False
+        # 'spawn' em vez de 'fork': os processos são criados com o servidor já a correr várias 'threads'
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=ignore_interrupts)
+        # Gravação dos ficheiros do labirinto, fora do caminho de criação do jogo
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        """
+        Começa a encher as filas de todas as dimensões configuradas.
+        :return: None
+        """
+        for size in list(self.ready):
+            self.refill(size)
+
+    def refill(self, size: tuple):
+        """
+        Pede ao 'pool' os labirintos que faltam para encher a fila de uma dimensão.
+        :param size: A dimensão (largura, altura)
+        :return: None
+        """
+        with self.lock:
+            if self.stop or size not in self.ready:
+                return
+            missing = self.queue_size - len(self.ready[size]) - self.pending[size]
+            self.pending[size] += max(missing, 0)
+        for _ in range(missing):
+            try:
+                future = self.pool.submit(build_level, size[0], size[1], random.getrandbits(32))
+            except RuntimeError:
+                # O 'pool' já foi encerrado
+                return
+            future.add_done_callback(lambda f, s=size: self.on_ready(s, f))
+
+    def on_ready(self, size: tuple, future):
+        """
+        Guarda um labirinto gerado pelo 'pool' e volta a pedir outro se a fila ainda não estiver cheia.
+        :param size: A dimensão (largura, altura)
+        :param future: O 'Future' do pedido ao 'pool'
+        :return: None
+        """
+        with self.lock:
+            self.pending[size] -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                print(f"Erro na geração do labirinto {size}: {future.exception()}", flush=True)
+                return
+            self.ready[size].append(future.result())
+        self.refill(size)
+
+    def take(self, width: int, height: int) -> Level:
+        """
+        Retira um labirinto pronto da fila, em O(1). Se a fila estiver vazia (ou a dimensão não estiver configurada),
+        o labirinto é gerado na hora.
+        :param width: A largura do tabuleiro
+        :param height: A altura do tabuleiro
+        :return: O labirinto
+        """
+        size = (width, height)
+        with self.lock:
+            ready = self.ready.get(size)
+            level = ready.popleft() if ready else None
+            if level is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self.refill(size)
+        if level is None:
+            level = build_level(width, height, random.getrandbits(32))
+        return level
+
+    def new_game(self, width: int, height: int) -> GameMech:
+        """
+        Cria um jogo com um labirinto da fila. Os ficheiros do labirinto são gravados em segundo plano.
+        :param width: A largura do tabuleiro
+        :param height: A altura do tabuleiro
+        :return: O novo GameMech
+        """
+        gm = GameMech(width, height, level=self.take(width, height), save_maze=False)
+        self.writer.submit(gm.write_maze_files, gm.get_full_maze_representation())
+        return gm
+
+    def shutdown(self):
+        with self.lock:
+            self.stop = True
+        # Espera pelo fim dos processos do 'pool' (num processo do cluster não há limpeza à saída)
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.writer.shutdown(wait=True)
@@ -0,0 +1,232 @@
+# Seção de Importações
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+import const
+
+# Limites superiores (em segundos) dos 'buckets' dos histogramas de latência: de 1 us a 10 s, em progressão 1-2-5
+BUCKETS = tuple(m * 10.0 ** e for e in range(-6, 1) for m in (1, 2, 5)) + (10.0,)
+
+
+class Histogram:
+    def __init__(self):
+        """
+        Histograma de latências com 'buckets' fixos: registar um valor custa uma pesquisa binária e uma soma, e os
+        percentis são estimados pelo limite superior do 'bucket'.
+        """
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram"):
+        """
+        Soma a este histograma as observações de outro.
+        :param other: O outro histograma
+        :return: None
+        """
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.max > self.max:
+            self.max = other.max
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Estima um percentil.
+        :param fraction: O percentil entre 0 e 1
+        :return: O limite superior do 'bucket' onde está o percentil (o máximo, no último 'bucket')
+        """
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.total / self.count if self.count else 0.0, "max": self.max,
+                "p50": self.percentile(0.5), "p95": self.percentile(0.95), "p99": self.percentile(0.99),
+                "buckets": {f"{bound:g}": count for bound, count in zip(BUCKETS + (float("inf"),), self.counts)
+                            if count}}
+
+
+class Metrics:
+    def __init__(self, enabled: bool = const.METRICS_ENABLED):
+        """
+        Registo de métricas do processo: contadores (conexões, comandos por tipo, movimentos, bytes, erros) e
+        histogramas de latência (tratamento dos comandos, espera na fila da simulação, serialização, ticks).
+        Desativado, cada chamada só testa 'enabled' e não mede tempos.
+        Cada 'thread' regista numa parte só sua, sem 'lock' (as 'threads' dos clientes não esperam umas pelas outras):
+        as partes são juntadas em 'snapshot', e as das 'threads' que já terminaram são acumuladas numa só.
+        :param enabled: Se as métricas são registadas
+        """
+        self.enabled = enabled
+        # Protege a lista das partes, não os valores
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # Partes das 'threads' em funcionamento: lista de tuplos ('thread', contadores, histogramas)
+        self.shards = []
+        # Contadores e histogramas das 'threads' que já terminaram
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self.stop = threading.Event()
+        self.dump_thread = None
+
+    def inc(self, name: str, amount: int = 1):
+        """
+        Soma um valor a um contador.
+        :param name: O nome do contador
+        :param amount: O valor a somar (negativo para contadores de valores correntes, como conexões ativas)
+        :return: None
+        """
+        if self.enabled:
+            counters = self.shard()[1]
+            counters[name] = counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float):
+        """
+        Regista uma latência num histograma.
+        :param name: O nome do histograma
+        :param seconds: A latência em segundos
+        :return: None
+        """
+        if self.enabled:
+            histograms = self.shard()[2]
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def shard(self) -> tuple:
+        """
+        Obtém a parte das métricas da 'thread' atual, criada na primeira utilização.
+        :return: Um tuplo ('thread', contadores, histogramas)
+        """
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = (threading.current_thread(), {}, {})
+            with self.lock:
+                # Cada conexão tem a sua 'thread': as partes das que terminaram são juntadas aqui, e não só em
+                # 'snapshot', para que a lista não cresça sem limite
+                self.collect()
+                self.shards.append(shard)
+        return shard
+
+    def collect(self):
+        """
+        Acumula as partes das 'threads' que já terminaram (e já não mudam), que deixam de ser guardadas. Chamado com o
+        'lock' adquirido.
+        :return: None
+        """
+        running = []
+        for shard in self.shards:
+            if shard[0].is_alive():
+                running.append(shard)
+            else:
+                self.merge_into(self.counters, self.histograms, shard[1], shard[2])
+        self.shards = running
+
+    def clock(self) -> float:
+        """
+        Início de uma medição de latência, a terminar com 'since'.
+        :return: O instante atual, ou 0 se as métricas estiverem desativadas (sem ler o relógio)
+        """
+        return time.perf_counter() if self.enabled else 0.0
+
+    def since(self, name: str, start: float):
+        """
+        Regista num histograma o tempo decorrido desde 'clock'.
+        :param name: O nome do histograma
+        :param start: O valor devolvido por 'clock'
+        :return: None
+        """
+        if start:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """
+        Junta as partes de todas as 'threads' numa cópia do estado atual das métricas. As partes das 'threads' em
+        funcionamento são lidas enquanto são alteradas, pelo que um valor pode não incluir a última observação.
+        :return: Dicionário com o tempo de funcionamento, os contadores e os histogramas
+        """
+        with self.lock:
+            self.collect()
+            counters = dict(self.counters)
+            histograms = {}
+            self.merge_into(counters, histograms, {}, self.histograms)
+            for _, shard_counters, shard_histograms in self.shards:
+                self.merge_into(counters, histograms, dict(shard_counters), dict(shard_histograms))
+        return {"pid": os.getpid(), "uptime": time.time() - self.started, "counters": counters,
+                "histograms": {name: h.to_dict() for name, h in histograms.items()}}
+
+    @staticmethod
+    def merge_into(counters: dict, histograms: dict, other_counters: dict, other_histograms: dict):
+        """
+        Soma contadores e histogramas aos de outro registo.
+        :param counters: Os contadores de destino
+        :param histograms: Os histogramas de destino
+        :param other_counters: Os contadores a somar
+        :param other_histograms: Os histogramas a somar
+        :return: None
+        """
+        for name, value in other_counters.items():
+            counters[name] = counters.get(name, 0) + value
+        for name, histogram in other_histograms.items():
+            merged = histograms.get(name)
+            if merged is None:
+                merged = histograms[name] = Histogram()
+            merged.merge(histogram)
+
+    def dump(self, path: str):
+        """
+        Grava as métricas num ficheiro JSON, substituindo-o de uma só vez.
+        :param path: O caminho do ficheiro
+        :return: None
+        """
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.snapshot(), file, indent=4)
+        os.replace(temporary, path)
+
+    def start_dump(self, path: str, interval: float = const.METRICS_DUMP_INTERVAL):
+        """
+        Começa a gravar as métricas periodicamente numa 'thread' própria (nada é gravado se estiverem desativadas ou
+        o intervalo for 0).
+        :param path: O caminho do ficheiro
+        :param interval: O intervalo entre gravações, em segundos
+        :return: None
+        """
+        if not self.enabled or not interval:
+            return
+
+        def run():
+            while not self.stop.wait(interval):
+                try:
+                    self.dump(path)
+                except OSError as e:
+                    print(f"Erro ao gravar as métricas: {e}", flush=True)
+
+        self.dump_thread = threading.Thread(target=run, daemon=True)
+        self.dump_thread.start()
+
+    def stop_dump(self):
+        self.stop.set()
+        if self.dump_thread is not None:
+            self.dump_thread.join()
+
+
+# Registo do processo, partilhado por todos os módulos do servidor
+metrics = Metrics()
@@ -0,0 +1,202 @@
+# Seção de Importações
+import cProfile
+import json
+import os
+import pstats
+import threading
+import tracemalloc
+from datetime import datetime
+import const
+
+# Modos de uma sessão de 'profiling'
+MODE_CPU = "cpu"
+MODE_MEMORY = "memory"
+# Etiqueta dos comandos de conexões que ainda não estão numa sala e dos ticks (que avançam todas as salas)
+NO_ROOM = "lobby"
+ALL_ROOMS = "all"
+
+
+class Profiler:
+    def __init__(self, directory: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), const.PROFILE_DIR)):
+        """
+        'Profiler' que pode ser ligado e desligado com o servidor a correr (pedido 'profile'). Durante uma sessão, cada
+        comando tratado (ver ClientHandler.process_data), as operações que este envia ao ciclo da simulação e os ticks
+        são medidos com a etiqueta (sala, tipo de comando):
+        - modo 'cpu': um cProfile determinístico por etiqueta (e por 'thread', juntos no fim), gravado em pstats;
+        - modo 'memory': um snapshot do tracemalloc no fim da sessão e a memória alocada por etiqueta. Com várias
+          'threads' a tratar comandos ao mesmo tempo, a memória por etiqueta é aproximada.
+        Fora de uma sessão, o custo é o teste de 'active'.
+        :param directory: A pasta onde é criada uma subpasta por sessão
+        """
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.active = False
+        self.mode = None
+        self.session = None
+        self.timer = None
+        # Perfis de CPU: {(sala, comando, 'thread'): cProfile.Profile}
+        self.profiles = {}
+        # Memória alocada por etiqueta: {(sala, comando): [chamadas, bytes]}
+        self.allocations = {}
+        self.started_tracing = False
+        # Etiqueta do comando em curso em cada 'thread'
+        self.local = threading.local()
+
+    def start(self, mode: str, seconds: float) -> str:
+        """
+        Começa uma sessão, que termina sozinha ao fim do tempo indicado (ou com 'stop').
+        :param mode: MODE_CPU ou MODE_MEMORY
+        :param seconds: A duração da sessão
+        :return: A pasta onde os resultados vão ser gravados
+        """
+        with self.lock:
+            if self.active:
+                raise RuntimeError(f"A {self.mode} profiling session is already running")
+            self.session = os.path.join(self.directory, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{mode}")
+            os.makedirs(self.session, exist_ok=True)
+            self.mode = mode
+            self.profiles = {}
+            self.allocations = {}
+            if mode == MODE_MEMORY and not tracemalloc.is_tracing():
+                tracemalloc.start(const.PROFILE_FRAMES)
+                self.started_tracing = True
+            self.timer = threading.Timer(seconds, self.stop)
+            self.timer.daemon = True
+            self.timer.start()
+            self.active = True
+            print(f"Profiling ({mode}) for {seconds} s into {self.session}", flush=True)
+            return self.session
+
+    def stop(self) -> list:
+        """
+        Termina a sessão em curso e grava os resultados.
+        :return: Lista com os ficheiros gravados (vazia se não havia sessão)
+        """
+        with self.lock:
+            if not self.active:
+                return []
+            self.active = False
+            self.timer.cancel()
+            if self.mode == MODE_CPU:
+                files = self.save_cpu()
+            else:
+                files = self.save_memory()
+            print(f"Profiling finished: {len(files)} files in {self.session}", flush=True)
+            return files
+
+    def run(self, room, command: str, fn, *args):
+        """
+        Executa uma função medida com a etiqueta (sala, comando). Dentro de outra medição (por exemplo uma operação
+        executada de imediato pelo ciclo da simulação), a função conta para a medição de fora.
+        :param room: O número da sala, NO_ROOM ou ALL_ROOMS
+        :param command: O tipo de comando
+        :param fn: A função a executar
+        :param args: Os argumentos da função
+        :return: O resultado da função
+        """
+        if getattr(self.local, "tag", None) is not None or not self.active:
+            return fn(*args)
+        tag = (room, command)
+        self.local.tag = tag
+        try:
+            if self.mode == MODE_CPU:
+                return self.run_cpu(tag, fn, args)
+            return self.run_memory(tag, fn, args)
+        finally:
+            self.local.tag = None
+
+    def wrap(self, fn):
+        """
+        Prepara uma função enviada ao ciclo da simulação para ser medida com a etiqueta do comando que a enviou.
+        :param fn: A função
+        :return: A função a executar no ciclo da simulação
+        """
+        tag = getattr(self.local, "tag", None)
+        if tag is None:
+            return fn
+        return lambda *args: self.run(tag[0], tag[1], fn, *args)
+
+    def run_cpu(self, tag: tuple, fn, args: tuple):
+        key = tag + (threading.get_ident(),)
+        with self.lock:
+            profile = self.profiles.get(key)
+            if profile is None:
+                profile = self.profiles[key] = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Outro 'profiler' ativo nesta 'thread'
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            profile.disable()
+
+    def run_memory(self, tag: tuple, fn, args: tuple):
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            return fn(*args)
+        finally:
+            allocated = tracemalloc.get_traced_memory()[0] - before
+            with self.lock:
+                entry = self.allocations.setdefault(tag, [0, 0])
+                entry[0] += 1
+                entry[1] += allocated
+
+    def file_name(self, tag: tuple, extension: str) -> str:
+        room, command = tag
+        room = f"room{room}" if isinstance(room, int) else room
+        return os.path.join(self.session, f"{room}-{command}.{extension}")
+
+    def save_cpu(self) -> list:
+        """
+        Junta os perfis de cada etiqueta (um por 'thread') e grava-os em pstats, um ficheiro por sala e comando.
+        :return: Lista com os ficheiros gravados
+        """
+        by_tag = {}
+        for (room, command, thread), profile in self.profiles.items():
+            by_tag.setdefault((room, command), []).append(profile)
+        files = []
+        for tag, profiles in by_tag.items():
+            stats = None
+            for profile in profiles:
+                try:
+                    if stats is None:
+                        stats = pstats.Stats(profile)
+                    else:
+                        stats.add(profile)
+                except TypeError:
+                    # Perfil sem chamadas registadas
+                    pass
+            if stats is not None:
+                path = self.file_name(tag, "pstats")
+                stats.dump_stats(path)
+                files.append(path)
+        self.profiles = {}
+        return files
+
+    def save_memory(self) -> list:
+        """
+        Grava o snapshot do tracemalloc e a memória alocada por sala e comando.
+        :return: Lista com os ficheiros gravados
+        """
+        files = []
+        if tracemalloc.is_tracing():
+            path = os.path.join(self.session, "snapshot.tracemalloc")
+            tracemalloc.take_snapshot().dump(path)
+            files.append(path)
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        path = os.path.join(self.session, "allocations.json")
+        summary = [{"room": room, "command": command, "calls": calls, "bytes": allocated}
+                   for (room, command), (calls, allocated) in sorted(self.allocations.items(), key=str)]
+        with open(path, "w") as file:
+            json.dump(summary, file, indent=4)
+        files.append(path)
+        self.allocations = {}
+        return files
+
+
+# 'Profiler' do processo, partilhado pelos 'handlers' e pelo ciclo da simulação
+profiler = Profiler()
@@ -0,0 +1,100 @@
+# Seção de Importações
+import struct
+from collections import namedtuple
+
+# Protocolo binário partilhado entre o servidor e o cliente. Cada mensagem é enviada num 'frame' com um cabeçalho de
+# tamanho fixo seguido do 'payload':
+#   versão (1 byte) | tipo (1 byte) | flags (2 bytes) | id do pedido (4 bytes) | comprimento do payload (4 bytes)
+# O id do pedido é devolvido na resposta, o que permite ao cliente enviar vários pedidos seguidos (pipelining) e
+# associar cada resposta ao respetivo pedido.
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("!BBHII")
+HEADER_SIZE = HEADER.size
+MAX_PAYLOAD = 64 * 1024 * 1024
+
+# Flags do cabeçalho
+FLAG_REPLY = 0x0001
+FLAG_PUSH = 0x0002
+# Respostas a pedidos condicionais: os dados não mudaram desde a versão do cliente, ou vem só o delta desde essa versão
+FLAG_NOT_MODIFIED = 0x0004
+FLAG_DELTA = 0x0008
+
+# Formatos dos 'payloads' simples
+INT = struct.Struct("!i")
+POSITION = struct.Struct("!ii")
+STATUS = struct.Struct("!?i")
+MOVE = struct.Struct("!BB")
+# Nível: semente, largura, altura, versão do gerador e 'checksum' do labirinto
+LEVEL = struct.Struct("!IHHHI")
+# Versão dos dados num pedido condicional (a que o cliente já tem) e no início da resposta (a atual). As versões do
+# servidor começam em 1: NO_VERSION pede sempre os dados completos.
+VERSION = struct.Struct("!I")
+NO_VERSION = 0
+
+# Tipos de objeto num pedido de movimento
+OBJ_NONE = 0
+OBJ_PLAYER = 1
+
+# Pedido de 'profiling' (administração): ação e duração máxima em segundos
+PROFILE = struct.Struct("!BH")
+PROFILE_STOP = 0
+PROFILE_CPU = 1
+PROFILE_MEMORY = 2
+
+Frame = namedtuple("Frame", ["msg_type", "flags", "request_id", "payload"])
+
+
+class ProtocolError(Exception):
+    """
+    Erro levantado quando é recebido um 'frame' inválido ou uma resposta de erro.
+    """
+    pass
+
+
+def encode_frame(msg_type: int, payload=b"", request_id: int = 0, flags: int = 0) -> bytes:
+    """
+    Constrói um 'frame' completo (cabeçalho + payload).
+    :param msg_type: O tipo da mensagem
+    :param payload: Os bytes (ou memoryview) do payload
+    :param request_id: O id do pedido a que o 'frame' pertence
+    :param flags: As flags do cabeçalho
+    :return: Os bytes do 'frame'
+    """
+    return HEADER.pack(PROTOCOL_VERSION, msg_type, flags, request_id, len(payload)) + payload
+
+
+class FrameDecoder:
+    def __init__(self):
+        """
+        Descodificador incremental de 'frames'. Aceita os dados pela ordem em que chegam do 'socket', mesmo que um
+        'frame' venha partido em vários segmentos ou que vários 'frames' venham no mesmo segmento.
+        """
+        self.buffer = bytearray()
+
+    def feed(self, data) -> list:
+        """
+        Acrescenta dados recebidos e devolve os 'frames' completos que estes permitem descodificar.
+        Os payloads são fatias 'memoryview' do 'buffer' interno, pelo que não são copiados.
+        :param data: Os bytes recebidos
+        :return: Lista de objetos Frame completos
+        """
+        self.buffer += data
+        buffer = self.buffer
+        view = memoryview(buffer)
+        frames = []
+        offset = 0
+        while len(buffer) - offset >= HEADER_SIZE:
+            version, msg_type, flags, request_id, length = HEADER.unpack_from(buffer, offset)
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"Unsupported protocol version: {version}")
+            if length > MAX_PAYLOAD:
+                raise ProtocolError(f"Payload too large: {length}")
+            end = offset + HEADER_SIZE + length
+            if len(buffer) < end:
+                break
+            frames.append(Frame(msg_type, flags, request_id, view[offset + HEADER_SIZE:end]))
+            offset = end
+        if offset:
+            # Os 'frames' devolvidos continuam a referenciar o 'buffer' antigo; o resto fica num 'buffer' novo
+            self.buffer = buffer[offset:]
+        return frames
@@ -0,0 +1,210 @@
+# Seção de Importações
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+import const
+from game_mech import GameMech
+from maze_factory import MazeFactory
+from subscriptions import Broadcaster
+
+
+class Room:
+    def __init__(self, room_id: int, gm_obj: GameMech):
+        """
+        Uma sala: um jogo independente, com o seu GameMech e o seu difusor.
+        :param room_id: O número da sala
+        :param gm_obj: O jogo da sala
+        """
+        self.room_id = room_id
+        self.gm = gm_obj
+        self.broadcaster = Broadcaster(gm_obj)
+        # Número de conexões na sala
+        self.clients = 0
+        # Instante em que a sala ficou vazia (None enquanto tiver clientes)
+        self.empty_since = time.monotonic()
+
+    def is_open(self) -> bool:
+        """
+        Verifica se a sala aceita jogadores novos na atribuição automática.
+        :return: Verdadeiro se o jogo não terminou e a sala não está cheia
+        """
+        return not self.gm.game_over and self.clients < const.ROOM_MAX_PLAYERS
+
+    def tick(self):
+        """
+        Avança a simulação da sala um tick e difunde as alterações aos seus subscritores.
+        :return: None
+        """
+        self.gm.step()
+        self.broadcaster.flush()
+
+
+class RoomManager:
+    def __init__(self, factory: MazeFactory, width: int = const.ROOM_WIDTH, height: int = const.ROOM_HEIGHT,
+                 shard: int = 0, shards: int = 1):
+        """
+        Gestor das salas de um servidor: cria salas a pedido (por número ou por atribuição automática), avança todas
+        as salas no mesmo ciclo da simulação e desmonta as salas terminadas ou abandonadas. Os números das salas
+        desmontadas voltam a ficar livres e as salas novas usam labirintos já prontos da fábrica.
+        O jogo de uma sala nova é criado fora do 'lock' (o número da sala fica reservado entretanto), para que gerar um
+        labirinto não pare o ciclo da simulação das outras salas.
+        Num cluster (ver Supervisor), cada processo só tem as salas cujo número dá resto 'shard' na divisão por
+        'shards'.
+        :param factory: A fábrica de labirintos
+        :param width: A largura do tabuleiro de cada sala
+        :param height: A altura do tabuleiro de cada sala
+        :param shard: O número deste processo no cluster
+        :param shards: O número de processos do cluster
+        """
+        self.factory = factory
+        self.width = width
+        self.height = height
+        self.shard = shard
+        self.shards = shards
+        self.lock = threading.Lock()
+        self.rooms = {}
+        # Salas em criação: {número da sala: [Future com a sala, conexões que vão entrar]}
+        self.creating = {}
+        # Jogos já criados por 'prepare' para as próximas salas novas
+        self.spares = []
+        self.preparing = 0
+
+    def prepare(self):
+        """
+        Cria com antecedência o jogo de uma sala nova se não houver uma sala aberta, para que a entrada a seguir não o
+        tenha de criar. Usado no modo asyncio, a partir de uma 'thread' do 'executor', antes de a conexão entrar numa
+        sala: a entrada corre no ciclo de eventos, que não deve gerar labirintos.
+        :return: None
+        """
+        with self.lock:
+            if len(self.spares) + self.preparing >= const.MAZE_QUEUE_SIZE or any(
+                    room.is_open() for room in self.rooms.values()):
+                return
+            self.preparing += 1
+        gm = None
+        try:
+            gm = self.factory.new_game(self.width, self.height)
+        finally:
+            with self.lock:
+                self.preparing -= 1
+                if gm is not None:
+                    self.spares.append(gm)
+
+    def create_room(self, room_id: int, future: Future) -> Room:
+        """
+        Cria uma sala reservada por 'join', com um jogo já preparado ou com um jogo novo. Chamado sem o 'lock': só a
+        reserva e a publicação da sala o adquirem.
+        :param room_id: O número da sala
+        :param future: O 'Future' da reserva, onde as outras conexões que entram na sala esperam por ela
+        :return: A sala criada
+        """
+        try:
+            with self.lock:
+                gm = self.spares.pop() if self.spares else None
+            if gm is None:
+                gm = self.factory.new_game(self.width, self.height)
+            room = Room(room_id, gm)
+        except Exception as e:
+            with self.lock:
+                del self.creating[room_id]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            room.clients = self.creating.pop(room_id)[1]
+            room.empty_since = None
+            self.rooms[room_id] = room
+            print(f"Room {room_id} created ({len(self.rooms)} rooms)", flush=True)
+        future.set_result(room)
+        return room
+
+    def join(self, room_id: int = const.ROOM_AUTO) -> Room:
+        """
+        Junta uma conexão a uma sala. Com um número, entra nessa sala (criando-a se não existir); com ROOM_AUTO,
+        entra na primeira sala aberta ou numa sala nova.
+        :param room_id: O número da sala ou ROOM_AUTO
+        :return: A sala, ou None se a sala pedida estiver cheia ou terminada, ou não houver lugar para mais salas
+        """
+        future = None
+        with self.lock:
+            if room_id == const.ROOM_AUTO:
+                room = next((r for r in self.rooms.values() if r.is_open()), None)
+                if room is None:
+                    # Uma sala em criação com lugar, ou uma sala nova
+                    room_id = next((i for i, (_, clients) in self.creating.items()
+                                    if clients < const.ROOM_MAX_PLAYERS), None)
+                    if room_id is None:
+                        room_id = next(i for i in itertools.count(self.shard, self.shards)
+                                       if i not in self.rooms and i not in self.creating)
+            elif room_id < 0 or room_id % self.shards != self.shard:
+                # A sala pertence a outro processo do cluster
+                return None
+            else:
+                room = self.rooms.get(room_id)
+                if room is not None and not room.is_open():
+                    return None
+                if room is None and self.creating.get(room_id, (None, 0))[1] >= const.ROOM_MAX_PLAYERS:
+                    return None
+            if room is not None:
+                room.clients += 1
+                room.empty_since = None
+                return room
+            reservation = self.creating.get(room_id)
+            if reservation is None:
+                if len(self.rooms) + len(self.creating) >= const.MAX_ROOMS:
+                    return None
+                future = Future()
+                reservation = self.creating[room_id] = [future, 0]
+            reservation[1] += 1
+            waiting = reservation[0]
+        if future is not None:
+            return self.create_room(room_id, future)
+        # Outra conexão está a criar a sala (nunca no modo asyncio, em que a criação não é interrompida)
+        try:
+            return waiting.result()
+        except Exception:
+            return None
+
+    def leave(self, room: Room):
+        """
+        Retira uma conexão de uma sala.
+        :param room: A sala
+        :return: None
+        """
+        with self.lock:
+            room.clients -= 1
+            if room.clients == 0:
+                room.empty_since = time.monotonic()
+
+    def step(self):
+        """
+        Avança todas as salas um tick e desmonta as salas vazias que terminaram ou estão vazias há demasiado tempo.
+        :return: None
+        """
+        with self.lock:
+            rooms = list(self.rooms.values())
+        for room in rooms:
+            try:
+                room.tick()
+            except Exception as e:
+                print(f"Erro no tick da sala {room.room_id}: {e}", flush=True)
+        now = time.monotonic()
+        closed = []
+        with self.lock:
+            for room in rooms:
+                if self.rooms.get(room.room_id) is not room or room.clients > 0:
+                    continue
+                if room.gm.game_over or now - room.empty_since > const.ROOM_IDLE_TIMEOUT:
+                    del self.rooms[room.room_id]
+                    closed.append(room)
+        for room in closed:
+            room.broadcaster.shutdown()
+            print(f"Room {room.room_id} closed", flush=True)
+
+    def shutdown(self):
+        with self.lock:
+            rooms = list(self.rooms.values())
+            self.rooms.clear()
+            self.spares.clear()
+        for room in rooms:
+            room.broadcaster.shutdown()
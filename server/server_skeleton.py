@@ -1,33 +1,79 @@
 # Seção de Importações
 import socket
 import threading
-from game_mech import GameMech
 import const
 from client_handler import ClientHandler
+from rooms import RoomManager
+from tick_loop import TickLoop
 
 
 # Está no lado do servidor: Skeleton to ‘user’ ‘interface’ (permite ter informação de como comunicar com o cliente)
 class SkeletonServer:
-    def __init__(self, gm_obj: GameMech):
+    def __init__(self, rooms: RoomManager, listen: bool = True):
         """
         Construtor da classe 'SkeletonServer'
-        :param gm_obj: Um objeto GameMech que representa o mecanismo do jogo
+        :param rooms: O gestor das salas (cada sala tem o seu jogo)
+        :param listen: Se Falso, o servidor não abre o 'socket' de escuta e só recebe conexões por 'adopt'
         """
-        self.gm = gm_obj
-        self.s = socket.socket()
-        self.s.bind((const.ADDRESS, const.PORT))
-        self.s.listen()
+        self.rooms = rooms
+        self.s = None
+        if listen:
+            self.s = socket.socket()
+            self.s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.s.bind((const.ADDRESS, const.PORT))
+            self.s.listen()
         self.stop = False
+        self.stopped = threading.Event()
+        self.tick_loop = TickLoop(rooms)
 
-    def run(self):
-        while not self.stop:
-            socket_client, address = self.s.accept()
-            print(f"Connection established with {address}")
-            # Create an instance of the ClientHandler class and pass the clientPlayer socket
-            client_handler = ClientHandler(self.gm)
+    def adopt(self, socket_client, initial=b""):
+        """
+        Passa a servir uma conexão aceite noutro sítio (por exemplo, recebida do Supervisor).
+        :param socket_client: O 'socket' da conexão do cliente
+        :param initial: Bytes já lidos da conexão
+        :return: None
+        """
+        # Create an instance of the ClientHandler class and pass the clientPlayer socket
+        client_handler = ClientHandler(rooms=self.rooms, actor=self.tick_loop)
 
-            # Handle client in a separate thread
-            client_thread = threading.Thread(target=client_handler.handle_client, args=(socket_client,))
-            client_thread.start()
+        # Handle client in a separate thread
+        client_thread = threading.Thread(target=client_handler.handle_client, args=(socket_client, initial),
+                                         daemon=True)
+        client_thread.start()
 
+    def run(self):
+        self.tick_loop.start()
+        try:
+            if self.s is None:
+                # Sem 'socket' de escuta: as conexões chegam por 'adopt' até o servidor ser parado
+                self.stopped.wait()
+            while self.s is not None and not self.stop:
+                try:
+                    socket_client, address = self.s.accept()
+                except OSError:
+                    # O 'socket' de escuta foi fechado pelo 'shutdown'
+                    if self.stop:
+                        break
+                    raise
+                print(f"Connection established with {address}")
+                self.adopt(socket_client)
+        finally:
+            self.tick_loop.shutdown()
+            self.rooms.shutdown()
+            if self.s is not None:
+                self.s.close()
+
+    def shutdown(self):
+        """
+        Pede ao servidor para parar, fechando o 'socket' de escuta para desbloquear o 'accept'.
+        :return: None
+        """
+        self.stop = True
+        self.stopped.set()
+        if self.s is None:
+            return
+        try:
+            self.s.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         self.s.close()
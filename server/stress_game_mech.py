@@ -0,0 +1,112 @@
+# Seção de Importações
+import random
+import sys
+import threading
+import time
+from game_mech import GameMech
+from tick_loop import TickLoop
+
+"""
+Teste de carga da concorrência no GameMech: muitas 'threads' adicionam jogadores, enviam movimentos e removem
+jogadores ao mesmo tempo que a simulação corre. No modo 'actor' (o do servidor) todas as operações passam pelo ciclo
+da simulação (TickLoop.submit); no modo 'direct' as 'threads' chamam o GameMech diretamente, como faziam os
+ClientHandler com um 'lock' por conexão. No fim são verificados os invariantes do estado do jogo.
+Utilização: python stress_game_mech.py [actor|direct] [threads] [operações por thread]
+"""
+
+TICK_HZ = 200
+
+
+def worker(call, gm: GameMech, nr_ops: int, seed: int, results: list, errors: list):
+    """
+    Executa uma sequência aleatória de operações de um cliente.
+    :param call: Função que executa uma operação do jogo, com argumentos (função, *argumentos)
+    :param gm: O jogo
+    :param nr_ops: O número de operações
+    :param seed: A semente do gerador aleatório
+    :param results: Lista onde são guardados os números dos jogadores adicionados e removidos
+    :param errors: Lista onde são guardadas as exceções
+    :return: None
+    """
+    rnd = random.Random(seed)
+    mine = []
+    try:
+        for _ in range(nr_ops):
+            if not mine or rnd.random() < 0.2:
+                nr = call(gm.add_player, f"p{seed}", 1, 1, 100)
+                mine.append(nr)
+                results.append(("add", nr))
+            elif rnd.random() < 0.1:
+                nr = mine.pop(rnd.randrange(len(mine)))
+                call(gm.remove_player, nr)
+                results.append(("remove", nr))
+            else:
+                call(gm.queue_move, rnd.choice(mine), rnd.randrange(4))
+    except Exception as e:
+        errors.append(e)
+
+
+def check(gm: GameMech, results: list, errors: list) -> list:
+    """
+    Verifica os invariantes do estado do jogo depois do teste.
+    :return: Lista com a descrição das violações encontradas
+    """
+    added = [nr for op, nr in results if op == "add"]
+    removed = [nr for op, nr in results if op == "remove"]
+    problems = [f"{len(errors)} exceções, por exemplo: {errors[0]!r}"] if errors else []
+    if len(set(added)) != len(added):
+        problems.append(f"números de jogador repetidos: {len(added) - len(set(added))}")
+    if gm.nr_players != len(added):
+        problems.append(f"nr_players = {gm.nr_players}, mas foram adicionados {len(added)} jogadores")
+    if len(gm.players) != len(set(added)) - len(set(removed)):
+        problems.append(f"{len(gm.players)} jogadores no jogo, esperados {len(set(added)) - len(set(removed))}")
+    occupants = sum(len(elements) for elements in gm.occupants.values())
+    if occupants != len(gm.players):
+        problems.append(f"{occupants} ocupantes no mundo para {len(gm.players)} jogadores")
+    for nr, (name, pos, tick, radius) in gm.players.items():
+        if ['player', name, nr, pos] not in gm.occupants.get(pos, ()):
+            problems.append(f"o jogador {nr} não está na sua posição {pos}")
+            break
+    return problems
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else "actor"
+    nr_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    nr_ops = int(sys.argv[3]) if len(sys.argv) > 3 else 2000
+    # Trocas de 'thread' muito frequentes, para expor as corridas
+    sys.setswitchinterval(1e-5)
+
+    gm = GameMech(21, 21, seed=1, save_maze=False)
+    tick_loop = TickLoop(gm, hz=TICK_HZ)
+    tick_loop.start()
+    if mode == "direct":
+        def call(fn, *args):
+            return fn(*args)
+    else:
+        def call(fn, *args):
+            return tick_loop.submit(fn, *args).result()
+
+    results, errors = [], []
+    threads = [threading.Thread(target=worker, args=(call, gm, nr_ops, seed, results, errors))
+               for seed in range(nr_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    tick_loop.shutdown()
+
+    total = nr_threads * nr_ops
+    print(f"{mode}: {nr_threads} threads, {total} operações em {elapsed:.2f} s ({total / elapsed:,.0f} ops/s)")
+    problems = check(gm, results, errors)
+    for problem in problems:
+        print(f"  FALHA: {problem}")
+    if not problems:
+        print("  OK: estado consistente")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# Seção de Importações
+import queue
+import threading
+import codec
+import const
+import protocol
+from game_mech import GameMech
+from metrics import metrics
+
+
+class QueueSubscriber:
+    def __init__(self, send):
+        """
+        Subscritor usado no modo 'threads': os 'frames' ficam numa fila limitada e são enviados por uma 'thread'
+        própria, para que um cliente lento nunca bloqueie o difusor.
+        :param send: Função que envia os bytes de um 'frame' para o cliente
+        """
+        self.send = send
+        self.queue = queue.Queue(maxsize=const.SUBSCRIBER_QUEUE_SIZE)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def push(self, data: bytes) -> bool:
+        """
+        Coloca um 'frame' na fila de envio sem bloquear.
+        :param data: Os bytes do 'frame'
+        :return: Falso se a fila está cheia (o cliente está atrasado), Verdadeiro caso contrário
+        """
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except queue.Full:
+            return False
+
+    def clear(self):
+        """
+        Descarta os 'frames' ainda por enviar.
+        :return: None
+        """
+        with self.queue.mutex:
+            self.queue.queue.clear()
+
+    def run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            try:
+                self.send(data)
+            except OSError:
+                break
+
+    def close(self):
+        self.clear()
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class Broadcaster:
+    def __init__(self, gm_obj: GameMech):
+        """
+        Difunde o estado do jogo aos clientes subscritos: um snapshot completo quando o cliente subscreve e, em cada
+        tick da simulação (ver TickLoop), um delta com os eventos ocorridos desde o tick anterior.
+        Os subscritores com jogador só recebem o que se passa na área de interesse desse jogador (ver InterestGrid):
+        os movimentos e saídas dos jogadores que já viam e eventos de entrada e saída quando um jogador cruza o limite
+        da área. Os bytes enviados a cada cliente deixam assim de crescer com o número de jogadores da sala.
+        :param gm_obj: Um objeto GameMech que representa o mecanismo do jogo
+        """
+        self.gm = gm_obj
+        self.lock = threading.Lock()
+        # Subscritores e o jogador de cada um (None para receber tudo): {subscritor: jogador}
+        self.subscribers = {}
+        # Jogadores que cada subscritor com jogador conhece: {subscritor: set(números)}
+        self.visible = {}
+        # Subscritores que perderam deltas e precisam de um snapshot novo
+        self.stale = set()
+        self.tick = 0
+
+    def snapshot_frame(self, subscriber, request_id: int = 0, flags: int = protocol.FLAG_PUSH,
+                       msg_type: int = const.subscribe, prefix: bytes = b"") -> bytes:
+        """
+        Constrói o 'frame' com o estado do jogo visto por um subscritor e atualiza os jogadores que este conhece.
+        :param subscriber: O subscritor
+        :param request_id: O id do pedido de subscrição (0 num reenvio espontâneo)
+        :param flags: As flags do cabeçalho
+        :param msg_type: O tipo da mensagem do 'frame'
+        :param prefix: Bytes a colocar no 'payload' antes do snapshot
+        :return: Os bytes do 'frame'
+        """
+        start = metrics.clock()
+        game_over, winner = self.gm.get_game_status()
+        players = dict(self.gm.get_visible_players(self.subscribers.get(subscriber)))
+        if self.subscribers.get(subscriber) is not None:
+            self.visible[subscriber] = set(players)
+        payload = prefix + codec.encode_snapshot(self.tick, players, game_over, winner)
+        frame = protocol.encode_frame(msg_type, payload, request_id, flags)
+        metrics.since("serialize.snapshot", start)
+        return frame
+
+    def subscribe(self, subscriber, request_id: int, nr_player: int = None, msg_type: int = const.subscribe,
+                  prefix: bytes = b""):
+        """
+        Regista um subscritor e envia-lhe o snapshot como resposta ao pedido de subscrição. Como o snapshot e os
+        deltas passam pela mesma fila, o cliente recebe sempre o snapshot antes dos deltas seguintes.
+        :param subscriber: O subscritor (com 'push', 'clear' e 'close')
+        :param request_id: O id do pedido de subscrição
+        :param nr_player: O jogador do cliente, para filtrar por área de interesse (None para receber tudo)
+        :param msg_type: O tipo do pedido a que se responde (subscribe ou join_game)
+        :param prefix: Bytes a enviar na resposta antes do snapshot (por exemplo o resto do estado inicial)
+        :return: None
+        """
+        with self.lock:
+            self.subscribers[subscriber] = nr_player
+            subscriber.push(self.snapshot_frame(subscriber, request_id, protocol.FLAG_REPLY, msg_type, prefix))
+            self.stale.discard(subscriber)
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.pop(subscriber, None)
+            self.visible.pop(subscriber, None)
+            self.stale.discard(subscriber)
+        subscriber.close()
+
+    def interest_events(self, subscriber, nr_player: int, by_player: dict, game_over: list) -> list:
+        """
+        Filtra os eventos de um tick pela área de interesse do jogador de um subscritor. Só percorre os jogadores
+        que o subscritor conhecia e os que estão agora na área, não os eventos de toda a sala.
+        :param subscriber: O subscritor
+        :param nr_player: O jogador do subscritor
+        :param by_player: Os eventos do tick agrupados por jogador: {jogador: [eventos]}
+        :param game_over: Os eventos de fim de jogo do tick
+        :return: Lista de tuplos (tipo, jogador, x, y, nome)
+        """
+        players = self.gm.players
+        known = self.visible.get(subscriber, set())
+        near = self.gm.players_near(nr_player)
+        events = []
+        for nr in near:
+            if nr in known:
+                events.extend(event for event in by_player.get(nr, ()) if event[0] == const.EV_MOVE)
+            else:
+                name, (x_pos, y_pos) = players[nr][0], players[nr][1]
+                events.append((const.EV_ENTER, nr, x_pos, y_pos, name))
+        for nr in known - near:
+            if nr in players:
+                x_pos, y_pos = players[nr][1]
+                events.append((const.EV_EXIT, nr, x_pos, y_pos, ""))
+            else:
+                events.extend(event for event in by_player.get(nr, ()) if event[0] == const.EV_LEAVE)
+        self.visible[subscriber] = near
+        events.extend(game_over)
+        return events
+
+    def flush(self):
+        """
+        Retira os eventos pendentes do GameMech e envia-os num único delta a cada subscritor.
+        :return: None
+        """
+        with self.lock:
+            events = self.gm.drain_events()
+            self.tick += 1
+            if not self.subscribers:
+                return
+            # Tempo de filtrar e codificar os deltas de todos os subscritores
+            start = metrics.clock()
+            data = None
+            by_player, game_over = {}, []
+            for event in events:
+                if event[0] == const.EV_GAME_OVER:
+                    game_over.append(event)
+                else:
+                    by_player.setdefault(event[1], []).append(event)
+            for subscriber, nr_player in self.subscribers.items():
+                if subscriber in self.stale:
+                    # Substitui o que ficou por enviar por um snapshot novo
+                    subscriber.clear()
+                    if subscriber.push(self.snapshot_frame(subscriber)):
+                        self.stale.discard(subscriber)
+                    continue
+                if not events:
+                    continue
+                if nr_player is None:
+                    if data is None:
+                        data = protocol.encode_frame(const.delta, codec.encode_events(self.tick, events), 0,
+                                                     protocol.FLAG_PUSH)
+                    frame = data
+                else:
+                    own = self.interest_events(subscriber, nr_player, by_player, game_over)
+                    if not own:
+                        continue
+                    frame = protocol.encode_frame(const.delta, codec.encode_events(self.tick, own), 0,
+                                                  protocol.FLAG_PUSH)
+                if not subscriber.push(frame):
+                    metrics.inc("broadcast.overflows")
+                    self.stale.add(subscriber)
+            metrics.since("serialize.deltas", start)
+
+    def shutdown(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.subscribers.clear()
+            self.visible.clear()
+            self.stale.clear()
+        for subscriber in subscribers:
+            subscriber.close()
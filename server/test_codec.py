@@ -0,0 +1,33 @@
+# Seção de Importações
+import unittest
+import codec
+import const
+
+"""
+Testes da codificação binária (codec.py). Utilização: python -m unittest test_codec
+"""
+
+
+class NameEncodingTest(unittest.TestCase):
+    def test_long_multibyte_name_round_trip(self):
+        # 'é' ocupa 2 bytes: cortar aos 255 bytes partiria o último carácter a meio
+        name = "é" * 200
+        players = codec.decode_players(codec.encode_players({1: [name, (1, 1), 0, 1]}))
+        self.assertEqual(players[1][0], "é" * 127)
+        self.assertEqual(players[1][1:], [(1, 1), 0, 1])
+
+    def test_long_multibyte_name_in_events(self):
+        name = "ação" * 100
+        tick, events = codec.decode_events(codec.encode_events(3, [(const.EV_JOIN, 1, 2, 3, name)]))
+        self.assertEqual(tick, 3)
+        decoded = events[0][4]
+        self.assertTrue(name.startswith(decoded))
+        self.assertLessEqual(len(decoded.encode(const.STRING_ENCODING)), 255)
+
+    def test_short_name_unchanged(self):
+        players = codec.decode_players(codec.encode_players({7: ["José", (4, 5), 9, 100]}))
+        self.assertEqual(players, {7: ["José", (4, 5), 9, 100]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+# Seção de Importações
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import const
+from game_mech import GameMech
+from metrics import metrics
+from profiler import profiler, ALL_ROOMS
+from subscriptions import Broadcaster
+
+
+class TickLoop:
+    def __init__(self, gm_obj: GameMech, broadcaster: Broadcaster = None, hz: float = const.TICK_HZ):
+        """
+        Ciclo autoritário da simulação: a um ritmo fixo, aplica os movimentos em fila de todos os jogadores
+        (GameMech.step) e envia o delta resultante aos clientes subscritos. Com um RoomManager, um único ciclo avança
+        todas as salas (RoomManager.step), cada uma com o seu difusor.
+        É também o único escritor do estado do jogo: as conexões não mexem no GameMech diretamente, mas enviam
+        comandos ('submit') que o ciclo executa entre ticks, pela ordem de chegada, devolvendo o resultado num
+        'Future'. Assim não são precisos 'locks' no GameMech.
+        :param gm_obj: O objeto a avançar em cada tick: um GameMech ou um RoomManager
+        :param broadcaster: O difusor de snapshots e deltas (opcional)
+        :param hz: O número de ticks por segundo
+        """
+        self.gm = gm_obj
+        self.broadcaster = broadcaster
+        self.period = 1 / hz
+        self.stop = False
+        self.thread = None
+        # Comandos pendentes: tuplos (função, argumentos, 'future', instante de envio para as métricas)
+        self.commands = queue.SimpleQueue()
+        # Ciclo de eventos, quando o ciclo corre no modo asyncio (ver run_async)
+        self.loop = None
+        # Identificador da 'thread' que executa o ciclo (a única que mexe no estado do jogo)
+        self.owner = None
+
+    def submit(self, fn, *args) -> Future:
+        """
+        Pede a execução de uma operação do jogo pelo ciclo da simulação.
+        :param fn: A função a executar
+        :param args: Os argumentos da função
+        :return: Um 'Future' com o resultado (ou a exceção) da função
+        """
+        future = Future()
+        if profiler.active:
+            # Medida com a etiqueta do comando que a enviou
+            fn = profiler.wrap(fn)
+        if self.owner is None or self.owner == threading.get_ident():
+            # Já na 'thread' do ciclo (ou o ciclo ainda não arrancou): executa já
+            self.execute((fn, args, future, 0.0))
+        elif self.stop:
+            future.set_exception(RuntimeError("A simulação terminou"))
+        elif self.loop is not None:
+            self.loop.call_soon_threadsafe(self.execute, (fn, args, future, metrics.clock()))
+        else:
+            self.commands.put((fn, args, future, metrics.clock()))
+        return future
+
+    def execute(self, command):
+        fn, args, future, submitted = command
+        # Tempo de espera na fila, até o ciclo da simulação pegar no comando
+        metrics.since("tick_loop.queue_wait", submitted)
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def tick(self):
+        """
+        Executa um tick: avança a simulação e difunde as alterações.
+        :return: None
+        """
+        start = metrics.clock()
+        try:
+            if profiler.active:
+                profiler.run(ALL_ROOMS, "tick", self.advance)
+            else:
+                self.advance()
+        except Exception as e:
+            print(f"Erro no tick da simulação: {e}", flush=True)
+        metrics.since("tick_loop.tick", start)
+
+    def advance(self):
+        self.gm.step()
+        if self.broadcaster is not None:
+            self.broadcaster.flush()
+
+    def run(self):
+        self.owner = threading.get_ident()
+        next_tick = time.monotonic()
+        while not self.stop:
+            next_tick += self.period
+            self.tick()
+            # Até ao próximo tick, executa os comandos à medida que chegam
+            delay = next_tick - time.monotonic()
+            while delay > 0:
+                try:
+                    command = self.commands.get(timeout=delay)
+                except queue.Empty:
+                    break
+                if command is None:
+                    break
+                self.execute(command)
+                delay = next_tick - time.monotonic()
+            if delay <= -self.period:
+                # Tick atrasado: não tenta recuperar os ticks perdidos
+                next_tick = time.monotonic()
+        # Os comandos que ficaram por executar falham
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            if command is not None:
+                command[2].set_exception(RuntimeError("A simulação terminou"))
+
+    async def run_async(self):
+        """
+        Versão do ciclo para o modo asyncio: os ticks correm no próprio ciclo de eventos, que passa a ser o único
+        escritor. Os comandos enviados a partir do ciclo de eventos são executados de imediato.
+        :return: None
+        """
+        self.loop = asyncio.get_running_loop()
+        self.owner = threading.get_ident()
+        next_tick = time.monotonic()
+        while not self.stop:
+            next_tick += self.period
+            self.tick()
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Tick atrasado: não tenta recuperar os ticks perdidos
+                next_tick = time.monotonic()
+                await asyncio.sleep(0)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        # Até a 'thread' arrancar, os comandos ficam na fila em vez de serem executados por quem os envia
+        self.owner = -1
+        self.thread.start()
+
+    def shutdown(self):
+        self.stop = True
+        self.commands.put(None)
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()